@@ -7,6 +7,8 @@ import random
 import string
 from app.db.database import SessionLocal
 from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+from app.services.rollups import rebuild_daily_sales_rollup
 
 def generate_serial():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=12))
@@ -169,6 +171,10 @@ def add_recent_sales():
         print(f"💰 TODAY'S REVENUE: ₹{sum(s.total_amount for s in today_sales):,.2f}")
         print("\n👉 REFRESH YOUR BROWSER NOW!")
         
+        # Seeded sales bypass the API, rebuild the dashboard rollup and the co-occurrence index
+        rebuild_daily_sales_rollup(db)
+        rebuild_product_cooccurrence(db)
+        
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
@@ -10,6 +10,8 @@ import random
 import string
 from app.db.database import SessionLocal
 from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+from app.services.rollups import rebuild_daily_sales_rollup
 
 def generate_serial():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=12))
@@ -166,6 +168,10 @@ def add_today_sales():
         print("🎉 DONE! Refresh your browser now!")
         print("=" * 50)
         
+        # Seeded sales bypass the API, rebuild the dashboard rollup and the co-occurrence index
+        rebuild_daily_sales_rollup(db)
+        rebuild_product_cooccurrence(db)
+        
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
@@ -0,0 +1,79 @@
+"""invoice sequences, daily sales rollup and sale idempotency keys
+
+The application still runs create_all on startup, so every step checks
+whether the object already exists.
+
+Revision ID: 0002_sales_pipeline_tables
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002_sales_pipeline_tables"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PAYMENT_MODES = ("CASH", "CARD", "UPI", "QR_CODE")
+payment_mode = sa.Enum(*PAYMENT_MODES, name="paymentmode").with_variant(
+    postgresql.ENUM(*PAYMENT_MODES, name="paymentmode", create_type=False), "postgresql"
+)
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def upgrade() -> None:
+    inspector = _inspector()
+    tables = inspector.get_table_names()
+
+    if "invoice_sequences" not in tables:
+        op.create_table(
+            "invoice_sequences",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("store_id", sa.Integer(), sa.ForeignKey("stores.id"), nullable=False),
+            sa.Column("sequence_date", sa.Date(), nullable=False),
+            sa.Column("last_value", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.UniqueConstraint("store_id", "sequence_date", name="uq_invoice_sequences_store_date")
+        )
+        op.create_index("ix_invoice_sequences_id", "invoice_sequences", ["id"])
+
+    if "daily_sales_rollup" not in tables:
+        op.create_table(
+            "daily_sales_rollup",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("store_id", sa.Integer(), sa.ForeignKey("stores.id"), nullable=False),
+            sa.Column("sales_date", sa.Date(), nullable=False),
+            sa.Column("payment_mode", payment_mode, nullable=False),
+            sa.Column("transaction_count", sa.Integer(), nullable=False),
+            sa.Column("subtotal", sa.Float(), nullable=False),
+            sa.Column("gst_amount", sa.Float(), nullable=False),
+            sa.Column("discount", sa.Float(), nullable=False),
+            sa.Column("total_amount", sa.Float(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.UniqueConstraint("store_id", "sales_date", "payment_mode", name="uq_daily_sales_rollup_key")
+        )
+        op.create_index("ix_daily_sales_rollup_id", "daily_sales_rollup", ["id"])
+        op.create_index("ix_daily_sales_rollup_sales_date", "daily_sales_rollup", ["sales_date"])
+
+    sale_columns = {column["name"] for column in inspector.get_columns("sales")}
+    if "idempotency_key" not in sale_columns:
+        op.add_column("sales", sa.Column("idempotency_key", sa.String(), nullable=True))
+        op.create_index("ix_sales_idempotency_key", "sales", ["idempotency_key"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sales_idempotency_key", table_name="sales")
+    with op.batch_alter_table("sales") as batch_op:
+        batch_op.drop_column("idempotency_key")
+    op.drop_table("daily_sales_rollup")
+    op.drop_table("invoice_sequences")
@@ -0,0 +1,52 @@
+"""indexes for the hot report filter columns
+
+Sales are filtered on sale_date together with store_id, customer_id or
+created_by, sale_items are joined on sale_id and product_id and expenses are
+filtered on expense_date and store_id.
+
+Revision ID: 0003_hot_filter_indexes
+Revises: 0002_sales_pipeline_tables
+Create Date: 2026-10-18 09:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003_hot_filter_indexes"
+down_revision: Union[str, None] = "0002_sales_pipeline_tables"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_sales_store_id_sale_date", "sales", ["store_id", "sale_date"]),
+    ("ix_sales_customer_id_sale_date", "sales", ["customer_id", "sale_date"]),
+    ("ix_sales_created_by_sale_date", "sales", ["created_by", "sale_date"]),
+    ("ix_sales_sale_date", "sales", ["sale_date"]),
+    ("ix_sale_items_sale_id", "sale_items", ["sale_id"]),
+    ("ix_sale_items_product_id", "sale_items", ["product_id"]),
+    ("ix_expenses_store_id_expense_date", "expenses", ["store_id", "expense_date"]),
+    ("ix_expenses_expense_date", "expenses", ["expense_date"]),
+    ("ix_products_store_id", "products", ["store_id"]),
+    ("ix_customers_store_id", "customers", ["store_id"]),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing = {
+        table: {index["name"] for index in inspector.get_indexes(table)}
+        for table in {table for _, table, _ in INDEXES}
+    }
+
+    for name, table, columns in INDEXES:
+        if name not in existing[table]:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,53 @@
+"""report jobs table for background exports
+
+Revision ID: 0004_report_jobs
+Revises: 0003_hot_filter_indexes
+Create Date: 2026-10-18 10:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004_report_jobs"
+down_revision: Union[str, None] = "0003_hot_filter_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "report_jobs" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "report_jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("report", sa.String(), nullable=False),
+        sa.Column("export_format", sa.String(), nullable=False),
+        sa.Column("params", sa.JSON(), nullable=True),
+        sa.Column("dedup_key", sa.String(), nullable=False),
+        sa.Column("store_id", sa.Integer(), sa.ForeignKey("stores.id"), nullable=True),
+        sa.Column("requested_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("rows_written", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(), nullable=True),
+        sa.Column("file_path", sa.String(), nullable=True),
+        sa.Column("file_size", sa.Integer(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True)
+    )
+    op.create_index("ix_report_jobs_dedup_key", "report_jobs", ["dedup_key"])
+    op.create_index("ix_report_jobs_status", "report_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_report_jobs_status", table_name="report_jobs")
+    op.drop_index("ix_report_jobs_dedup_key", table_name="report_jobs")
+    op.drop_table("report_jobs")
@@ -0,0 +1,48 @@
+"""precomputed customer churn scores
+
+Revision ID: 0005_customer_churn_scores
+Revises: 0004_report_jobs
+Create Date: 2026-10-18 13:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005_customer_churn_scores"
+down_revision: Union[str, None] = "0004_report_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "customer_churn_scores" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "customer_churn_scores",
+        sa.Column("customer_id", sa.Integer(), sa.ForeignKey("customers.id"), primary_key=True),
+        sa.Column("store_id", sa.Integer(), sa.ForeignKey("stores.id"), nullable=True),
+        sa.Column("churn_score", sa.Integer(), nullable=False),
+        sa.Column("risk_level", sa.String(), nullable=False),
+        sa.Column("days_since_purchase", sa.Integer(), nullable=False),
+        sa.Column("purchase_count", sa.Integer(), nullable=False),
+        sa.Column("recent_avg_order", sa.Float(), nullable=True),
+        sa.Column("early_avg_order", sa.Float(), nullable=True),
+        sa.Column("scored_at", sa.DateTime(), nullable=False)
+    )
+    op.create_index("ix_customer_churn_scores_churn_score", "customer_churn_scores", ["churn_score"])
+    op.create_index(
+        "ix_customer_churn_scores_store_id_churn_score",
+        "customer_churn_scores",
+        ["store_id", "churn_score"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_customer_churn_scores_store_id_churn_score", table_name="customer_churn_scores")
+    op.drop_index("ix_customer_churn_scores_churn_score", table_name="customer_churn_scores")
+    op.drop_table("customer_churn_scores")
@@ -0,0 +1,55 @@
+"""product co-occurrence index tables
+
+The tables are filled on the next startup (ensure_product_cooccurrence) or
+with backfill_product_cooccurrence.py.
+
+Revision ID: 0006_product_cooccurrence
+Revises: 0005_customer_churn_scores
+Create Date: 2026-10-18 15:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006_product_cooccurrence"
+down_revision: Union[str, None] = "0005_customer_churn_scores"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+
+    if "product_basket_counts" not in tables:
+        op.create_table(
+            "product_basket_counts",
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+            sa.Column("basket_count", sa.Integer(), nullable=False)
+        )
+        op.create_index("ix_product_basket_counts_basket_count", "product_basket_counts", ["basket_count"])
+
+    if "product_cooccurrence" not in tables:
+        op.create_table(
+            "product_cooccurrence",
+            sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+            sa.Column("other_product_id", sa.Integer(), sa.ForeignKey("products.id"), primary_key=True),
+            sa.Column("basket_count", sa.Integer(), nullable=False)
+        )
+        op.create_index("ix_product_cooccurrence_basket_count", "product_cooccurrence", ["basket_count"])
+        op.create_index(
+            "ix_product_cooccurrence_product_id_basket_count",
+            "product_cooccurrence",
+            ["product_id", "basket_count"]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_cooccurrence_product_id_basket_count", table_name="product_cooccurrence")
+    op.drop_index("ix_product_cooccurrence_basket_count", table_name="product_cooccurrence")
+    op.drop_table("product_cooccurrence")
+    op.drop_index("ix_product_basket_counts_basket_count", table_name="product_basket_counts")
+    op.drop_table("product_basket_counts")
@@ -0,0 +1,49 @@
+"""fitted forecast models per store and product
+
+Revision ID: 0007_forecast_models
+Revises: 0006_product_cooccurrence
+Create Date: 2026-10-18 16:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007_forecast_models"
+down_revision: Union[str, None] = "0006_product_cooccurrence"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "forecast_models" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "forecast_models",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("store_id", sa.Integer(), sa.ForeignKey("stores.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=True),
+        sa.Column("method", sa.String(), nullable=False),
+        sa.Column("level", sa.Float(), nullable=False),
+        sa.Column("trend", sa.Float(), nullable=False),
+        sa.Column("seasonal", sa.JSON(), nullable=False),
+        sa.Column("residual_std", sa.Float(), nullable=False),
+        sa.Column("holdout_mae", sa.Float(), nullable=True),
+        sa.Column("history_days", sa.Integer(), nullable=False),
+        sa.Column("origin_date", sa.Date(), nullable=False),
+        sa.Column("fitted_at", sa.DateTime(), nullable=False)
+    )
+    op.create_index("ix_forecast_models_id", "forecast_models", ["id"])
+    op.create_index("ix_forecast_models_product_id", "forecast_models", ["product_id"])
+    op.create_index("ix_forecast_models_store_id_product_id", "forecast_models", ["store_id", "product_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_forecast_models_store_id_product_id", table_name="forecast_models")
+    op.drop_index("ix_forecast_models_product_id", table_name="forecast_models")
+    op.drop_index("ix_forecast_models_id", table_name="forecast_models")
+    op.drop_table("forecast_models")
@@ -0,0 +1,49 @@
+"""materialized smart alerts
+
+Revision ID: 0008_smart_alerts
+Revises: 0007_forecast_models
+Create Date: 2026-10-18 19:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008_smart_alerts"
+down_revision: Union[str, None] = "0007_forecast_models"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if "smart_alerts" in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        "smart_alerts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("dedup_key", sa.String(), nullable=False, unique=True),
+        sa.Column("store_id", sa.Integer(), sa.ForeignKey("stores.id"), nullable=False),
+        sa.Column("alert_type", sa.String(), nullable=False),
+        sa.Column("severity", sa.String(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("action_required", sa.Boolean(), nullable=False),
+        sa.Column("recommended_action", sa.String(), nullable=True),
+        sa.Column("entity_type", sa.String(), nullable=True),
+        sa.Column("entity_id", sa.Integer(), nullable=True),
+        sa.Column("first_fired_at", sa.DateTime(), nullable=False),
+        sa.Column("last_fired_at", sa.DateTime(), nullable=False),
+        sa.Column("resolved_at", sa.DateTime(), nullable=True)
+    )
+    op.create_index("ix_smart_alerts_id", "smart_alerts", ["id"])
+    op.create_index("ix_smart_alerts_store_id_resolved_at", "smart_alerts", ["store_id", "resolved_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_smart_alerts_store_id_resolved_at", table_name="smart_alerts")
+    op.drop_index("ix_smart_alerts_id", table_name="smart_alerts")
+    op.drop_table("smart_alerts")
@@ -1,8 +1,10 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.db import models
+from app.core.principals import Principal, principal_cache
 from app.core.security import decode_access_token
 from app.db.models import UserRole
 
@@ -11,8 +13,13 @@ security = HTTPBearer()
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> models.User:
+) -> Principal:
+    """The caller as a read-only Principal, cached per token (see app.core.principals)"""
     token = credentials.credentials
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    
     payload = decode_access_token(token)
     
     if payload is None:
@@ -28,6 +35,7 @@ def get_current_user(
             detail="Invalid authentication credentials"
         )
     
+    generation = principal_cache.generation(int(user_id))
     user = db.query(models.User).filter(models.User.id == int(user_id)).first()
     if user is None or not user.is_active:
         raise HTTPException(
@@ -35,7 +43,9 @@ def get_current_user(
             detail="User not found or inactive"
         )
     
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.put(token, principal, payload.get("exp"), generation)
+    return principal
 
 def require_role(allowed_roles: list[UserRole]):
     def role_checker(current_user: models.User = Depends(get_current_user)):
@@ -63,3 +73,15 @@ def get_store_manager_or_admin(current_user: models.User = Depends(get_current_u
         )
     return current_user
 
+
+def get_store_filter(current_user: models.User, store_id: Optional[int] = None) -> Optional[List[int]]:
+    """Stores a query should be limited to.
+    
+    Non-admins are always pinned to their own store; for super admins an
+    explicit store_id narrows the scope and None means every store.
+    """
+    if current_user.role != UserRole.SUPER_ADMIN:
+        return [current_user.store_id]
+    if store_id:
+        return [store_id]
+    return None
@@ -0,0 +1,129 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are ordered on a unique key such as (sale_date, id) or (id). The next
+page continues strictly after the last row of the previous one with a
+``WHERE (sale_date, id) < (<sale_date of :last_id>, :last_id)`` filter, so
+page 500 costs the same as page 1. The cursor is opaque to clients and is
+returned in the ``X-Next-Cursor`` response header, which keeps the JSON body
+a plain list for existing callers.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+from fastapi import HTTPException, Response, status
+from sqlalchemy import func, literal, select, tuple_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence) -> str:
+    payload = json.dumps([
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the ordering")
+
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if value is None:
+                # A NULL sort value; the unique key never is
+                if column is columns[-1]:
+                    raise ValueError("cursor has no key")
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, NotImplementedError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _after(column, unique, cursor_values: list, descending: bool):
+    """Rows after the cursor row, comparing against its stored values.
+
+    The leading value is read back from the cursor row itself: SQLite keeps
+    server-default timestamps as '2026-10-18 05:09:36' while a bound datetime
+    is '2026-10-18 05:09:36.000000', and as strings the two don't compare
+    like the timestamps they are. The decoded value only stands in when the
+    cursor row has been deleted.
+    """
+    last_value, last_id = cursor_values
+    stored = select(column).where(unique == last_id).scalar_subquery()
+    value = func.coalesce(stored, literal(last_value, column.type))
+    key, last = tuple_(column, unique), tuple_(value, literal(last_id, unique.type))
+    return key < last if descending else key > last
+
+
+def keyset_paginate(
+    query: Query,
+    columns: Sequence,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    skip: int = 0,
+    descending: bool = True
+) -> List:
+    """Return one page of ``query`` ordered by ``columns``.
+
+    ``columns`` is the unique key (usually the primary key), optionally
+    preceded by one sort column such as a date. Rows whose sort column is
+    NULL come after all others, ordered by the key. When no cursor is given
+    ``skip`` is still honoured for older clients. The cursor for the
+    following page is set on ``response`` when more rows exist.
+    """
+    if len(columns) not in (1, 2):
+        raise ValueError("keyset_paginate orders by a unique key and at most one column before it")
+    unique = columns[-1]
+    unique_order = unique.desc() if descending else unique.asc()
+    cursor_values = decode_cursor(cursor, columns) if cursor else None
+
+    if len(columns) == 1:
+        if cursor_values:
+            query = query.filter(unique < cursor_values[0] if descending else unique > cursor_values[0])
+        elif skip:
+            query = query.offset(skip)
+        rows = query.order_by(unique_order).limit(limit + 1).all()
+    else:
+        column = columns[0]
+        column_order = column.desc() if descending else column.asc()
+        if not cursor_values and skip:
+            # Offsets can't be split into the two parts below
+            rows = query.order_by(column.is_(None), column_order, unique_order).offset(skip).limit(limit + 1).all()
+        else:
+            rows = []
+            # Rows with a value first, each part seeking on its own index range
+            if not cursor_values or cursor_values[0] is not None:
+                ranked = query.filter(column.isnot(None))
+                if cursor_values:
+                    ranked = ranked.filter(_after(column, unique, cursor_values, descending))
+                rows = ranked.order_by(column_order, unique_order).limit(limit + 1).all()
+            if len(rows) <= limit:
+                unranked = query.filter(column.is_(None))
+                if cursor_values and cursor_values[0] is None:
+                    last_id = cursor_values[1]
+                    unranked = unranked.filter(unique < last_id if descending else unique > last_id)
+                rows += unranked.order_by(unique_order).limit(limit + 1 - len(rows)).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [getattr(rows[-1], column.key) for column in columns]
+        )
+
+    return rows
@@ -7,7 +7,7 @@ from app.db.database import get_db
 from app.db import models
 from app.api.dependencies import get_current_user
 from pydantic import BaseModel
-import requests
+from app.services import http_client
 from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.campaign import Campaign as FBCampaign
 from facebook_business.adobjects.adset import AdSet
@@ -18,6 +18,10 @@ import shutil
 
 router = APIRouter()
 
+# Overridable so the OAuth flows can run against a local mock server
+META_GRAPH_URL = os.getenv("META_GRAPH_URL", "https://graph.facebook.com/v18.0")
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL", "https://oauth2.googleapis.com/token")
+
 # ============ SCHEMAS ============
 
 class AdAccountConnectionCreate(BaseModel):
@@ -117,13 +121,14 @@ async def meta_oauth_callback(
         redirect_uri = os.getenv("META_REDIRECT_URI")
         
         # Exchange code for access token
-        token_url = "https://graph.facebook.com/v18.0/oauth/access_token"
-        response = requests.get(token_url, params={
+        token_url = f"{META_GRAPH_URL}/oauth/access_token"
+        # A code is redeemed once: a retry after a timeout or 5xx would be rejected
+        response = await http_client.get(token_url, params={
             "client_id": app_id,
             "client_secret": app_secret,
             "redirect_uri": redirect_uri,
             "code": callback.code
-        })
+        }, retries=0)
         
         token_data = response.json()
         
@@ -133,8 +138,8 @@ async def meta_oauth_callback(
         access_token = token_data["access_token"]
         
         # Get long-lived token
-        long_token_url = "https://graph.facebook.com/v18.0/oauth/access_token"
-        long_response = requests.get(long_token_url, params={
+        long_token_url = f"{META_GRAPH_URL}/oauth/access_token"
+        long_response = await http_client.get(long_token_url, params={
             "grant_type": "fb_exchange_token",
             "client_id": app_id,
             "client_secret": app_secret,
@@ -146,8 +151,8 @@ async def meta_oauth_callback(
         expires_in = long_token_data.get("expires_in", 5184000)  # 60 days default
         
         # Get user's ad accounts
-        me_url = f"https://graph.facebook.com/v18.0/me/adaccounts"
-        accounts_response = requests.get(me_url, params={"access_token": long_lived_token})
+        me_url = f"{META_GRAPH_URL}/me/adaccounts"
+        accounts_response = await http_client.get(me_url, params={"access_token": long_lived_token})
         accounts_data = accounts_response.json()
         
         return {
@@ -249,8 +254,7 @@ async def google_oauth_callback(
         redirect_uri = os.getenv("GOOGLE_REDIRECT_URI")
         
         # Exchange code for tokens
-        token_url = "https://oauth2.googleapis.com/token"
-        response = requests.post(token_url, data={
+        response = await http_client.post(GOOGLE_TOKEN_URL, data={
             "client_id": client_id,
             "client_secret": client_secret,
             "redirect_uri": redirect_uri,
@@ -354,7 +358,7 @@ async def refresh_ad_token(
             client_id = os.getenv("GOOGLE_CLIENT_ID")
             client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
             
-            response = requests.post("https://oauth2.googleapis.com/token", data={
+            response = await http_client.post(GOOGLE_TOKEN_URL, data={
                 "client_id": client_id,
                 "client_secret": client_secret,
                 "refresh_token": connection.refresh_token,
@@ -370,7 +374,7 @@ async def refresh_ad_token(
             app_id = os.getenv("META_APP_ID")
             app_secret = os.getenv("META_APP_SECRET")
             
-            response = requests.get("https://graph.facebook.com/v18.0/oauth/access_token", params={
+            response = await http_client.get(f"{META_GRAPH_URL}/oauth/access_token", params={
                 "grant_type": "fb_exchange_token",
                 "client_id": app_id,
                 "client_secret": app_secret,
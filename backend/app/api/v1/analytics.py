@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, extract
 from datetime import datetime, timedelta
 from typing import Optional, List
 from app.db.database import get_db
 from app.db import models
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_store_filter
+from app.services.churn import live_churn_report, precomputed_churn_report
+from app.services.cohorts import cohort_matrix
+from app.services.cooccurrence import popular_products, product_partners, recommend_for_customer, top_pairs
+from app.services.forecasting import (
+    fit_active, fit_from_models, forecast_days, history_window, load_product_series, load_store_series
+)
+from app.services.rfm import (
+    SEGMENTS, RFMThresholds, customer_page, load_rfm_metrics, score_customers, segment_summary
+)
 from pydantic import BaseModel
-import numpy as np
-from collections import defaultdict
 
 router = APIRouter()
 
@@ -35,233 +42,145 @@ class ProductRecommendation(BaseModel):
 
 # ============ AI-POWERED SALES FORECASTING ============
 
+def _forecast_fit(db: Session, stored: List[models.ForecastModel], load_series):
+    """Stored models, else a fit on the spot; (fit, source)"""
+    if stored:
+        return fit_from_models(stored), "precomputed"
+    
+    start, end = history_window()
+    _, fit = fit_active(*load_series(start, end), start)
+    if fit is None:
+        raise HTTPException(status_code=400, detail="Insufficient data for forecasting")
+    return fit, "live"
+
 @router.get("/forecast/sales")
 def forecast_sales(
-    days: int = 30,
+    days: int = Query(30, ge=1, le=365),
+    store_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """AI-powered sales forecasting using time series analysis"""
-    
-    # Get historical sales data (last 90 days)
-    ninety_days_ago = datetime.now() - timedelta(days=90)
-    
-    query = db.query(
-        func.date(models.Sale.sale_date).label('date'),
-        func.sum(models.Sale.total_amount).label('total_sales')
-    ).filter(
-        models.Sale.sale_date >= ninety_days_ago
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Sale.store_id == current_user.store_id)
-    
-    historical_data = query.group_by(func.date(models.Sale.sale_date)).all()
-    
-    if len(historical_data) < 7:
-        raise HTTPException(status_code=400, detail="Insufficient data for forecasting")
-    
-    # Simple moving average forecast with trend
-    sales_values = [float(row.total_sales) for row in historical_data]
+    """AI-powered sales forecasting using time series analysis
     
-    # Calculate trend
-    x = np.arange(len(sales_values))
-    z = np.polyfit(x, sales_values, 1)
-    trend = z[0]
+    Served from the per-store models fitted nightly by fit_forecast_models.py
+    (weekday seasonality with trend, or Holt-Winters); without stored models
+    the stores in scope are fitted on the spot.
+    """
+    store_ids = get_store_filter(current_user, store_id)
     
-    # Moving average
-    window = min(7, len(sales_values))
-    moving_avg = np.mean(sales_values[-window:])
+    query = db.query(models.ForecastModel).filter(models.ForecastModel.product_id.is_(None))
+    if store_ids is not None:
+        query = query.filter(models.ForecastModel.store_id.in_(store_ids))
     
-    # Generate forecast
-    forecasts = []
-    last_date = historical_data[-1].date
+    fit, source = _forecast_fit(
+        db, query.all(), lambda start, end: load_store_series(db, start, end, store_ids)
+    )
+    forecast = forecast_days(fit, days, "predicted_sales")
+    forecast["model"]["source"] = source
     
-    for i in range(1, days + 1):
-        forecast_date = last_date + timedelta(days=i)
-        predicted_value = moving_avg + (trend * i)
-        
-        # Add confidence interval (±15%)
-        confidence_range = predicted_value * 0.15
-        
-        forecasts.append({
-            "date": forecast_date.strftime("%Y-%m-%d"),
-            "predicted_sales": round(predicted_value, 2),
-            "confidence_interval_low": round(predicted_value - confidence_range, 2),
-            "confidence_interval_high": round(predicted_value + confidence_range, 2)
-        })
+    return {"forecast_period": f"{days} days", **forecast}
+
+@router.get("/forecast/products/{product_id}")
+def forecast_product(
+    product_id: int,
+    days: int = Query(30, ge=1, le=365),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Daily units forecast for one product, e.g. for reorder planning"""
+    store_ids = get_store_filter(current_user)
+    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    if not product or (store_ids is not None and product.store_id not in store_ids):
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    stored = db.query(models.ForecastModel).filter(models.ForecastModel.product_id == product_id).all()
+    fit, source = _forecast_fit(
+        db, stored, lambda start, end: load_product_series(db, start, end, product_ids=[product_id])
+    )
+    forecast = forecast_days(fit, days, "predicted_units")
+    forecast["model"]["source"] = source
     
     return {
+        "product_id": product.id,
+        "product_name": product.name,
+        "current_stock": product.current_stock,
         "forecast_period": f"{days} days",
-        "trend": "increasing" if trend > 0 else "decreasing",
-        "trend_percentage": round(abs(trend) / moving_avg * 100, 2),
-        "forecasts": forecasts
+        **forecast
     }
 
 # ============ CUSTOMER SEGMENTATION (RFM ANALYSIS) ============
 
+def rfm_thresholds(
+    champion_min_score: int = Query(4, ge=1, le=5),
+    loyal_min_frequency: int = Query(4, ge=1, le=5),
+    loyal_min_recency: int = Query(3, ge=1, le=5),
+    potential_min_recency: int = Query(4, ge=1, le=5),
+    at_risk_max_recency: int = Query(2, ge=1, le=5),
+    at_risk_min_frequency: int = Query(3, ge=1, le=5),
+    lost_max_recency: int = Query(1, ge=1, le=5),
+    lost_max_frequency: int = Query(2, ge=1, le=5)
+) -> RFMThresholds:
+    return RFMThresholds(
+        champion_min_score=champion_min_score,
+        loyal_min_frequency=loyal_min_frequency,
+        loyal_min_recency=loyal_min_recency,
+        potential_min_recency=potential_min_recency,
+        at_risk_max_recency=at_risk_max_recency,
+        at_risk_min_frequency=at_risk_min_frequency,
+        lost_max_recency=lost_max_recency,
+        lost_max_frequency=lost_max_frequency
+    )
+
 @router.get("/customers/segmentation")
 def customer_segmentation(
+    store_id: Optional[int] = None,
+    segment: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    thresholds: RFMThresholds = Depends(rfm_thresholds),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Advanced RFM (Recency, Frequency, Monetary) customer segmentation"""
-    
-    # Get all customers with their purchase history
-    query = db.query(models.Customer).filter(models.Customer.id.isnot(None))
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Customer.store_id == current_user.store_id)
+    """Advanced RFM (Recency, Frequency, Monetary) customer segmentation
+    
+    Returns the segment summary plus one page of scored customers, optionally
+    limited to a single segment. Segment cut-offs are 1-5 quintile scores and
+    can be tuned through the threshold query parameters.
+    """
+    if segment is not None and segment not in SEGMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown segment '{segment}', use one of: {', '.join(SEGMENTS)}"
+        )
     
-    customers = query.all()
+    customer_ids, recency, frequency, monetary = load_rfm_metrics(
+        db, get_store_filter(current_user, store_id)
+    )
+    result = score_customers(customer_ids, recency, frequency, monetary, thresholds)
     
-    segments = {
-        "champions": {"customers": [], "avg_value": 0, "total_revenue": 0},
-        "loyal_customers": {"customers": [], "avg_value": 0, "total_revenue": 0},
-        "potential_loyalists": {"customers": [], "avg_value": 0, "total_revenue": 0},
-        "at_risk": {"customers": [], "avg_value": 0, "total_revenue": 0},
-        "hibernating": {"customers": [], "avg_value": 0, "total_revenue": 0},
-        "lost": {"customers": [], "avg_value": 0, "total_revenue": 0}
+    return {
+        "segments": segment_summary(result),
+        "thresholds": thresholds.model_dump(),
+        **customer_page(db, result, segment, skip, limit)
     }
-    
-    for customer in customers:
-        # Get customer's sales
-        sales = db.query(models.Sale).filter(
-            models.Sale.customer_id == customer.id
-        ).all()
-        
-        if not sales:
-            continue
-        
-        # Calculate RFM metrics
-        last_purchase = max(sale.sale_date for sale in sales)
-        recency = (datetime.now() - last_purchase).days
-        frequency = len(sales)
-        monetary = sum(sale.total_amount for sale in sales)
-        
-        # Segment based on RFM
-        if recency <= 30 and frequency >= 5 and monetary >= 50000:
-            segment = "champions"
-        elif recency <= 60 and frequency >= 3:
-            segment = "loyal_customers"
-        elif recency <= 90 and frequency >= 2:
-            segment = "potential_loyalists"
-        elif recency > 90 and recency <= 180 and frequency >= 2:
-            segment = "at_risk"
-        elif recency > 180 and frequency >= 2:
-            segment = "hibernating"
-        else:
-            segment = "lost"
-        
-        segments[segment]["customers"].append(customer.id)
-        segments[segment]["total_revenue"] += monetary
-    
-    # Calculate averages
-    result = []
-    for segment_name, data in segments.items():
-        count = len(data["customers"])
-        if count > 0:
-            result.append({
-                "segment": segment_name,
-                "customer_count": count,
-                "avg_order_value": round(data["total_revenue"] / count, 2),
-                "total_revenue": round(data["total_revenue"], 2),
-                "characteristics": {
-                    "champions": "Best customers - Recent, frequent, high value",
-                    "loyal_customers": "Regular buyers - Good frequency",
-                    "potential_loyalists": "Recent buyers - Can become loyal",
-                    "at_risk": "Haven't purchased recently - Need attention",
-                    "hibernating": "Long time since purchase - Re-engage",
-                    "lost": "Inactive customers - Win-back campaigns"
-                }.get(segment_name, "")
-            })
-    
-    return {"segments": result}
 
 # ============ PRODUCT RECOMMENDATIONS ============
 
 @router.get("/recommendations/customer/{customer_id}")
 def get_customer_recommendations(
     customer_id: int,
-    limit: int = 5,
+    limit: int = Query(5, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """AI-powered product recommendations based on purchase history"""
+    """AI-powered product recommendations based on purchase history
     
-    # Get customer's purchase history
-    customer_purchases = db.query(models.SaleItem.product_id).join(
-        models.Sale, models.SaleItem.sale_id == models.Sale.id
-    ).filter(
-        models.Sale.customer_id == customer_id
-    ).all()
-    
-    purchased_product_ids = [p.product_id for p in customer_purchases]
-    
-    if not purchased_product_ids:
-        # New customer - recommend popular products
-        popular_products = db.query(
-            models.Product.id,
-            models.Product.name,
-            func.count(models.SaleItem.id).label('sales_count')
-        ).join(
-            models.SaleItem, models.Product.id == models.SaleItem.product_id
-        ).group_by(
-            models.Product.id, models.Product.name
-        ).order_by(
-            func.count(models.SaleItem.id).desc()
-        ).limit(limit).all()
-        
-        return {
-            "recommendations": [
-                {
-                    "product_id": p.id,
-                    "product_name": p.name,
-                    "confidence_score": 0.7,
-                    "reason": "Popular product - trending now"
-                }
-                for p in popular_products
-            ]
-        }
-    
-    # Find products frequently bought together (collaborative filtering)
-    # Get customers who bought similar products
-    similar_customers = db.query(models.Sale.customer_id).join(
-        models.SaleItem, models.Sale.id == models.SaleItem.sale_id
-    ).filter(
-        models.SaleItem.product_id.in_(purchased_product_ids),
-        models.Sale.customer_id != customer_id
-    ).distinct().limit(50).all()
-    
-    similar_customer_ids = [c.customer_id for c in similar_customers]
-    
-    # Get products these similar customers bought
-    recommended_products = db.query(
-        models.Product.id,
-        models.Product.name,
-        func.count(models.SaleItem.id).label('frequency')
-    ).join(
-        models.SaleItem, models.Product.id == models.SaleItem.product_id
-    ).join(
-        models.Sale, models.SaleItem.sale_id == models.Sale.id
-    ).filter(
-        models.Sale.customer_id.in_(similar_customer_ids),
-        models.Product.id.notin_(purchased_product_ids)
-    ).group_by(
-        models.Product.id, models.Product.name
-    ).order_by(
-        func.count(models.SaleItem.id).desc()
-    ).limit(limit).all()
-    
-    recommendations = []
-    for product in recommended_products:
-        confidence = min(0.9, product.frequency / len(similar_customer_ids))
-        recommendations.append({
-            "product_id": product.id,
-            "product_name": product.name,
-            "confidence_score": round(confidence, 2),
-            "reason": "Customers like you also bought this"
-        })
+    Item-to-item collaborative filtering over the co-occurrence index; new
+    customers, or ones whose products have no partners yet, get popular products.
+    """
+    recommendations = recommend_for_customer(db, customer_id, limit)
+    if not recommendations:
+        recommendations = popular_products(db, limit, customer_id)
     
     return {"recommendations": recommendations}
 
@@ -269,195 +188,79 @@ def get_customer_recommendations(
 
 @router.get("/cohort-analysis")
 def cohort_analysis(
-    months: int = 6,
+    months: int = Query(6, ge=1, le=120),
+    horizon: int = Query(6, ge=1, le=120),
+    store_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Cohort retention analysis - Track customer retention over time"""
-    
-    start_date = datetime.now() - timedelta(days=months * 30)
-    
-    # Get first purchase date for each customer
-    first_purchases = db.query(
-        models.Sale.customer_id,
-        func.min(models.Sale.sale_date).label('first_purchase')
-    ).filter(
-        models.Sale.sale_date >= start_date
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        first_purchases = first_purchases.filter(models.Sale.store_id == current_user.store_id)
-    
-    first_purchases = first_purchases.group_by(models.Sale.customer_id).all()
-    
-    # Group customers by cohort (month of first purchase)
-    cohorts = defaultdict(list)
-    for fp in first_purchases:
-        cohort_month = fp.first_purchase.strftime("%Y-%m")
-        cohorts[cohort_month].append(fp.customer_id)
+    """Cohort retention analysis - Track customer retention over time
     
-    # Calculate retention for each cohort
-    cohort_data = []
-    for cohort_month, customer_ids in sorted(cohorts.items()):
-        cohort_size = len(customer_ids)
-        
-        # Calculate retention for each subsequent month
-        retention = {}
-        for i in range(6):  # 6 months retention
-            month_start = datetime.strptime(cohort_month, "%Y-%m") + timedelta(days=30 * i)
-            month_end = month_start + timedelta(days=30)
-            
-            # Count customers who made purchases in this month
-            active_customers = db.query(func.count(func.distinct(models.Sale.customer_id))).filter(
-                models.Sale.customer_id.in_(customer_ids),
-                models.Sale.sale_date >= month_start,
-                models.Sale.sale_date < month_end
-            ).scalar()
-            
-            retention[f"month_{i}"] = round((active_customers / cohort_size * 100), 2)
-        
-        cohort_data.append({
-            "cohort": cohort_month,
-            "size": cohort_size,
-            "retention": retention
-        })
-    
-    return {"cohort_analysis": cohort_data}
+    One cohort per calendar month for the last ``months`` months, with the
+    share of each cohort buying again 0..horizon-1 calendar months later.
+    Months that haven't happened yet are null.
+    """
+    return {
+        "cohort_analysis": cohort_matrix(db, get_store_filter(current_user, store_id), months, horizon)
+    }
 
 # ============ CHURN PREDICTION ============
 
 @router.get("/predict/churn")
 def predict_customer_churn(
+    live: bool = False,
+    limit: int = Query(50, ge=1, le=500),
+    store_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Predict which customers are at risk of churning"""
+    """Predict which customers are at risk of churning
     
-    query = db.query(models.Customer)
+    Reads the scores stored by the nightly precompute_churn_scores.py run;
+    with live=true, or before the first run, customers are scored on the spot.
+    """
+    store_ids = get_store_filter(current_user, store_id)
     
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Customer.store_id == current_user.store_id)
-    
-    customers = query.all()
-    
-    at_risk_customers = []
+    if not live:
+        report = precomputed_churn_report(db, store_ids, limit)
+        if report is not None:
+            return {**report, "source": "precomputed"}
     
-    for customer in customers:
-        sales = db.query(models.Sale).filter(
-            models.Sale.customer_id == customer.id
-        ).order_by(models.Sale.sale_date.desc()).all()
-        
-        if not sales:
-            continue
-        
-        last_purchase = sales[0].sale_date
-        days_since_purchase = (datetime.now() - last_purchase).days
-        purchase_frequency = len(sales)
-        avg_order_value = sum(s.total_amount for s in sales) / len(sales)
-        
-        # Churn risk scoring
-        churn_score = 0
-        
-        # Recency factor (30% weight)
-        if days_since_purchase > 180:
-            churn_score += 30
-        elif days_since_purchase > 90:
-            churn_score += 20
-        elif days_since_purchase > 60:
-            churn_score += 10
-        
-        # Frequency factor (30% weight)
-        if purchase_frequency == 1:
-            churn_score += 30
-        elif purchase_frequency == 2:
-            churn_score += 15
-        
-        # Declining purchase pattern (40% weight)
-        if len(sales) >= 3:
-            recent_3_avg = sum(s.total_amount for s in sales[:3]) / 3
-            older_3_avg = sum(s.total_amount for s in sales[-3:]) / 3
-            
-            if recent_3_avg < older_3_avg * 0.7:
-                churn_score += 40
-            elif recent_3_avg < older_3_avg:
-                churn_score += 20
-        
-        if churn_score >= 50:
-            risk_level = "high" if churn_score >= 70 else "medium"
-            at_risk_customers.append({
-                "customer_id": customer.id,
-                "customer_name": customer.name,
-                "phone": customer.phone,
-                "churn_score": churn_score,
-                "risk_level": risk_level,
-                "days_since_purchase": days_since_purchase,
-                "lifetime_value": round(customer.total_purchases, 2),
-                "recommended_action": "Send personalized offer" if risk_level == "high" else "Send re-engagement email"
-            })
-    
-    # Sort by churn score
-    at_risk_customers.sort(key=lambda x: x["churn_score"], reverse=True)
-    
-    return {
-        "total_at_risk": len(at_risk_customers),
-        "high_risk_count": len([c for c in at_risk_customers if c["risk_level"] == "high"]),
-        "customers": at_risk_customers[:50]  # Top 50
-    }
+    return {**live_churn_report(db, store_ids, limit), "scored_at": datetime.now(), "source": "live"}
 
 # ============ PRODUCT AFFINITY ANALYSIS ============
 
 @router.get("/product-affinity")
 def product_affinity_analysis(
     product_id: Optional[int] = None,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=500),
+    store_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Market basket analysis - Products frequently bought together"""
-    
-    if product_id:
-        # Find products bought together with this product
-        sales_with_product = db.query(models.Sale.id).join(
-            models.SaleItem, models.Sale.id == models.SaleItem.sale_id
-        ).filter(
-            models.SaleItem.product_id == product_id
-        ).all()
-        
-        sale_ids = [s.id for s in sales_with_product]
-        
-        # Find other products in those sales
-        affinity_products = db.query(
-            models.Product.id,
-            models.Product.name,
-            func.count(models.SaleItem.id).label('frequency')
-        ).join(
-            models.SaleItem, models.Product.id == models.SaleItem.product_id
-        ).filter(
-            models.SaleItem.sale_id.in_(sale_ids),
-            models.Product.id != product_id
-        ).group_by(
-            models.Product.id, models.Product.name
-        ).order_by(
-            func.count(models.SaleItem.id).desc()
-        ).limit(limit).all()
-        
-        total_sales = len(sale_ids)
-        
-        return {
-            "product_id": product_id,
-            "frequently_bought_with": [
-                {
-                    "product_id": p.id,
-                    "product_name": p.name,
-                    "co_occurrence_count": p.frequency,
-                    "affinity_score": round(p.frequency / total_sales * 100, 2)
-                }
-                for p in affinity_products
-            ]
-        }
-    else:
-        # Overall product pairs analysis
-        return {"message": "Provide product_id to see affinity analysis"}
+    """Market basket analysis - Products frequently bought together
+    
+    With product_id, the products most often in the same sale; without it,
+    the most frequent product pairs in scope. Read from the co-occurrence index.
+    """
+    store_ids = get_store_filter(current_user, store_id)
+    
+    if product_id is None:
+        return {"pairs": top_pairs(db, store_ids, limit)}
+    
+    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    if not product or (store_ids is not None and product.store_id not in store_ids):
+        raise HTTPException(status_code=404, detail="Product not found")
+    
+    partners = product_partners(db, product, limit)
+    for partner in partners:
+        # Share of this product's sales that also had the partner, in percent
+        partner["affinity_score"] = round(partner["confidence"] * 100, 2)
+    
+    return {
+        "product_id": product_id,
+        "frequently_bought_with": partners
+    }
 
 # ============ AUTOMATED INSIGHTS ============
 
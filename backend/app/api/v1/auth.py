@@ -1,25 +1,54 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
 from app.db.database import get_db
 from app.db import models
 from app.schemas.user import UserLogin, Token, UserResponse, PasswordChange
 from app.core.security import verify_password, create_access_token, get_password_hash
 from app.core.config import settings
-from app.api.dependencies import get_current_user
-import json
+from app.core.password_hashing import PasswordHashingBusy, hashing_stats, verify_password_async
+from app.core.principals import invalidate_user
+from app.api.dependencies import get_current_user, get_super_admin
+from app.services import audit
 
 router = APIRouter()
 
-@router.post("/login", response_model=Token)
-def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+def _find_login_user(db: Session, username: str) -> Optional[models.User]:
     # Check if logging in with username or email
-    user = db.query(models.User).filter(
-        (models.User.username == user_credentials.username) |
-        (models.User.email == user_credentials.username)
+    return db.query(models.User).filter(
+        (models.User.username == username) |
+        (models.User.email == username)
     ).first()
+
+def _record_login(db: Session, user: models.User, new_hash: Optional[str]) -> UserResponse:
+    # Upgrade hashes made with another BCRYPT_ROUNDS while we have the password
+    if new_hash:
+        user.hashed_password = new_hash
+    
+    audit.record(db, user.id, "login", "user", user.id, {"username": user.username, "rehashed": bool(new_hash)})
+    db.commit()
+    return UserResponse.model_validate(user)
+
+@router.post("/login", response_model=Token)
+async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+    # Database work stays on the threadpool, bcrypt runs on the hashing pool,
+    # so the event loop is never blocked
+    user = await run_in_threadpool(_find_login_user, db, user_credentials.username)
+    
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await verify_password_async(user_credentials.password, user.hashed_password)
+        except PasswordHashingBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry",
+                headers={"Retry-After": "1"}
+            )
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -31,53 +60,43 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="User account is inactive"
         )
     
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=user.id,
-        action="login",
-        entity_type="user",
-        entity_id=user.id,
-        details=json.dumps({"username": user.username})
-    )
-    db.add(audit_log)
-    db.commit()
+    user_response = await run_in_threadpool(_record_login, db, user, new_hash)
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data={"sub": str(user_response.id)},
         expires_delta=access_token_expires
     )
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": UserResponse.model_validate(user)
+        "user": user_response
     }
 
+@router.get("/hashing/stats")
+def get_hashing_stats(current_user: models.User = Depends(get_super_admin)):
+    """Password hashing pool queue depth and timings (Super Admin only)"""
+    return hashing_stats()
+
 @router.post("/change-password")
 def change_password(
     password_data: PasswordChange,
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    if not verify_password(password_data.old_password, current_user.hashed_password):
+    # current_user is a cached snapshot without the password hash
+    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+    if not verify_password(password_data.old_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect old password"
         )
     
-    current_user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="password_change",
-        entity_type="user",
-        entity_id=current_user.id
-    )
-    db.add(audit_log)
+    user.hashed_password = get_password_hash(password_data.new_password)
+    audit.record(db, current_user.id, "password_change", "user", current_user.id)
     db.commit()
+    invalidate_user(user.id)
     
     return {"message": "Password changed successfully"}
 
@@ -5,7 +5,8 @@ from datetime import datetime, timedelta
 from typing import Optional, List
 from app.db.database import get_db
 from app.db import models
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_store_filter, get_super_admin
+from app.services.smart_alerts import active_alerts, refresh_smart_alerts
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -32,166 +33,28 @@ class SmartAlert(BaseModel):
 
 @router.get("/alerts/smart")
 def get_smart_alerts(
+    store_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Real-time smart alerts based on business rules"""
-    
-    alerts = []
-    
-    # Alert 1: Critical Low Stock
-    critical_stock = db.query(models.Product).filter(
-        models.Product.current_stock <= models.Product.minimum_stock * 0.3,
-        models.Product.is_active == True
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        critical_stock = critical_stock.filter(models.Product.store_id == current_user.store_id)
-    
-    for product in critical_stock.limit(10).all():
-        alerts.append({
-            "alert_type": "inventory_critical",
-            "severity": "critical",
-            "title": f"Critical: {product.name} Almost Out of Stock",
-            "message": f"Only {product.current_stock} units left. Minimum required: {product.minimum_stock}",
-            "action_required": True,
-            "recommended_action": f"Reorder {product.minimum_stock * 2} units immediately",
-            "entity_id": product.id,
-            "entity_type": "product"
-        })
-    
-    # Alert 2: High-Value Customers Not Engaged
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    
-    high_value_inactive = db.query(models.Customer).filter(
-        models.Customer.total_purchases >= 100000,
-        models.Customer.id.notin_(
-            db.query(models.Sale.customer_id).filter(
-                models.Sale.sale_date >= thirty_days_ago
-            )
-        )
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        high_value_inactive = high_value_inactive.filter(models.Customer.store_id == current_user.store_id)
-    
-    for customer in high_value_inactive.limit(5).all():
-        alerts.append({
-            "alert_type": "customer_retention",
-            "severity": "warning",
-            "title": f"High-Value Customer Inactive: {customer.name}",
-            "message": f"Customer with ₹{customer.total_purchases:,.0f} lifetime value hasn't purchased in 30+ days",
-            "action_required": True,
-            "recommended_action": "Send personalized re-engagement offer",
-            "entity_id": customer.id,
-            "entity_type": "customer"
-        })
-    
-    # Alert 3: Warranties Expiring Soon
-    thirty_days_ahead = datetime.now() + timedelta(days=30)
-    
-    expiring_warranties = db.query(
-        models.SaleItem,
-        models.Customer,
-        models.Product
-    ).join(
-        models.Sale, models.SaleItem.sale_id == models.Sale.id
-    ).join(
-        models.Customer, models.Sale.customer_id == models.Customer.id
-    ).join(
-        models.Product, models.SaleItem.product_id == models.Product.id
-    ).filter(
-        models.SaleItem.warranty_expires_at.isnot(None),
-        models.SaleItem.warranty_expires_at <= thirty_days_ahead,
-        models.SaleItem.warranty_expires_at >= datetime.now()
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        expiring_warranties = expiring_warranties.filter(models.Sale.store_id == current_user.store_id)
-    
-    for sale_item, customer, product in expiring_warranties.limit(10).all():
-        days_left = (sale_item.warranty_expires_at - datetime.now()).days
-        alerts.append({
-            "alert_type": "warranty_expiring",
-            "severity": "info",
-            "title": f"Warranty Expiring: {product.name}",
-            "message": f"Customer {customer.name}'s warranty expires in {days_left} days",
-            "action_required": True,
-            "recommended_action": "Offer extended warranty or AMC package",
-            "entity_id": customer.id,
-            "entity_type": "customer"
-        })
-    
-    # Alert 4: Unusual Sales Pattern
-    today = datetime.now().date()
-    today_sales = db.query(func.sum(models.Sale.total_amount)).filter(
-        func.date(models.Sale.sale_date) == today
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        today_sales = today_sales.filter(models.Sale.store_id == current_user.store_id)
-    
-    today_total = today_sales.scalar() or 0
-    
-    # Get average of last 7 days
-    seven_days_ago = datetime.now() - timedelta(days=7)
-    avg_sales = db.query(func.avg(
-        db.query(func.sum(models.Sale.total_amount)).filter(
-            func.date(models.Sale.sale_date) >= seven_days_ago.date()
-        ).scalar()
-    )).scalar() or 0
-    
-    if avg_sales > 0 and today_total < avg_sales * 0.5:
-        alerts.append({
-            "alert_type": "sales_anomaly",
-            "severity": "warning",
-            "title": "Unusual Sales Pattern Detected",
-            "message": f"Today's sales (₹{today_total:,.0f}) are significantly lower than average (₹{avg_sales:,.0f})",
-            "action_required": True,
-            "recommended_action": "Review store operations and run promotional campaigns",
-            "entity_id": None,
-            "entity_type": "sales"
-        })
-    
-    # Alert 5: Staff Performance Issues
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    
-    low_performing_staff = db.query(
-        models.User.id,
-        models.User.full_name,
-        func.count(models.Sale.id).label('sales_count'),
-        func.sum(models.Sale.total_amount).label('total_sales')
-    ).join(
-        models.Sale, models.User.id == models.Sale.created_by
-    ).filter(
-        models.Sale.sale_date >= thirty_days_ago,
-        models.User.role == models.UserRole.SALES_STAFF
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        low_performing_staff = low_performing_staff.filter(models.User.store_id == current_user.store_id)
-    
-    low_performing_staff = low_performing_staff.group_by(
-        models.User.id, models.User.full_name
-    ).having(
-        func.count(models.Sale.id) < 5
-    ).all()
-    
-    for staff in low_performing_staff:
-        alerts.append({
-            "alert_type": "staff_performance",
-            "severity": "warning",
-            "title": f"Low Performance: {staff.full_name}",
-            "message": f"Only {staff.sales_count} sales in last 30 days",
-            "action_required": True,
-            "recommended_action": "Provide training and set clear targets",
-            "entity_id": staff.id,
-            "entity_type": "staff"
-        })
-    
-    # Sort by severity
-    severity_order = {"critical": 0, "warning": 1, "info": 2}
-    alerts.sort(key=lambda x: severity_order.get(x["severity"], 3))
+    """Active smart alerts, evaluated in the background (see app/services/smart_alerts.py)"""
+    alerts = [
+        {
+            "id": alert.id,
+            "alert_type": alert.alert_type,
+            "severity": alert.severity,
+            "title": alert.title,
+            "message": alert.message,
+            "action_required": alert.action_required,
+            "recommended_action": alert.recommended_action,
+            "entity_id": alert.entity_id,
+            "entity_type": alert.entity_type,
+            "store_id": alert.store_id,
+            "first_fired_at": alert.first_fired_at,
+            "last_fired_at": alert.last_fired_at
+        }
+        for alert in active_alerts(db, get_store_filter(current_user, store_id))
+    ]
     
     return {
         "total_alerts": len(alerts),
@@ -200,6 +63,11 @@ def get_smart_alerts(
         "alerts": alerts
     }
 
+@router.post("/alerts/smart/evaluate")
+def evaluate_smart_alerts_now(current_user: models.User = Depends(get_super_admin)):
+    """Re-evaluate every store's alerts now instead of waiting for the next round (Super Admin only)"""
+    return refresh_smart_alerts(force=True)
+
 # ============ AUTOMATED CAMPAIGN OPTIMIZER ============
 
 @router.post("/campaigns/{campaign_id}/optimize")
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from app.db import models
+from app.api.dependencies import get_super_admin
+from app.core.cache import response_cache
+
+router = APIRouter()
+
+@router.get("/stats")
+def get_cache_stats(current_user: models.User = Depends(get_super_admin)):
+    """Dashboard cache hit/miss counters of this process (Super Admin only)"""
+    return response_cache.stats()
+
+@router.delete("/")
+def clear_cache(current_user: models.User = Depends(get_super_admin)):
+    """Drop every cached dashboard response (Super Admin only)"""
+    response_cache.clear()
+    return {"message": "Cache cleared successfully"}
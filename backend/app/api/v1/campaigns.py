@@ -7,7 +7,8 @@ from app.db import models
 from app.schemas.campaign import CampaignCreate, CampaignUpdate, CampaignResponse, CampaignStats
 from app.api.dependencies import get_current_user, require_role
 from app.db.models import UserRole
-import json
+from app.core.cache import response_cache, CAMPAIGNS
+from app.services import audit
 import traceback
 
 router = APIRouter()
@@ -61,25 +62,14 @@ def create_campaign(
         )
         
         db.add(db_campaign)
+        db.flush()
+        audit.record(db, current_user.id, "create", "campaign", db_campaign.id, {"name": db_campaign.name, "type": db_campaign.campaign_type.value})
         db.commit()
         db.refresh(db_campaign)
+        response_cache.invalidate([CAMPAIGNS], [db_campaign.store_id])
         
         print(f"Campaign created with ID: {db_campaign.id}")
         
-        # Create audit log
-        try:
-            audit_log = models.AuditLog(
-                user_id=current_user.id,
-                action="create",
-                entity_type="campaign",
-                entity_id=db_campaign.id,
-                details=json.dumps({"name": db_campaign.name, "type": db_campaign.campaign_type.value})
-            )
-            db.add(audit_log)
-            db.commit()
-        except Exception as audit_error:
-            print(f"Warning: Could not create audit log: {audit_error}")
-        
         return db_campaign
         
     except HTTPException:
@@ -122,6 +112,41 @@ def get_campaigns(
     campaigns = query.order_by(models.Campaign.created_at.desc()).offset(skip).limit(limit).all()
     return campaigns
 
+@router.get("/dashboard/stats")
+def get_marketing_dashboard(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Get marketing dashboard stats"""
+    store_ids = None if current_user.role == models.UserRole.SUPER_ADMIN else [current_user.store_id]
+    return response_cache.cached(
+        "campaigns.dashboard", store_ids, None, [CAMPAIGNS],
+        lambda: _marketing_dashboard(db, store_ids)
+    )
+
+def _marketing_dashboard(db: Session, store_ids):
+    query = db.query(models.Campaign)
+    
+    if store_ids is not None:
+        query = query.filter(models.Campaign.store_id.in_(store_ids))
+    
+    campaigns = query.all()
+    
+    total_campaigns = len(campaigns)
+    active_campaigns = len([c for c in campaigns if c.status == models.CampaignStatus.ACTIVE])
+    total_sent = sum(int(c.total_sent or 0) for c in campaigns)
+    total_converted = sum(int(c.total_converted or 0) for c in campaigns)
+    
+    avg_conversion_rate = (total_converted / total_sent * 100) if total_sent > 0 else 0
+    
+    return {
+        "total_campaigns": total_campaigns,
+        "active_campaigns": active_campaigns,
+        "total_messages_sent": total_sent,
+        "total_conversions": total_converted,
+        "average_conversion_rate": round(avg_conversion_rate, 2)
+    }
+
 @router.get("/{campaign_id}", response_model=CampaignResponse)
 def get_campaign(
     campaign_id: int,
@@ -171,23 +196,15 @@ def update_campaign(
                 detail="Not enough permissions"
             )
     
+    previous_store_id = campaign.store_id
     update_data = campaign_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(campaign, field, value)
     
+    audit.record(db, current_user.id, "update", "campaign", campaign.id, update_data)
     db.commit()
     db.refresh(campaign)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="update",
-        entity_type="campaign",
-        entity_id=campaign.id,
-        details=json.dumps(update_data, default=str)
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([CAMPAIGNS], [previous_store_id, campaign.store_id])
     
     return campaign
 
@@ -208,6 +225,7 @@ def activate_campaign(
     
     campaign.status = models.CampaignStatus.ACTIVE
     db.commit()
+    response_cache.invalidate([CAMPAIGNS], [campaign.store_id])
     
     return {"message": "Campaign activated successfully", "campaign_id": campaign_id}
 
@@ -228,6 +246,7 @@ def pause_campaign(
     
     campaign.status = models.CampaignStatus.PAUSED
     db.commit()
+    response_cache.invalidate([CAMPAIGNS], [campaign.store_id])
     
     return {"message": "Campaign paused successfully", "campaign_id": campaign_id}
 
@@ -263,34 +282,6 @@ def get_campaign_stats(
         "conversion_rate": round(conversion_rate, 2)
     }
 
-@router.get("/dashboard/stats")
-def get_marketing_dashboard(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
-):
-    """Get marketing dashboard stats"""
-    query = db.query(models.Campaign)
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Campaign.store_id == current_user.store_id)
-    
-    campaigns = query.all()
-    
-    total_campaigns = len(campaigns)
-    active_campaigns = len([c for c in campaigns if c.status == models.CampaignStatus.ACTIVE])
-    total_sent = sum(int(c.total_sent or 0) for c in campaigns)
-    total_converted = sum(int(c.total_converted or 0) for c in campaigns)
-    
-    avg_conversion_rate = (total_converted / total_sent * 100) if total_sent > 0 else 0
-    
-    return {
-        "total_campaigns": total_campaigns,
-        "active_campaigns": active_campaigns,
-        "total_messages_sent": total_sent,
-        "total_conversions": total_converted,
-        "average_conversion_rate": round(avg_conversion_rate, 2)
-    }
-
 @router.delete("/{campaign_id}")
 def delete_campaign(
     campaign_id: int,
@@ -315,18 +306,9 @@ def delete_campaign(
             )
     
     db.delete(campaign)
+    audit.record(db, current_user.id, "delete", "campaign", campaign_id, {"name": campaign.name})
     db.commit()
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="delete",
-        entity_type="campaign",
-        entity_id=campaign_id,
-        details=json.dumps({"name": campaign.name})
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([CAMPAIGNS], [campaign.store_id])
     
     return {"message": "Campaign deleted successfully"}
 
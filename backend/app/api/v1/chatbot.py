@@ -1,21 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-from datetime import datetime, timedelta
 import httpx
 import json
+import logging
 
-from app.db.database import get_db
 from app.db import models
-from app.api.dependencies import get_current_user
+from app.api.dependencies import get_current_user, get_super_admin
+from app.services import http_client, ollama
+from app.services.chat_answers import FALLBACK, LLM, answer_cache
+from app.services.chat_context import ContextSnapshot, context_scope, get_chat_snapshot
+from app.services.chat_prompt import build_system_prompt, estimate_tokens, trim_history
+from app.services.ollama import OLLAMA_BASE_URL, OLLAMA_MODEL, OllamaError
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# Ollama API configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
-OLLAMA_MODEL = "phi4"  # Will work with any phi4 variant
+router = APIRouter()
 
 
 class ChatRequest(BaseModel):
@@ -28,155 +29,6 @@ class ChatResponse(BaseModel):
     context_used: Optional[dict] = None
 
 
-def get_store_context(db: Session, user: models.User) -> dict:
-    """Fetch relevant store data to provide context to the AI"""
-    context = {}
-    
-    # Filter by user's store if not super admin
-    store_filter = {}
-    if user.role != models.UserRole.SUPER_ADMIN and user.store_id:
-        store_filter = {"store_id": user.store_id}
-    
-    try:
-        # Inventory Summary
-        products_query = db.query(models.Product)
-        if store_filter:
-            products_query = products_query.filter(models.Product.store_id == user.store_id)
-        
-        products = products_query.all()
-        total_products = len(products)
-        total_inventory_value = sum((p.cost_price or 0) * (p.current_stock or 0) for p in products)
-        low_stock_products = [p for p in products if (p.current_stock or 0) <= (p.minimum_stock or 5)]
-        out_of_stock = [p for p in products if (p.current_stock or 0) == 0]
-        
-        context["inventory"] = {
-            "total_products": total_products,
-            "total_inventory_value": round(total_inventory_value, 2),
-            "low_stock_count": len(low_stock_products),
-            "out_of_stock_count": len(out_of_stock),
-            "low_stock_items": [{"name": p.name, "stock": p.current_stock, "min_level": p.minimum_stock} 
-                               for p in low_stock_products[:10]],
-            "top_products_by_value": sorted(
-                [{"name": p.name, "value": round((p.cost_price or 0) * (p.current_stock or 0), 2)} 
-                 for p in products], 
-                key=lambda x: x["value"], reverse=True
-            )[:5]
-        }
-        
-        # Sales Summary (last 30 days)
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        sales_query = db.query(models.Sale).filter(models.Sale.sale_date >= thirty_days_ago)
-        if store_filter:
-            sales_query = sales_query.filter(models.Sale.store_id == user.store_id)
-        
-        sales = sales_query.all()
-        total_sales = sum(s.total_amount for s in sales)
-        total_transactions = len(sales)
-        
-        # Today's sales
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_sales = [s for s in sales if s.sale_date >= today_start]
-        today_revenue = sum(s.total_amount for s in today_sales)
-        
-        context["sales"] = {
-            "last_30_days_revenue": round(total_sales, 2),
-            "last_30_days_transactions": total_transactions,
-            "average_transaction_value": round(total_sales / total_transactions, 2) if total_transactions > 0 else 0,
-            "today_revenue": round(today_revenue, 2),
-            "today_transactions": len(today_sales)
-        }
-        
-        # Customer Summary
-        customers_query = db.query(models.Customer)
-        if store_filter:
-            customers_query = customers_query.filter(models.Customer.store_id == user.store_id)
-        
-        customers = customers_query.all()
-        total_customers = len(customers)
-        top_customers = sorted(customers, key=lambda c: c.total_purchases or 0, reverse=True)[:5]
-        
-        context["customers"] = {
-            "total_customers": total_customers,
-            "top_customers": [{"name": c.name, "total_purchases": round(c.total_purchases or 0, 2)} 
-                             for c in top_customers]
-        }
-        
-        # Financial Summary (expenses last 30 days)
-        expenses_query = db.query(models.Expense).filter(models.Expense.expense_date >= thirty_days_ago)
-        if store_filter:
-            expenses_query = expenses_query.filter(models.Expense.store_id == user.store_id)
-        
-        expenses = expenses_query.all()
-        total_expenses = sum(e.amount for e in expenses)
-        
-        # Group by category
-        expense_by_category = {}
-        for e in expenses:
-            cat = e.category or "Other"
-            expense_by_category[cat] = expense_by_category.get(cat, 0) + e.amount
-        
-        context["financial"] = {
-            "last_30_days_expenses": round(total_expenses, 2),
-            "estimated_profit": round(total_sales - total_expenses, 2),
-            "expense_breakdown": {k: round(v, 2) for k, v in expense_by_category.items()}
-        }
-        
-        # Store info
-        if user.store_id:
-            store = db.query(models.Store).filter(models.Store.id == user.store_id).first()
-            if store:
-                context["store"] = {
-                    "name": store.name,
-                    "address": store.address
-                }
-        
-    except Exception as e:
-        context["error"] = f"Error fetching some data: {str(e)}"
-    
-    return context
-
-
-def create_system_prompt(context: dict) -> str:
-    """Create a system prompt with store context"""
-    return f"""You are an AI assistant for SKOPE ERP, a retail management system. 
-You help store managers and staff understand their business data and answer questions about inventory, sales, customers, and finances.
-
-Here is the current store data you have access to:
-
-## Inventory Summary
-- Total Products: {context.get('inventory', {}).get('total_products', 'N/A')}
-- Total Inventory Value: ₹{context.get('inventory', {}).get('total_inventory_value', 'N/A')}
-- Low Stock Items: {context.get('inventory', {}).get('low_stock_count', 'N/A')}
-- Out of Stock Items: {context.get('inventory', {}).get('out_of_stock_count', 'N/A')}
-- Low Stock Products: {json.dumps(context.get('inventory', {}).get('low_stock_items', []), indent=2)}
-- Top Products by Value: {json.dumps(context.get('inventory', {}).get('top_products_by_value', []), indent=2)}
-
-## Sales Summary (Last 30 Days)
-- Total Revenue: ₹{context.get('sales', {}).get('last_30_days_revenue', 'N/A')}
-- Total Transactions: {context.get('sales', {}).get('last_30_days_transactions', 'N/A')}
-- Average Transaction Value: ₹{context.get('sales', {}).get('average_transaction_value', 'N/A')}
-- Today's Revenue: ₹{context.get('sales', {}).get('today_revenue', 'N/A')}
-- Today's Transactions: {context.get('sales', {}).get('today_transactions', 'N/A')}
-
-## Customer Summary
-- Total Customers: {context.get('customers', {}).get('total_customers', 'N/A')}
-- Top Customers: {json.dumps(context.get('customers', {}).get('top_customers', []), indent=2)}
-
-## Financial Summary (Last 30 Days)
-- Total Expenses: ₹{context.get('financial', {}).get('last_30_days_expenses', 'N/A')}
-- Estimated Profit: ₹{context.get('financial', {}).get('estimated_profit', 'N/A')}
-- Expense Breakdown: {json.dumps(context.get('financial', {}).get('expense_breakdown', {}), indent=2)}
-
-Instructions:
-1. Answer questions based on the data provided above
-2. Be helpful, concise, and professional
-3. If asked about data you don't have, politely say you don't have that specific information
-4. Use Indian Rupees (₹) for currency
-5. Provide actionable insights when relevant
-6. Format numbers nicely (e.g., ₹1,23,456.00)
-"""
-
-
 def generate_fallback_response(message: str, context: dict) -> ChatResponse:
     """Generate intelligent response using store context when Ollama is unavailable"""
     message_lower = message.lower()
@@ -284,98 +136,173 @@ Ask me about inventory, sales, customers, or finances for detailed insights!"""
         }
     )
 
+def build_messages(request: ChatRequest, snapshot: ContextSnapshot) -> List[dict]:
+    system_prompt, stats = build_system_prompt(snapshot.context, request.message, snapshot.product_index)
+    messages = [{"role": "system", "content": system_prompt}]
+    # Keep last 10 messages, fewer if they are long
+    messages.extend(trim_history(request.conversation_history[-10:]))
+    messages.append({"role": "user", "content": request.message})
+    logger.info(
+        "Chat prompt ~%d tokens (system %d tokens, %d chars, sections %s, %d products matched, %d history messages) built in %.1fms",
+        sum(estimate_tokens(str(message.get("content", ""))) for message in messages), stats.tokens, stats.chars,
+        ",".join(stats.sections), stats.products_matched, len(messages) - 2, stats.build_ms
+    )
+    return messages
+
+
+def context_summary(context: dict) -> dict:
+    return {
+        "inventory_items": context.get("inventory", {}).get("total_products", 0),
+        "sales_value": context.get("sales", {}).get("last_30_days_revenue", 0),
+        "customers": context.get("customers", {}).get("total_customers", 0)
+    }
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def fallback_answer(request: ChatRequest, snapshot: ContextSnapshot, store_id: Optional[int]) -> ChatResponse:
+    key = answer_cache.key(FALLBACK, request.message, store_id, snapshot)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return ChatResponse(**cached)
+    response = generate_fallback_response(request.message, snapshot.context)
+    answer_cache.set(key, response.model_dump())
+    return response
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_ai(
     request: ChatRequest,
-    db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Chat with AI assistant about store data"""
-    
-    # Get store context
-    context = get_store_context(db, current_user)
-    system_prompt = create_system_prompt(context)
-    
-    # Build messages for Ollama
-    messages = [{"role": "system", "content": system_prompt}]
-    
-    # Add conversation history
-    for msg in request.conversation_history[-10:]:  # Keep last 10 messages
-        messages.append(msg)
-    
-    # Add current message
-    messages.append({"role": "user", "content": request.message})
-    
+    timer = ollama.Timer()
+    store_id = context_scope(current_user)
+    snapshot = await get_chat_snapshot(current_user)
+    context = snapshot.context
+
+    key = answer_cache.key(LLM, request.message, store_id, snapshot, request.conversation_history[-10:])
+    cached = answer_cache.get(key)
+    if cached is not None:
+        timer.chunk()
+        timer.record("cached")
+        return ChatResponse(**cached)
+
+    messages = build_messages(request, snapshot)
     try:
-        # Call Ollama API
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{OLLAMA_BASE_URL}/api/chat",
-                json={
-                    "model": OLLAMA_MODEL,
-                    "messages": messages,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.7,
-                        "num_predict": 1000
-                    }
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"Ollama API error: {response.text}. Make sure Ollama is running with 'ollama serve'"
-                )
-            
-            result = response.json()
-            ai_response = result.get("message", {}).get("content", "I apologize, but I couldn't generate a response.")
-            
-            return ChatResponse(
-                response=ai_response,
-                context_used={
-                    "inventory_items": context.get("inventory", {}).get("total_products", 0),
-                    "sales_value": context.get("sales", {}).get("last_30_days_revenue", 0),
-                    "customers": context.get("customers", {}).get("total_customers", 0)
-                }
-            )
-            
-    except httpx.ConnectError:
-        # Fallback: provide intelligent response without Ollama
-        return generate_fallback_response(request.message, context)
-    except httpx.TimeoutException:
+        ai_response = await ollama.chat(messages)
+    except Exception:
         # Fallback: provide intelligent response without Ollama
-        return generate_fallback_response(request.message, context)
-    except Exception as e:
-        # Fallback: provide intelligent response without Ollama
-        return generate_fallback_response(request.message, context)
+        ollama.metrics.failed("blocking")
+        return fallback_answer(request, snapshot, store_id)
+
+    timer.chunk()
+    timer.record("blocking")
+    response = ChatResponse(response=ai_response, context_used=context_summary(context))
+    answer_cache.set(key, response.model_dump())
+    return response
+
+
+@router.post("/chat/stream")
+async def chat_with_ai_stream(
+    request: ChatRequest,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Chat with AI assistant, streaming the answer as server-sent events.
+
+    Events: ``context`` (what the answer is based on), one ``token`` per
+    chunk of text, then ``done`` - or ``error`` if Ollama fails mid-answer.
+    When Ollama can't be reached, or the answer is cached, it arrives as one token.
+    """
+    timer = ollama.Timer()
+    store_id = context_scope(current_user)
+    snapshot = await get_chat_snapshot(current_user)
+    context = snapshot.context
+    key = answer_cache.key(LLM, request.message, store_id, snapshot, request.conversation_history[-10:])
+    cached = answer_cache.get(key)
+    messages = build_messages(request, snapshot) if cached is None else None
+
+    async def events():
+        yield sse_event("context", context_summary(context))
+        if cached is not None:
+            timer.chunk()
+            timer.record("cached")
+            yield sse_event("token", {"content": cached["response"]})
+            yield sse_event("done", {"context_used": cached["context_used"]})
+            return
+
+        answer = []
+        try:
+            async for content in ollama.stream_chat(messages):
+                timer.chunk()
+                answer.append(content)
+                yield sse_event("token", {"content": content})
+        except (httpx.HTTPError, OllamaError, ValueError) as e:
+            ollama.metrics.failed("stream")
+            if timer.chunks:
+                yield sse_event("error", {"detail": f"Ollama stopped answering: {str(e)}"})
+                return
+            fallback = fallback_answer(request, snapshot, store_id)
+            timer.chunk()
+            timer.record("fallback")
+            yield sse_event("token", {"content": fallback.response})
+            yield sse_event("done", {"context_used": fallback.context_used})
+            return
+
+        timer.record("stream")
+        answer_cache.set(key, {"response": "".join(answer), "context_used": context_summary(context)})
+        yield sse_event("done", {
+            "context_used": context_summary(context),
+            "time_to_first_token_ms": round(timer.first_token * 1000, 1) if timer.first_token is not None else None
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies must pass chunks through as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/metrics")
+def get_chat_metrics(current_user: models.User = Depends(get_super_admin)):
+    """Chat latency per mode and answer cache hit rate (Super Admin only)"""
+    return {**ollama.metrics.stats(), "answer_cache": answer_cache.stats()}
+
+
+@router.delete("/cache")
+def clear_answer_cache(current_user: models.User = Depends(get_super_admin)):
+    """Drop every cached chatbot answer (Super Admin only)"""
+    answer_cache.clear()
+    return {"message": "Chatbot answer cache cleared"}
 
 
 @router.get("/status")
 async def check_ollama_status():
     """Check if Ollama is running and the model is available"""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # Check if Ollama is running
-            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags")
-            
-            if response.status_code != 200:
-                return {"status": "error", "message": "Ollama is not responding correctly"}
-            
-            models = response.json().get("models", [])
-            model_names = [m.get("name", "") for m in models]
-            
-            # Check if our model is available (accept any phi4 variant or check exact match)
-            phi4_available = any("phi4" in name.lower() or OLLAMA_MODEL.lower() in name.lower() for name in model_names)
-            
-            return {
-                "status": "online" if phi4_available else "model_missing",
-                "ollama_running": True,
-                "model_available": phi4_available,
-                "available_models": model_names,
-                "required_model": OLLAMA_MODEL,
-                "message": "Ready to chat!" if phi4_available else f"Model {OLLAMA_MODEL} not found. Run: ollama pull phi4"
-            }
+        # Check if Ollama is running
+        response = await http_client.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=10.0, retries=0)
+        
+        if response.status_code != 200:
+            return {"status": "error", "message": "Ollama is not responding correctly"}
+        
+        models = response.json().get("models", [])
+        model_names = [m.get("name", "") for m in models]
+        
+        # Check if our model is available (accept any phi4 variant or check exact match)
+        phi4_available = any("phi4" in name.lower() or OLLAMA_MODEL.lower() in name.lower() for name in model_names)
+        
+        return {
+            "status": "online" if phi4_available else "model_missing",
+            "ollama_running": True,
+            "model_available": phi4_available,
+            "available_models": model_names,
+            "required_model": OLLAMA_MODEL,
+            "message": "Ready to chat!" if phi4_available else f"Model {OLLAMA_MODEL} not found. Run: ollama pull phi4"
+        }
             
     except httpx.ConnectError:
         # Return online since we have fallback mode
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List
@@ -6,7 +6,8 @@ from app.db.database import get_db
 from app.db import models
 from app.schemas.customer import CustomerCreate, CustomerUpdate, CustomerResponse, CustomerWithPurchaseHistory
 from app.api.dependencies import get_current_user
-import json
+from app.api.pagination import keyset_paginate
+from app.services import audit
 
 router = APIRouter()
 
@@ -30,26 +31,19 @@ def create_customer(
     
     db_customer = models.Customer(**customer.model_dump())
     db.add(db_customer)
+    db.flush()
+    audit.record(db, current_user.id, "create", "customer", db_customer.id, {"name": db_customer.name, "phone": db_customer.phone})
     db.commit()
     db.refresh(db_customer)
     
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="customer",
-        entity_id=db_customer.id,
-        details=json.dumps({"name": db_customer.name, "phone": db_customer.phone})
-    )
-    db.add(audit_log)
-    db.commit()
-    
     return db_customer
 
 @router.get("/", response_model=List[CustomerResponse])
 def get_customers(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: str = None,
     store_id: int = None,
     search: str = None,
     db: Session = Depends(get_db),
@@ -70,8 +64,15 @@ def get_customers(
             (models.Customer.phone.ilike(f"%{search}%"))
         )
     
-    customers = query.offset(skip).limit(limit).all()
-    return customers
+    return keyset_paginate(
+        query,
+        [models.Customer.id],
+        response,
+        cursor=cursor,
+        limit=limit,
+        skip=skip,
+        descending=False
+    )
 
 @router.get("/{customer_id}", response_model=CustomerResponse)
 def get_customer(
@@ -173,20 +174,10 @@ def update_customer(
     for field, value in update_data.items():
         setattr(customer, field, value)
     
+    audit.record(db, current_user.id, "update", "customer", customer.id, update_data)
     db.commit()
     db.refresh(customer)
     
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="update",
-        entity_type="customer",
-        entity_id=customer.id,
-        details=json.dumps(update_data, default=str)
-    )
-    db.add(audit_log)
-    db.commit()
-    
     return customer
 
 @router.delete("/{customer_id}")
@@ -220,17 +211,7 @@ def delete_customer(
         )
     
     db.delete(customer)
-    db.commit()
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="delete",
-        entity_type="customer",
-        entity_id=customer_id,
-        details=json.dumps({"name": customer.name, "phone": customer.phone})
-    )
-    db.add(audit_log)
+    audit.record(db, current_user.id, "delete", "customer", customer_id, {"name": customer.name, "phone": customer.phone})
     db.commit()
     
     return {"message": "Customer deleted successfully"}
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Response, status, File, UploadFile
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.db.database import get_db
 from app.db import models
 from app.schemas.financial import ExpenseCreate, ExpenseUpdate, ExpenseResponse, DailyClosingReport
-from app.api.dependencies import get_current_user, get_store_manager_or_admin
-import json
+from app.api.dependencies import get_current_user, get_store_manager_or_admin, get_store_filter
+from app.api.pagination import keyset_paginate
+from app.services.rollups import sales_totals
+from app.core.cache import response_cache, SALES, EXPENSES, PRODUCTS
+from app.services import audit
 import os
 import shutil
 from pathlib import Path
@@ -23,29 +27,25 @@ def create_expense(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    expense_data = expense.model_dump()
+    if expense_data.get("expense_date") is None:
+        # Left to the server default rather than stored as NULL
+        expense_data.pop("expense_date", None)
     db_expense = models.Expense(
-        **expense.model_dump(),
+        **expense_data,
         created_by=current_user.id
     )
     
     db.add(db_expense)
+    db.flush()
+    audit.record(db, current_user.id, "create", "expense", db_expense.id, {
+        "category": db_expense.category,
+        "amount": db_expense.amount,
+        "description": db_expense.description
+    })
     db.commit()
     db.refresh(db_expense)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="expense",
-        entity_id=db_expense.id,
-        details=json.dumps({
-            "category": db_expense.category,
-            "amount": db_expense.amount,
-            "description": db_expense.description
-        })
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([EXPENSES], [db_expense.store_id])
     
     return db_expense
 
@@ -88,8 +88,10 @@ async def upload_voucher(
 
 @router.get("/expenses", response_model=List[ExpenseResponse])
 def get_expenses(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: str = None,
     store_id: int = None,
     category: str = None,
     start_date: datetime = None,
@@ -115,8 +117,14 @@ def get_expenses(
     if end_date:
         query = query.filter(models.Expense.expense_date <= end_date)
     
-    expenses = query.order_by(models.Expense.expense_date.desc()).offset(skip).limit(limit).all()
-    return expenses
+    return keyset_paginate(
+        query,
+        [models.Expense.expense_date, models.Expense.id],
+        response,
+        cursor=cursor,
+        limit=limit,
+        skip=skip
+    )
 
 @router.get("/expenses/{expense_id}", response_model=ExpenseResponse)
 def get_expense(
@@ -166,22 +174,16 @@ def update_expense(
             )
     
     update_data = expense_update.model_dump(exclude_unset=True)
+    if "expense_date" in update_data and update_data["expense_date"] is None:
+        # An expense always keeps its date
+        del update_data["expense_date"]
     for field, value in update_data.items():
         setattr(expense, field, value)
     
+    audit.record(db, current_user.id, "update", "expense", expense.id, update_data)
     db.commit()
     db.refresh(expense)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="update",
-        entity_type="expense",
-        entity_id=expense.id,
-        details=json.dumps(update_data, default=str)
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([EXPENSES], [expense.store_id])
     
     return expense
 
@@ -208,18 +210,9 @@ def delete_expense(
             )
     
     db.delete(expense)
+    audit.record(db, current_user.id, "delete", "expense", expense_id, {"category": expense.category, "amount": expense.amount})
     db.commit()
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="delete",
-        entity_type="expense",
-        entity_id=expense_id,
-        details=json.dumps({"category": expense.category, "amount": expense.amount})
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([EXPENSES], [expense.store_id])
     
     return {"message": "Expense deleted successfully"}
 
@@ -234,38 +227,35 @@ def get_daily_closing_report(
         date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     
     end_date = date + timedelta(days=1)
-    
-    # Get sales
-    sales_query = db.query(models.Sale).filter(
-        models.Sale.sale_date >= date,
-        models.Sale.sale_date < end_date
-    )
-    
-    # Get expenses
-    expenses_query = db.query(models.Expense).filter(
+    store_ids = get_store_filter(current_user, store_id)
+    
+    # Sales from the daily rollup
+    totals = sales_totals(db, date.date(), end_date.date(), store_ids)
+    by_mode = totals["by_payment_mode"]
+    
+    def collected(mode: models.PaymentMode) -> float:
+        return by_mode.get(mode, {}).get("total_amount", 0)
+    
+    total_sales = totals["total_amount"]
+    cash_collected = collected(models.PaymentMode.CASH)
+    card_collected = collected(models.PaymentMode.CARD)
+    upi_collected = collected(models.PaymentMode.UPI)
+    qr_code_collected = collected(models.PaymentMode.QR_CODE)
+    
+    # Expenses summed in the database, per payment mode
+    expenses_query = db.query(
+        models.Expense.payment_mode,
+        func.coalesce(func.sum(models.Expense.amount), 0)
+    ).filter(
         models.Expense.expense_date >= date,
         models.Expense.expense_date < end_date
     )
+    if store_ids is not None:
+        expenses_query = expenses_query.filter(models.Expense.store_id.in_(store_ids))
+    expenses_by_mode = dict(expenses_query.group_by(models.Expense.payment_mode).all())
     
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        sales_query = sales_query.filter(models.Sale.store_id == current_user.store_id)
-        expenses_query = expenses_query.filter(models.Expense.store_id == current_user.store_id)
-    elif store_id:
-        sales_query = sales_query.filter(models.Sale.store_id == store_id)
-        expenses_query = expenses_query.filter(models.Expense.store_id == store_id)
-    
-    sales = sales_query.all()
-    expenses = expenses_query.all()
-    
-    total_sales = sum(sale.total_amount for sale in sales)
-    cash_collected = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.CASH)
-    card_collected = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.CARD)
-    upi_collected = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.UPI)
-    qr_code_collected = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.QR_CODE)
-    
-    total_expenses = sum(expense.amount for expense in expenses)
-    cash_expenses = sum(expense.amount for expense in expenses if expense.payment_mode == models.PaymentMode.CASH)
+    total_expenses = sum(expenses_by_mode.values())
+    cash_expenses = expenses_by_mode.get(models.PaymentMode.CASH, 0)
     
     net_cash_in_hand = cash_collected - cash_expenses
     
@@ -278,7 +268,7 @@ def get_daily_closing_report(
         "qr_code_collected": qr_code_collected,
         "total_expenses": total_expenses,
         "net_cash_in_hand": net_cash_in_hand,
-        "total_transactions": len(sales)
+        "total_transactions": totals["transaction_count"]
     }
 
 @router.get("/dashboard/stats")
@@ -286,8 +276,16 @@ def get_financial_dashboard(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    store_ids = None if current_user.role == models.UserRole.SUPER_ADMIN else [current_user.store_id]
     # Get today's data
     today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    # COGS reads product cost prices
+    return response_cache.cached(
+        "financial.dashboard", store_ids, {"today": today}, [SALES, EXPENSES, PRODUCTS],
+        lambda: _financial_dashboard(db, store_ids, today)
+    )
+
+def _financial_dashboard(db: Session, store_ids, today):
     end_today = today + timedelta(days=1)
     
     # Get this month's data
@@ -302,9 +300,9 @@ def get_financial_dashboard(
     )
     expenses_query = db.query(models.Expense)
     
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        sales_query = sales_query.filter(models.Sale.store_id == current_user.store_id)
-        expenses_query = expenses_query.filter(models.Expense.store_id == current_user.store_id)
+    if store_ids is not None:
+        sales_query = sales_query.filter(models.Sale.store_id.in_(store_ids))
+        expenses_query = expenses_query.filter(models.Expense.store_id.in_(store_ids))
     
     # Today's stats
     today_sales = sales_query.filter(
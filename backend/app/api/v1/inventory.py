@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.db.database import get_db
 from app.db import models
 from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, BatchCreate, BatchResponse
 from app.api.dependencies import get_current_user, get_store_manager_or_admin
-import json
+from app.api.pagination import keyset_paginate
+from app.core.cache import response_cache, PRODUCTS, SALES
+from app.services import audit
 
 router = APIRouter()
 
@@ -29,26 +31,20 @@ def create_product(
     
     db_product = models.Product(**product.model_dump())
     db.add(db_product)
+    db.flush()
+    audit.record(db, current_user.id, "create", "product", db_product.id, {"sku": db_product.sku, "name": db_product.name})
     db.commit()
     db.refresh(db_product)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="product",
-        entity_id=db_product.id,
-        details=json.dumps({"sku": db_product.sku, "name": db_product.name})
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([PRODUCTS], [db_product.store_id])
     
     return db_product
 
 @router.get("/products", response_model=List[ProductResponse])
 def get_products(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: str = None,
     store_id: int = None,
     low_stock: bool = False,
     db: Session = Depends(get_db),
@@ -66,8 +62,15 @@ def get_products(
     if low_stock:
         query = query.filter(models.Product.current_stock <= models.Product.minimum_stock)
     
-    products = query.filter(models.Product.is_active == True).offset(skip).limit(limit).all()
-    return products
+    return keyset_paginate(
+        query.filter(models.Product.is_active == True),
+        [models.Product.id],
+        response,
+        cursor=cursor,
+        limit=limit,
+        skip=skip,
+        descending=False
+    )
 
 @router.get("/products/{product_id}", response_model=ProductResponse)
 def get_product(
@@ -116,23 +119,15 @@ def update_product(
                 detail="Not enough permissions"
             )
     
+    previous_store_id = product.store_id
     update_data = product_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(product, field, value)
     
+    audit.record(db, current_user.id, "update", "product", product.id, update_data)
     db.commit()
     db.refresh(product)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="update",
-        entity_type="product",
-        entity_id=product.id,
-        details=json.dumps(update_data, default=str)
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([PRODUCTS], [previous_store_id, product.store_id])
     
     return product
 
@@ -172,19 +167,11 @@ def create_batch(
     # Update product stock
     product.current_stock += batch.quantity
     
+    db.flush()
+    audit.record(db, current_user.id, "create", "batch", db_batch.id, {"batch_id": db_batch.batch_id, "product_id": batch.product_id, "quantity": batch.quantity})
     db.commit()
     db.refresh(db_batch)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="batch",
-        entity_id=db_batch.id,
-        details=json.dumps({"batch_id": db_batch.batch_id, "product_id": batch.product_id, "quantity": batch.quantity})
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([PRODUCTS], [product.store_id])
     
     return db_batch
 
@@ -209,10 +196,18 @@ def get_inventory_dashboard(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    store_ids = None if current_user.role == models.UserRole.SUPER_ADMIN else [current_user.store_id]
+    # Sales decrement stock
+    return response_cache.cached(
+        "inventory.dashboard", store_ids, None, [PRODUCTS, SALES],
+        lambda: _inventory_dashboard(db, store_ids)
+    )
+
+def _inventory_dashboard(db: Session, store_ids):
     # Get total products
     query = db.query(models.Product)
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Product.store_id == current_user.store_id)
+    if store_ids is not None:
+        query = query.filter(models.Product.store_id.in_(store_ids))
     
     total_products = query.filter(models.Product.is_active == True).count()
     low_stock_products = query.filter(
@@ -227,7 +222,7 @@ def get_inventory_dashboard(
     total_stock_value = db.query(
         models.Product
     ).filter(
-        models.Product.store_id == current_user.store_id if current_user.role != models.UserRole.SUPER_ADMIN else True
+        models.Product.store_id.in_(store_ids) if store_ids is not None else True
     ).with_entities(
         models.Product.current_stock * models.Product.cost_price
     ).all()
@@ -13,7 +13,7 @@ from app.schemas.marketing import (
     MetaAdsAuthRequest
 )
 from app.api.dependencies import get_current_user
-import json
+from app.services import audit
 
 router = APIRouter()
 
@@ -90,23 +90,14 @@ def create_integration(
     )
     
     db.add(db_integration)
+    db.flush()
+    audit.record(db, current_user.id, "create", "marketing_integration", db_integration.id, {
+        "platform": db_integration.platform,
+        "account_name": db_integration.account_name
+    })
     db.commit()
     db.refresh(db_integration)
     
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="marketing_integration",
-        entity_id=db_integration.id,
-        details=json.dumps({
-            "platform": db_integration.platform,
-            "account_name": db_integration.account_name
-        })
-    )
-    db.add(audit_log)
-    db.commit()
-    
     return db_integration
 
 @router.delete("/integrations/{integration_id}")
@@ -0,0 +1,108 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import List
+from app.db.database import get_db
+from app.db import models
+from app.schemas.report_job import ReportJobCreate, ReportJobResponse
+from app.api.dependencies import get_current_user
+from app.api.v1.reports import JOB_EXPORTS, parse_date_range
+from app.services.exports import EXPORT_FORMATS, check_format
+from app.services.report_jobs import (
+    COMPLETED, EXPIRED, can_access_job, expire_job, is_expired, purge_expired_jobs, submit_job
+)
+
+router = APIRouter()
+
+def _job_response(job: models.ReportJob) -> ReportJobResponse:
+    response = ReportJobResponse.model_validate(job)
+    if job.status == COMPLETED:
+        response.download_url = f"/api/v1/reports/jobs/{job.id}/download"
+    return response
+
+def _get_job(db: Session, job_id: str, current_user: models.User) -> models.ReportJob:
+    job = db.query(models.ReportJob).filter(models.ReportJob.id == job_id).first()
+    if not job or not can_access_job(job, current_user):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report job not found"
+        )
+    return job
+
+@router.post("/", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_report_job(
+    job: ReportJobCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Queue a report export; identical running or recently finished jobs are reused"""
+    build_export = JOB_EXPORTS.get(job.report)
+    if build_export is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown report '{job.report}', use one of: {', '.join(JOB_EXPORTS)}"
+        )
+    export_format = check_format(job.format)
+
+    # Dates resolve here, at submission. Jobs de-duplicate on what was asked for,
+    # so a reused job covers an open range as resolved when it was first queued.
+    params = {
+        "start_date": job.start_date,
+        "end_date": job.end_date,
+        "store_id": job.store_id
+    }
+    start_dt, end_dt = parse_date_range(job.start_date, job.end_date)
+
+    def build(job_db: Session, user: models.User):
+        return build_export(job_db, user, start_dt, end_dt, job.store_id)
+
+    purge_expired_jobs(db)
+    return _job_response(submit_job(db, job.report, params, export_format, current_user, build))
+
+@router.get("/", response_model=List[ReportJobResponse])
+def get_report_jobs(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    query = db.query(models.ReportJob)
+    if current_user.role != models.UserRole.SUPER_ADMIN:
+        query = query.filter(models.ReportJob.store_id == current_user.store_id)
+
+    jobs = query.order_by(models.ReportJob.created_at.desc()).limit(limit).all()
+    return [_job_response(job) for job in jobs]
+
+@router.get("/{job_id}", response_model=ReportJobResponse)
+def get_report_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    return _job_response(_get_job(db, job_id, current_user))
+
+@router.get("/{job_id}/download")
+def download_report_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    job = _get_job(db, job_id, current_user)
+
+    if job.status == COMPLETED and is_expired(job):
+        expire_job(db, job)
+    if job.status == EXPIRED:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Report file has expired, please submit the job again"
+        )
+    if job.status != COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Report job is {job.status}"
+        )
+
+    return FileResponse(
+        job.file_path,
+        media_type=EXPORT_FORMATS[job.export_format],
+        filename=job.filename
+    )
@@ -5,9 +5,9 @@ from datetime import datetime, timedelta
 from typing import Optional, List
 from app.db.database import get_db
 from app.db import models
-from app.api.dependencies import get_current_user
-import io
-import pandas as pd
+from app.api.dependencies import get_current_user, get_store_filter
+from app.services.exports import ExportSheet, dict_rows, export_response, stream_query
+from app.services.rollups import sales_totals
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -30,61 +30,29 @@ def get_daily_sales_summary(
     if not date:
         date = datetime.now()
     
-    # Set date range for today
-    start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_of_day = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+    store_ids = get_store_filter(current_user)
+    day = date.date()
+    next_day = day + timedelta(days=1)
     
-    # Yesterday
-    yesterday = date - timedelta(days=1)
-    start_yesterday = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_yesterday = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
-    # Same day last week
-    last_week = date - timedelta(days=7)
-    start_last_week = last_week.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_last_week = last_week.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
-    # Query for today
-    query = db.query(models.Sale).filter(models.Sale.sale_date >= start_of_day, models.Sale.sale_date <= end_of_day)
-    
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Sale.store_id == current_user.store_id)
-    
-    today_sales = query.all()
-    
-    # Calculate today's metrics
-    total_sales_today = sum(sale.total_amount for sale in today_sales)
-    num_bills_today = len(today_sales)
+    # Today, from the daily rollup
+    today_totals = sales_totals(db, day, next_day, store_ids)
+    total_sales_today = today_totals["total_amount"]
+    num_bills_today = today_totals["transaction_count"]
     avg_bill_value_today = total_sales_today / num_bills_today if num_bills_today > 0 else 0
     
     # Payment mode breakdown
-    payment_breakdown = {}
-    for sale in today_sales:
-        mode = sale.payment_mode.value
-        payment_breakdown[mode] = payment_breakdown.get(mode, 0) + sale.total_amount
+    payment_breakdown = {
+        mode.value: mode_totals["total_amount"]
+        for mode, mode_totals in today_totals["by_payment_mode"].items()
+    }
     
     # Yesterday comparison
-    query_yesterday = db.query(models.Sale).filter(
-        models.Sale.sale_date >= start_yesterday,
-        models.Sale.sale_date <= end_yesterday
-    )
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query_yesterday = query_yesterday.filter(models.Sale.store_id == current_user.store_id)
-    
-    yesterday_sales = query_yesterday.all()
-    total_sales_yesterday = sum(sale.total_amount for sale in yesterday_sales)
+    total_sales_yesterday = sales_totals(db, day - timedelta(days=1), day, store_ids)["total_amount"]
     
     # Last week same day comparison
-    query_last_week = db.query(models.Sale).filter(
-        models.Sale.sale_date >= start_last_week,
-        models.Sale.sale_date <= end_last_week
-    )
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query_last_week = query_last_week.filter(models.Sale.store_id == current_user.store_id)
-    
-    last_week_sales = query_last_week.all()
-    total_sales_last_week = sum(sale.total_amount for sale in last_week_sales)
+    total_sales_last_week = sales_totals(
+        db, day - timedelta(days=7), next_day - timedelta(days=7), store_ids
+    )["total_amount"]
     
     # Calculate percentage changes
     vs_yesterday = ((total_sales_today - total_sales_yesterday) / total_sales_yesterday * 100) if total_sales_yesterday > 0 else 0
@@ -395,38 +363,50 @@ def get_staff_attendance_sales_correlation(
 
 # ============ C. INVENTORY & STOCK ANALYTICS ============
 
+def _last_sold_subquery(db: Session):
+    """MAX(sale_date) per product, for joining onto the product list"""
+    return db.query(
+        models.SaleItem.product_id,
+        func.max(models.Sale.sale_date).label('last_sold')
+    ).join(
+        models.Sale, models.Sale.id == models.SaleItem.sale_id
+    ).group_by(models.SaleItem.product_id).subquery()
+
 @router.get("/inventory/live-stock")
 def get_live_stock_report(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Live Stock Report"""
-    query = db.query(models.Product)
+    last_sold = _last_sold_subquery(db)
+    
+    # One query: products joined to their store and last sale date
+    query = db.query(
+        models.Product.name,
+        models.Product.sku,
+        models.Product.current_stock,
+        models.Store.name.label('store_name'),
+        last_sold.c.last_sold
+    ).outerjoin(
+        models.Store, models.Store.id == models.Product.store_id
+    ).outerjoin(
+        last_sold, last_sold.c.product_id == models.Product.id
+    )
     
     # Filter by store
     if current_user.role != models.UserRole.SUPER_ADMIN:
         query = query.filter(models.Product.store_id == current_user.store_id)
     
-    products = query.filter(models.Product.is_active == True).all()
+    products = query.filter(models.Product.is_active == True).order_by(models.Product.id).all()
     
     stock_report = []
     for product in products:
-        # Get last sold date
-        last_sale = db.query(models.Sale.sale_date).join(
-            models.SaleItem, models.Sale.id == models.SaleItem.sale_id
-        ).filter(
-            models.SaleItem.product_id == product.id
-        ).order_by(models.Sale.sale_date.desc()).first()
-        
-        # Get store name
-        store = db.query(models.Store).filter(models.Store.id == product.store_id).first()
-        
         stock_report.append({
             "item_name": product.name,
             "sku": product.sku,
             "available_quantity": product.current_stock,
-            "store_location": store.name if store else "Unknown",
-            "last_sold_date": last_sale[0].strftime("%Y-%m-%d") if last_sale else "Never"
+            "store_location": product.store_name or "Unknown",
+            "last_sold_date": product.last_sold.strftime("%Y-%m-%d") if product.last_sold else "Never"
         })
     
     return {"stock_report": stock_report}
@@ -437,25 +417,28 @@ def get_stock_movement_analysis(
     current_user: models.User = Depends(get_current_user)
 ):
     """Fast Moving vs Slow Moving Items"""
-    query = db.query(models.Product)
+    last_sold = _last_sold_subquery(db)
+    
+    query = db.query(
+        models.Product.name,
+        models.Product.sku,
+        models.Product.current_stock,
+        last_sold.c.last_sold
+    ).outerjoin(
+        last_sold, last_sold.c.product_id == models.Product.id
+    )
     
     # Filter by store
     if current_user.role != models.UserRole.SUPER_ADMIN:
         query = query.filter(models.Product.store_id == current_user.store_id)
     
-    products = query.filter(models.Product.is_active == True).all()
+    products = query.filter(models.Product.is_active == True).order_by(models.Product.id).all()
     
+    now = datetime.now()
     stock_analysis = []
     for product in products:
-        # Get last sold date
-        last_sale = db.query(models.Sale.sale_date).join(
-            models.SaleItem, models.Sale.id == models.SaleItem.sale_id
-        ).filter(
-            models.SaleItem.product_id == product.id
-        ).order_by(models.Sale.sale_date.desc()).first()
-        
-        if last_sale:
-            days_since_last_sale = (datetime.now() - last_sale[0]).days
+        if product.last_sold:
+            days_since_last_sale = (now - product.last_sold).days
         else:
             days_since_last_sale = 999
         
@@ -516,30 +499,43 @@ def get_high_value_stock_report(
     current_user: models.User = Depends(get_current_user)
 ):
     """High-Value Stock Report - items with high stock value"""
-    query = db.query(models.Product)
+    stock_value = models.Product.current_stock * func.coalesce(models.Product.cost_price, 0)
+    
+    # Units sold per product in the last 60 days
+    sixty_days_ago = datetime.now() - timedelta(days=60)
+    recent_sales = db.query(
+        models.SaleItem.product_id,
+        func.sum(models.SaleItem.quantity).label('quantity')
+    ).join(
+        models.Sale, models.SaleItem.sale_id == models.Sale.id
+    ).filter(
+        models.Sale.sale_date >= sixty_days_ago
+    ).group_by(models.SaleItem.product_id).subquery()
+    
+    query = db.query(
+        models.Product.name,
+        models.Product.sku,
+        models.Product.current_stock,
+        models.Product.cost_price,
+        stock_value.label('stock_value'),
+        func.coalesce(recent_sales.c.quantity, 0).label('sales_count')
+    ).outerjoin(
+        recent_sales, recent_sales.c.product_id == models.Product.id
+    )
     
     # Filter by store
     if current_user.role != models.UserRole.SUPER_ADMIN:
         query = query.filter(models.Product.store_id == current_user.store_id)
     
-    products = query.filter(models.Product.is_active == True).all()
+    # Include items with stock value >= 10000 (lowered from 50000), highest first
+    products = query.filter(
+        models.Product.is_active == True,
+        stock_value >= 10000
+    ).order_by(stock_value.desc()).all()
     
     high_value_report = []
     for product in products:
-        stock_value = product.current_stock * (product.cost_price or 0)
-        
-        # Include items with stock value > 10000 (lowered from 50000)
-        if stock_value < 10000:
-            continue
-        
-        # Get sales in last 60 days
-        sixty_days_ago = datetime.now() - timedelta(days=60)
-        sales_count = db.query(func.sum(models.SaleItem.quantity)).join(
-            models.Sale, models.SaleItem.sale_id == models.Sale.id
-        ).filter(
-            models.SaleItem.product_id == product.id,
-            models.Sale.sale_date >= sixty_days_ago
-        ).scalar() or 0
+        sales_count = product.sales_count or 0
         
         # Determine movement status
         if sales_count < 5:
@@ -554,15 +550,12 @@ def get_high_value_stock_report(
             "sku": product.sku,
             "current_stock": product.current_stock,
             "cost_per_unit": round(product.cost_price or 0, 2),
-            "stock_value": round(stock_value, 2),
+            "stock_value": round(product.stock_value, 2),
             "sales_last_60_days": int(sales_count),
             "movement_status": movement_status,
-            "capital_blocked": round(stock_value, 2)
+            "capital_blocked": round(product.stock_value, 2)
         })
     
-    # Sort by stock value descending
-    high_value_report.sort(key=lambda x: x['stock_value'], reverse=True)
-    
     return {"high_value_stock": high_value_report}
 
 # ============ D. PROFITABILITY & FINANCE REPORTS ============
@@ -978,435 +971,457 @@ def get_customer_purchase_history(
         "accessory_suggestions": list(set(accessory_suggestions))[:5]
     }
 
-@router.get("/sales/excel")
-def download_sales_report_excel(
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None,
-    store_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
-):
-    query = db.query(models.Sale)
-    
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Sale.store_id == current_user.store_id)
-    elif store_id:
-        query = query.filter(models.Sale.store_id == store_id)
-    
-    # Filter by date range
+# ============ EXCEL / CSV EXPORTS ============
+# Every export streams through app.services.exports; pass format=csv for CSV.
+# The build_*_export functions return (sheets, filename) so the same exports
+# can run as background jobs (see report_jobs.py and JOB_EXPORTS below).
+
+def parse_date_range(start_date: Optional[str], end_date: Optional[str]):
+    """Parse ISO date strings, defaulting to the current month"""
+    try:
+        if start_date:
+            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+        else:
+            start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        
+        if end_date:
+            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
+        else:
+            end_dt = datetime.now()
+    except (ValueError, AttributeError):
+        # If date parsing fails, use current month
+        start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_dt = datetime.now()
+    return start_dt, end_dt
+
+def _range_suffix(start_date: Optional[datetime], end_date: Optional[datetime]) -> str:
+    start_dt = start_date or datetime.now().replace(day=1)
+    end_dt = end_date or datetime.now()
+    return f"{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}"
+
+def _default_range(start_date: Optional[datetime], end_date: Optional[datetime]):
     if not start_date:
         start_date = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     if not end_date:
         end_date = datetime.now()
-    
-    query = query.filter(
-        models.Sale.sale_date >= start_date,
-        models.Sale.sale_date <= end_date
+    return start_date, end_date
+
+def _scope(query, store_column, current_user: models.User, store_id: Optional[int]):
+    if current_user.role != models.UserRole.SUPER_ADMIN:
+        return query.filter(store_column == current_user.store_id)
+    if store_id:
+        return query.filter(store_column == store_id)
+    return query
+
+def build_sales_export(
+    db: Session,
+    current_user: models.User,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    store_id: Optional[int] = None
+):
+    start_date, end_date = _default_range(start_date, end_date)
+    
+    query = _scope(
+        db.query(
+            models.Sale.invoice_number,
+            models.Sale.sale_date,
+            models.Customer.name.label('customer_name'),
+            models.Sale.subtotal,
+            models.Sale.gst_amount,
+            models.Sale.discount,
+            models.Sale.total_amount,
+            models.Sale.payment_mode
+        ).outerjoin(
+            models.Customer, models.Sale.customer_id == models.Customer.id
+        ).filter(
+            models.Sale.sale_date >= start_date,
+            models.Sale.sale_date <= end_date
+        ),
+        models.Sale.store_id, current_user, store_id
     )
     
-    sales = query.all()
+    rows = (
+        (
+            row.invoice_number,
+            row.sale_date.strftime("%Y-%m-%d %H:%M:%S"),
+            row.customer_name or "Walk-in",
+            row.subtotal,
+            row.gst_amount,
+            row.discount,
+            row.total_amount,
+            row.payment_mode
+        )
+        for row in stream_query(query.order_by(models.Sale.sale_date, models.Sale.id))
+    )
     
-    # Prepare data for Excel
-    data = []
-    for sale in sales:
-        data.append({
-            "Invoice Number": sale.invoice_number,
-            "Date": sale.sale_date.strftime("%Y-%m-%d %H:%M:%S"),
-            "Customer": sale.customer.name if sale.customer else "Walk-in",
-            "Subtotal": sale.subtotal,
-            "GST Amount": sale.gst_amount,
-            "Discount": sale.discount,
-            "Total Amount": sale.total_amount,
-            "Payment Mode": sale.payment_mode.value
-        })
+    sheet = ExportSheet(
+        'Sales Report',
+        ["Invoice Number", "Date", "Customer", "Subtotal", "GST Amount", "Discount", "Total Amount", "Payment Mode"],
+        rows,
+        count=query.count
+    )
+    return [sheet], f"sales_report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+
+def build_inventory_export(
+    db: Session,
+    current_user: models.User,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    store_id: Optional[int] = None
+):
+    query = _scope(
+        db.query(
+            models.Product.sku,
+            models.Product.name,
+            models.Product.category,
+            models.Product.brand,
+            models.Product.unit_price,
+            models.Product.cost_price,
+            models.Product.current_stock,
+            models.Product.minimum_stock,
+            models.Product.gst_rate,
+            models.Product.warranty_months
+        ).filter(models.Product.is_active == True),
+        models.Product.store_id, current_user, store_id
+    )
     
-    df = pd.DataFrame(data)
+    rows = (
+        (
+            row.sku,
+            row.name,
+            row.category or "",
+            row.brand or "",
+            row.unit_price,
+            row.cost_price or 0,
+            row.current_stock,
+            row.minimum_stock,
+            (row.cost_price or 0) * row.current_stock,
+            row.gst_rate,
+            row.warranty_months
+        )
+        for row in stream_query(query.order_by(models.Product.id))
+    )
     
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Sales Report')
+    sheet = ExportSheet(
+        'Inventory Report',
+        ["SKU", "Name", "Category", "Brand", "Unit Price", "Cost Price", "Current Stock",
+         "Minimum Stock", "Stock Value", "GST Rate", "Warranty (Months)"],
+        rows,
+        count=query.count
+    )
+    return [sheet], f"inventory_report_{datetime.now().strftime('%Y%m%d')}"
+
+def build_expenses_export(
+    db: Session,
+    current_user: models.User,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    store_id: Optional[int] = None
+):
+    start_date, end_date = _default_range(start_date, end_date)
+    
+    query = _scope(
+        db.query(
+            models.Expense.expense_date,
+            models.Expense.category,
+            models.Expense.description,
+            models.Expense.amount,
+            models.Expense.payment_mode,
+            models.Expense.vendor_name,
+            models.Expense.receipt_number
+        ).filter(
+            models.Expense.expense_date >= start_date,
+            models.Expense.expense_date <= end_date
+        ),
+        models.Expense.store_id, current_user, store_id
+    )
     
-    output.seek(0)
+    rows = (
+        (
+            row.expense_date.strftime("%Y-%m-%d %H:%M:%S"),
+            row.category,
+            row.description,
+            row.amount,
+            row.payment_mode,
+            row.vendor_name or "",
+            row.receipt_number or ""
+        )
+        for row in stream_query(query.order_by(models.Expense.expense_date, models.Expense.id))
+    )
     
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=sales_report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.xlsx"}
+    sheet = ExportSheet(
+        'Expenses Report',
+        ["Date", "Category", "Description", "Amount", "Payment Mode", "Vendor", "Receipt Number"],
+        rows,
+        count=query.count
     )
+    return [sheet], f"expenses_report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
 
-@router.get("/inventory/excel")
-def download_inventory_report_excel(
-    store_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+def build_customers_export(
+    db: Session,
+    current_user: models.User,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    store_id: Optional[int] = None
 ):
-    query = db.query(models.Product)
+    # Purchase counts in one grouped subquery instead of a COUNT per customer
+    purchase_counts = db.query(
+        models.Sale.customer_id,
+        func.count(models.Sale.id).label('purchase_count')
+    ).filter(
+        models.Sale.customer_id.isnot(None)
+    ).group_by(models.Sale.customer_id).subquery()
+    
+    query = _scope(
+        db.query(
+            models.Customer.name,
+            models.Customer.phone,
+            models.Customer.email,
+            models.Customer.address,
+            models.Customer.gst_number,
+            models.Customer.total_purchases,
+            func.coalesce(purchase_counts.c.purchase_count, 0).label('purchase_count'),
+            models.Customer.created_at
+        ).outerjoin(
+            purchase_counts, purchase_counts.c.customer_id == models.Customer.id
+        ),
+        models.Customer.store_id, current_user, store_id
+    )
     
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Product.store_id == current_user.store_id)
-    elif store_id:
-        query = query.filter(models.Product.store_id == store_id)
+    rows = (
+        (
+            row.name,
+            row.phone,
+            row.email or "",
+            row.address or "",
+            row.gst_number or "",
+            row.total_purchases,
+            row.purchase_count,
+            row.created_at.strftime("%Y-%m-%d") if row.created_at else ""
+        )
+        for row in stream_query(query.order_by(models.Customer.id))
+    )
     
-    products = query.filter(models.Product.is_active == True).all()
+    sheet = ExportSheet(
+        'Customers Report',
+        ["Name", "Phone", "Email", "Address", "GST Number", "Total Purchases", "Purchase Count", "Joined Date"],
+        rows,
+        count=query.count
+    )
+    return [sheet], f"customers_report_{datetime.now().strftime('%Y%m%d')}"
+
+def build_profit_loss_export(
+    db: Session,
+    current_user: models.User,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    store_id: Optional[int] = None
+):
+    start_dt, end_dt = _default_range(start_date, end_date)
+    
+    # Revenue, summed in the database
+    total_revenue, total_gst_collected, total_discounts = _scope(
+        db.query(
+            func.coalesce(func.sum(models.Sale.total_amount), 0),
+            func.coalesce(func.sum(models.Sale.gst_amount), 0),
+            func.coalesce(func.sum(models.Sale.discount), 0)
+        ).filter(
+            models.Sale.sale_date >= start_dt,
+            models.Sale.sale_date <= end_dt
+        ),
+        models.Sale.store_id, current_user, store_id
+    ).one()
+    
+    # Cost of Goods Sold
+    cogs = _scope(
+        db.query(
+            func.coalesce(func.sum(func.coalesce(models.Product.cost_price, 0) * models.SaleItem.quantity), 0)
+        ).join(
+            models.Sale, models.SaleItem.sale_id == models.Sale.id
+        ).join(
+            models.Product, models.SaleItem.product_id == models.Product.id
+        ).filter(
+            models.Sale.sale_date >= start_dt,
+            models.Sale.sale_date <= end_dt
+        ),
+        models.Sale.store_id, current_user, store_id
+    ).scalar()
+    
+    # Expenses by category
+    expense_by_category = _scope(
+        db.query(
+            models.Expense.category,
+            func.sum(models.Expense.amount)
+        ).filter(
+            models.Expense.expense_date >= start_dt,
+            models.Expense.expense_date <= end_dt
+        ),
+        models.Expense.store_id, current_user, store_id
+    ).group_by(models.Expense.category).all()
     
-    # Prepare data for Excel
-    data = []
-    for product in products:
-        stock_value = (product.cost_price or 0) * product.current_stock
-        data.append({
-            "SKU": product.sku,
-            "Name": product.name,
-            "Category": product.category or "",
-            "Brand": product.brand or "",
-            "Unit Price": product.unit_price,
-            "Cost Price": product.cost_price or 0,
-            "Current Stock": product.current_stock,
-            "Minimum Stock": product.minimum_stock,
-            "Stock Value": stock_value,
-            "GST Rate": product.gst_rate,
-            "Warranty (Months)": product.warranty_months
-        })
+    total_expenses = sum(amount or 0 for _, amount in expense_by_category)
     
-    df = pd.DataFrame(data)
+    # Calculate profitability
+    gross_profit = total_revenue - cogs
+    net_profit = gross_profit - total_expenses
     
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Inventory Report')
+    rows = [
+        ("=== REVENUE ===", ""),
+        ("Total Sales", total_revenue),
+        ("GST Collected", total_gst_collected),
+        ("Discounts Given", -total_discounts),
+        ("", ""),
+        ("=== COST OF GOODS SOLD ===", ""),
+        ("Cost of Goods Sold (COGS)", -cogs),
+        ("GROSS PROFIT", gross_profit),
+        ("", ""),
+        ("=== OPERATING EXPENSES ===", "")
+    ]
+    rows.extend((f"{category.title()}", -(amount or 0)) for category, amount in expense_by_category)
+    rows.extend([
+        ("Total Operating Expenses", -total_expenses),
+        ("", ""),
+        ("=== NET PROFIT/LOSS ===", ""),
+        ("NET PROFIT", net_profit),
+        ("Profit Margin %", f"{(net_profit / total_revenue * 100) if total_revenue > 0 else 0:.2f}%")
+    ])
+    
+    sheet = ExportSheet('Profit & Loss', ["Item", "Amount"], rows)
+    return [sheet], f"profit_loss_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}"
+
+def build_tax_export(
+    db: Session,
+    current_user: models.User,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    store_id: Optional[int] = None
+):
+    start_dt, end_dt = _default_range(start_date, end_date)
+    
+    # Group by GST rate in the database
+    gst_breakdown = _scope(
+        db.query(
+            models.SaleItem.gst_rate,
+            func.sum(models.SaleItem.unit_price * models.SaleItem.quantity).label('taxable_value'),
+            func.sum(models.SaleItem.gst_amount).label('gst_amount'),
+            func.sum(models.SaleItem.total_price).label('total')
+        ).join(
+            models.Sale, models.SaleItem.sale_id == models.Sale.id
+        ).filter(
+            models.Sale.sale_date >= start_dt,
+            models.Sale.sale_date <= end_dt
+        ),
+        models.Sale.store_id, current_user, store_id
+    ).group_by(models.SaleItem.gst_rate).order_by(models.SaleItem.gst_rate).all()
+    
+    rows = []
+    total_taxable = 0
+    total_gst = 0
     
-    output.seek(0)
+    for rate, taxable_value, gst_amount, total in gst_breakdown:
+        rows.append((
+            f"{rate}%",
+            round(taxable_value or 0, 2),
+            round(gst_amount or 0, 2),
+            round(total or 0, 2)
+        ))
+        total_taxable += taxable_value or 0
+        total_gst += gst_amount or 0
     
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=inventory_report_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    # Add totals
+    rows.append((
+        "TOTAL",
+        round(total_taxable, 2),
+        round(total_gst, 2),
+        round(total_taxable + total_gst, 2)
+    ))
+    
+    sheet = ExportSheet('GST Report', ["GST Rate", "Taxable Value", "GST Amount", "Total Value"], rows)
+    return [sheet], f"gst_tax_report_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}"
+
+# Exports that can be submitted to POST /reports/jobs
+JOB_EXPORTS = {
+    "sales": build_sales_export,
+    "inventory": build_inventory_export,
+    "expenses": build_expenses_export,
+    "customers": build_customers_export,
+    "profit-loss": build_profit_loss_export,
+    "tax": build_tax_export
+}
+
+@router.get("/sales/excel")
+def download_sales_report_excel(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    store_id: Optional[int] = None,
+    format: str = "xlsx",
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    sheets, filename = build_sales_export(db, current_user, start_date, end_date, store_id)
+    return export_response(sheets, filename, format)
+
+@router.get("/inventory/excel")
+def download_inventory_report_excel(
+    store_id: Optional[int] = None,
+    format: str = "xlsx",
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    sheets, filename = build_inventory_export(db, current_user, store_id=store_id)
+    return export_response(sheets, filename, format)
 
 @router.get("/expenses/excel")
 def download_expenses_report_excel(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     store_id: Optional[int] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    query = db.query(models.Expense)
-    
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Expense.store_id == current_user.store_id)
-    elif store_id:
-        query = query.filter(models.Expense.store_id == store_id)
-    
-    # Filter by date range
-    try:
-        if start_date:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        else:
-            start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        if end_date:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        else:
-            end_dt = datetime.now()
-    except (ValueError, AttributeError):
-        # If date parsing fails, use current month
-        start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_dt = datetime.now()
-    
-    query = query.filter(
-        models.Expense.expense_date >= start_dt,
-        models.Expense.expense_date <= end_dt
-    )
-    
-    expenses = query.all()
-    
-    # Prepare data for Excel
-    data = []
-    for expense in expenses:
-        data.append({
-            "Date": expense.expense_date.strftime("%Y-%m-%d %H:%M:%S"),
-            "Category": expense.category,
-            "Description": expense.description,
-            "Amount": expense.amount,
-            "Payment Mode": expense.payment_mode.value,
-            "Vendor": expense.vendor_name or "",
-            "Receipt Number": expense.receipt_number or ""
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Expenses Report')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=expenses_report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.xlsx"}
-    )
+    start_dt, end_dt = parse_date_range(start_date, end_date)
+    sheets, filename = build_expenses_export(db, current_user, start_dt, end_dt, store_id)
+    return export_response(sheets, filename, format)
 
 @router.get("/customers/excel")
 def download_customers_report_excel(
     store_id: Optional[int] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    query = db.query(models.Customer)
-    
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Customer.store_id == current_user.store_id)
-    elif store_id:
-        query = query.filter(models.Customer.store_id == store_id)
-    
-    customers = query.all()
-    
-    # Prepare data for Excel
-    data = []
-    for customer in customers:
-        # Get purchase count
-        purchase_count = db.query(models.Sale).filter(
-            models.Sale.customer_id == customer.id
-        ).count()
-        
-        data.append({
-            "Name": customer.name,
-            "Phone": customer.phone,
-            "Email": customer.email or "",
-            "Address": customer.address or "",
-            "GST Number": customer.gst_number or "",
-            "Total Purchases": customer.total_purchases,
-            "Purchase Count": purchase_count,
-            "Joined Date": customer.created_at.strftime("%Y-%m-%d")
-        })
-    
-    df = pd.DataFrame(data)
-    
-    # Create Excel file in memory
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Customers Report')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=customers_report_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-    )
+    sheets, filename = build_customers_export(db, current_user, store_id=store_id)
+    return export_response(sheets, filename, format)
 
 @router.get("/profit-loss/excel")
 def download_profit_loss_report_excel(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     store_id: Optional[int] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Profit & Loss Statement Excel Report"""
-    try:
-        if start_date:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        else:
-            start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        if end_date:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        else:
-            end_dt = datetime.now()
-    except (ValueError, AttributeError):
-        start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_dt = datetime.now()
-    
-    # Get sales data
-    sales_query = db.query(models.Sale).filter(
-        models.Sale.sale_date >= start_dt,
-        models.Sale.sale_date <= end_dt
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        sales_query = sales_query.filter(models.Sale.store_id == current_user.store_id)
-    elif store_id:
-        sales_query = sales_query.filter(models.Sale.store_id == store_id)
-    
-    sales = sales_query.all()
-    
-    # Calculate revenue
-    total_revenue = sum(sale.total_amount for sale in sales)
-    total_gst_collected = sum(sale.gst_amount for sale in sales)
-    total_discounts = sum(sale.discount for sale in sales)
-    
-    # Calculate COGS (Cost of Goods Sold)
-    cogs = 0
-    for sale in sales:
-        for item in sale.sale_items:
-            cogs += (item.product.cost_price or 0) * item.quantity
-    
-    # Get expenses
-    expenses_query = db.query(models.Expense).filter(
-        models.Expense.expense_date >= start_dt,
-        models.Expense.expense_date <= end_dt
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        expenses_query = expenses_query.filter(models.Expense.store_id == current_user.store_id)
-    elif store_id:
-        expenses_query = expenses_query.filter(models.Expense.store_id == store_id)
-    
-    expenses = expenses_query.all()
-    
-    # Group expenses by category
-    expense_by_category = {}
-    for expense in expenses:
-        cat = expense.category
-        expense_by_category[cat] = expense_by_category.get(cat, 0) + expense.amount
-    
-    total_expenses = sum(expense.amount for expense in expenses)
-    
-    # Calculate profitability
-    gross_profit = total_revenue - cogs
-    net_profit = gross_profit - total_expenses
-    
-    # Prepare Excel data
-    data = []
-    
-    # Revenue Section
-    data.append({"Item": "=== REVENUE ===", "Amount": ""})
-    data.append({"Item": "Total Sales", "Amount": total_revenue})
-    data.append({"Item": "GST Collected", "Amount": total_gst_collected})
-    data.append({"Item": "Discounts Given", "Amount": -total_discounts})
-    data.append({"Item": "", "Amount": ""})
-    
-    # COGS Section
-    data.append({"Item": "=== COST OF GOODS SOLD ===", "Amount": ""})
-    data.append({"Item": "Cost of Goods Sold (COGS)", "Amount": -cogs})
-    data.append({"Item": "GROSS PROFIT", "Amount": gross_profit})
-    data.append({"Item": "", "Amount": ""})
-    
-    # Operating Expenses
-    data.append({"Item": "=== OPERATING EXPENSES ===", "Amount": ""})
-    for category, amount in expense_by_category.items():
-        data.append({"Item": f"{category.title()}", "Amount": -amount})
-    data.append({"Item": "Total Operating Expenses", "Amount": -total_expenses})
-    data.append({"Item": "", "Amount": ""})
-    
-    # Net Profit
-    data.append({"Item": "=== NET PROFIT/LOSS ===", "Amount": ""})
-    data.append({"Item": "NET PROFIT", "Amount": net_profit})
-    data.append({"Item": "Profit Margin %", "Amount": f"{(net_profit / total_revenue * 100) if total_revenue > 0 else 0:.2f}%"})
-    
-    df = pd.DataFrame(data)
-    
-    # Create Excel file
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Profit & Loss')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=profit_loss_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
-    )
+    start_dt, end_dt = parse_date_range(start_date, end_date)
+    sheets, filename = build_profit_loss_export(db, current_user, start_dt, end_dt, store_id)
+    return export_response(sheets, filename, format)
 
 @router.get("/tax/excel")
 def download_tax_report_excel(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     store_id: Optional[int] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """GST/Tax Report Excel"""
-    try:
-        if start_date:
-            start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        else:
-            start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        if end_date:
-            end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        else:
-            end_dt = datetime.now()
-    except (ValueError, AttributeError):
-        start_dt = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_dt = datetime.now()
-    
-    # Get sales with GST breakdown
-    sales_query = db.query(models.Sale).filter(
-        models.Sale.sale_date >= start_dt,
-        models.Sale.sale_date <= end_dt
-    )
-    
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        sales_query = sales_query.filter(models.Sale.store_id == current_user.store_id)
-    elif store_id:
-        sales_query = sales_query.filter(models.Sale.store_id == store_id)
-    
-    sales = sales_query.all()
-    
-    # Group by GST rate
-    gst_breakdown = {}
-    for sale in sales:
-        for item in sale.sale_items:
-            gst_rate = item.gst_rate
-            if gst_rate not in gst_breakdown:
-                gst_breakdown[gst_rate] = {
-                    'taxable_value': 0,
-                    'gst_amount': 0,
-                    'total': 0
-                }
-            taxable = item.unit_price * item.quantity
-            gst_breakdown[gst_rate]['taxable_value'] += taxable
-            gst_breakdown[gst_rate]['gst_amount'] += item.gst_amount
-            gst_breakdown[gst_rate]['total'] += item.total_price
-    
-    # Prepare Excel data
-    data = []
-    total_taxable = 0
-    total_gst = 0
-    
-    for rate in sorted(gst_breakdown.keys()):
-        values = gst_breakdown[rate]
-        data.append({
-            "GST Rate": f"{rate}%",
-            "Taxable Value": round(values['taxable_value'], 2),
-            "GST Amount": round(values['gst_amount'], 2),
-            "Total Value": round(values['total'], 2)
-        })
-        total_taxable += values['taxable_value']
-        total_gst += values['gst_amount']
-    
-    # Add totals
-    data.append({
-        "GST Rate": "TOTAL",
-        "Taxable Value": round(total_taxable, 2),
-        "GST Amount": round(total_gst, 2),
-        "Total Value": round(total_taxable + total_gst, 2)
-    })
-    
-    df = pd.DataFrame(data)
-    
-    # Create Excel file
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='GST Report')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=gst_tax_report_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
-    )
+    start_dt, end_dt = parse_date_range(start_date, end_date)
+    sheets, filename = build_tax_export(db, current_user, start_dt, end_dt, store_id)
+    return export_response(sheets, filename, format)
 
 
 # ============ ADVANCED REPORTS EXCEL EXPORTS ============
@@ -1415,46 +1430,32 @@ def download_tax_report_excel(
 def download_product_wise_sales_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Product-wise Sales Report - Excel Export"""
-    # Get data from the main endpoint logic
-    data_response = get_product_wise_sales(start_date, end_date, db, current_user)
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(data_response['products'])
-    
-    if len(df) > 0:
-        df.columns = ['Product Name', 'SKU', 'Quantity Sold', 'Sales Value (₹)', 'Discount Given (₹)', 'Margin Earned (₹)']
-    
-    # Create Excel
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Product-wise Sales')
-        
-        # Add summary
-        summary_data = {
-            'Metric': ['Total Products', 'Total Quantity Sold', 'Total Sales Value', 'Total Discount', 'Total Margin'],
-            'Value': [
-                len(df),
-                df['Quantity Sold'].sum() if len(df) > 0 else 0,
-                f"₹{df['Sales Value (₹)'].sum():.2f}" if len(df) > 0 else '₹0.00',
-                f"₹{df['Discount Given (₹)'].sum():.2f}" if len(df) > 0 else '₹0.00',
-                f"₹{df['Margin Earned (₹)'].sum():.2f}" if len(df) > 0 else '₹0.00'
-            ]
-        }
-        summary_df = pd.DataFrame(summary_data)
-        summary_df.to_excel(writer, index=False, sheet_name='Summary', startrow=0)
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=product_wise_sales_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    products = get_product_wise_sales(start_date, end_date, db, current_user)['products']
+    
+    summary = [
+        ('Total Products', len(products)),
+        ('Total Quantity Sold', sum(product['quantity_sold'] for product in products)),
+        ('Total Sales Value', f"₹{sum(product['sales_value'] for product in products):.2f}"),
+        ('Total Discount', f"₹{sum(product['discount_given'] for product in products):.2f}"),
+        ('Total Margin', f"₹{sum(product['margin_earned'] for product in products):.2f}")
+    ]
+    
+    return export_response(
+        [
+            ExportSheet(
+                'Product-wise Sales',
+                ['Product Name', 'SKU', 'Quantity Sold', 'Sales Value (₹)', 'Discount Given (₹)', 'Margin Earned (₹)'],
+                dict_rows(products, ['product_name', 'sku', 'quantity_sold', 'sales_value', 'discount_given', 'margin_earned'])
+            ),
+            ExportSheet('Summary', ['Metric', 'Value'], summary)
+        ],
+        f"product_wise_sales_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
@@ -1462,102 +1463,77 @@ def download_product_wise_sales_excel(
 def download_category_wise_sales_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Category-wise Sales Report - Excel Export"""
     data_response = get_category_wise_sales(start_date, end_date, db, current_user)
     
-    df = pd.DataFrame(data_response['categories'])
-    if len(df) > 0:
-        df.columns = ['Category', 'Revenue (₹)', 'Profit (₹)', 'Contribution %']
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Category-wise Sales')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=category_wise_sales_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Category-wise Sales',
+            ['Category', 'Revenue (₹)', 'Profit (₹)', 'Revenue Contribution %', 'Profit Contribution %'],
+            dict_rows(data_response['categories'], [
+                'category', 'revenue', 'profit', 'revenue_contribution_percent', 'profit_contribution_percent'
+            ])
+        )],
+        f"category_wise_sales_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
 @router.get("/sales/daily-summary/excel")
 def download_daily_summary_excel(
     date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Daily Sales Summary - Excel Export"""
     data_response = get_daily_sales_summary(date, db, current_user)
+    comparisons = data_response['comparisons']
     
-    # Create summary data
-    summary_data = {
-        'Metric': [
-            'Date',
-            'Total Sales',
-            'Number of Bills',
-            'Average Bill Value',
-            'vs Yesterday',
-            'vs Last Week'
-        ],
-        'Value': [
-            data_response['date'],
-            f"₹{data_response['total_sales']:.2f}",
-            data_response['num_bills'],
-            f"₹{data_response['average_bill_value']:.2f}",
-            f"{data_response['comparisons']['vs_yesterday']['percentage']:.2f}%",
-            f"{data_response['comparisons']['vs_last_week']['percentage']:.2f}%"
-        ]
-    }
-    
-    # Payment breakdown
-    payment_data = []
-    for mode, amount in data_response['payment_breakdown'].items():
-        payment_data.append({'Payment Mode': mode, 'Amount (₹)': amount})
+    summary = [
+        ('Date', data_response['date']),
+        ('Total Sales', f"₹{data_response['total_sales']:.2f}"),
+        ('Number of Bills', data_response['num_bills']),
+        ('Average Bill Value', f"₹{data_response['average_bill_value']:.2f}"),
+        ('vs Yesterday', f"{comparisons['vs_yesterday']['change_percentage']:.2f}%"),
+        ('vs Last Week', f"{comparisons['vs_last_week_same_day']['change_percentage']:.2f}%")
+    ]
     
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        pd.DataFrame(summary_data).to_excel(writer, index=False, sheet_name='Summary')
-        pd.DataFrame(payment_data).to_excel(writer, index=False, sheet_name='Payment Breakdown')
-    
-    output.seek(0)
     dt = date or datetime.now()
     
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=daily_sales_summary_{dt.strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [
+            ExportSheet('Summary', ['Metric', 'Value'], summary),
+            ExportSheet('Payment Breakdown', ['Payment Mode', 'Amount (₹)'], data_response['payment_breakdown'].items())
+        ],
+        f"daily_sales_summary_{dt.strftime('%Y%m%d')}",
+        format
     )
 
 
 @router.get("/inventory/live-stock/excel")
 def download_live_stock_excel(
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Live Stock Report - Excel Export"""
     data_response = get_live_stock_report(db, current_user)
     
-    df = pd.DataFrame(data_response['products'])
-    if len(df) > 0:
-        df.columns = ['SKU', 'Product Name', 'Category', 'Current Stock', 'Min Stock', 'Status', 'Value (₹)']
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Live Stock')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=live_stock_report_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Live Stock',
+            ['Product Name', 'SKU', 'Available Quantity', 'Store', 'Last Sold'],
+            dict_rows(data_response['stock_report'], [
+                'item_name', 'sku', 'available_quantity', 'store_location', 'last_sold_date'
+            ])
+        )],
+        f"live_stock_report_{datetime.now().strftime('%Y%m%d')}",
+        format
     )
 
 
@@ -1567,65 +1543,68 @@ def download_live_stock_excel(
 def download_staff_sales_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Staff Sales Performance - Excel Export"""
     data_response = get_staff_sales_report(start_date, end_date, db, current_user)
     
-    df = pd.DataFrame(data_response['staff'])
-    if len(df) > 0:
-        df.columns = ['Staff Name', 'Email', 'Bills Generated', 'Total Sales (₹)', 'Units Sold', 'Avg Bill Value (₹)']
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Staff Sales')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
+    rows = (
+        (
+            staff['staff_name'],
+            staff['bills_generated'],
+            staff['sales_value'],
+            staff['units_sold'],
+            round(staff['sales_value'] / staff['bills_generated'], 2) if staff['bills_generated'] else 0
+        )
+        for staff in data_response['staff']
+    )
     
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=staff_sales_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Staff Sales',
+            ['Staff Name', 'Bills Generated', 'Total Sales (₹)', 'Units Sold', 'Avg Bill Value (₹)'],
+            rows
+        )],
+        f"staff_sales_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
 @router.get("/staff/incentive-report/excel")
 def download_staff_incentive_excel(
     month: Optional[str] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Staff Incentive Report - Excel Export"""
     data_response = get_staff_incentive_report(month, db, current_user)
     
-    # Create DataFrame
-    staff_data = []
-    for staff_member in data_response.get('staff', []):
-        staff_data.append({
-            'Staff Name': staff_member.get('staff_name', ''),
-            'Month': data_response.get('month', ''),
-            'Sales Target (₹)': staff_member.get('target', 0),
-            'Sales Achieved (₹)': staff_member.get('achieved', 0),
-            'Achievement %': staff_member.get('achievement_percentage', 0),
-            'Incentive Earned (₹)': staff_member.get('incentive_earned', 0),
-            'Status': staff_member.get('status', '')
-        })
-    
-    df = pd.DataFrame(staff_data)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Incentive Report')
-    
-    output.seek(0)
+    rows = (
+        (
+            staff_member['staff_name'],
+            data_response['month'],
+            staff_member['target_amount'],
+            staff_member['achieved_amount'],
+            staff_member['achievement_percent'],
+            staff_member['incentive_earned'],
+            staff_member['incentive_paid'],
+            staff_member['incentive_pending']
+        )
+        for staff_member in data_response['staff_incentives']
+    )
     
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=staff_incentive_{data_response.get('month', 'current')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Incentive Report',
+            ['Staff Name', 'Month', 'Sales Target (₹)', 'Sales Achieved (₹)', 'Achievement %',
+             'Incentive Earned (₹)', 'Incentive Paid (₹)', 'Incentive Pending (₹)'],
+            rows
+        )],
+        f"staff_incentive_{data_response['month']}",
+        format
     )
 
 
@@ -1633,26 +1612,27 @@ def download_staff_incentive_excel(
 def download_attendance_correlation_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    month: Optional[str] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Attendance & Sales Correlation - Excel Export"""
-    data_response = get_attendance_sales_correlation(start_date, end_date, db, current_user)
-    
-    df = pd.DataFrame(data_response.get('staff', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Attendance-Sales')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=attendance_sales_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    # The report is monthly; the date range picker sends start_date
+    if not month and start_date:
+        month = start_date.strftime("%Y-%m")
+    data_response = get_staff_attendance_sales_correlation(month, db, current_user)
+    
+    return export_response(
+        [ExportSheet(
+            'Attendance-Sales',
+            ['Staff Name', 'Present Days', 'Hours Worked', 'Total Sales (₹)', 'Sales per Day (₹)', 'Sales per Hour (₹)'],
+            dict_rows(data_response['staff_report'], [
+                'staff_name', 'present_days', 'total_hours_worked', 'total_sales', 'sales_per_day', 'sales_per_hour'
+            ])
+        )],
+        f"attendance_sales_{data_response['month']}",
+        format
     )
 
 
@@ -1660,72 +1640,69 @@ def download_attendance_correlation_excel(
 def download_movement_analysis_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Stock Movement Analysis - Excel Export"""
-    data_response = get_stock_movement_analysis(start_date, end_date, db, current_user)
-    
-    df = pd.DataFrame(data_response.get('products', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Movement Analysis')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=movement_analysis_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    data_response = get_stock_movement_analysis(db, current_user)
+    
+    return export_response(
+        [ExportSheet(
+            'Movement Analysis',
+            ['Product Name', 'SKU', 'Current Stock', 'Days Since Last Sale', 'Stock Ageing', 'Movement Status'],
+            dict_rows(data_response['stock_analysis'], [
+                'item_name', 'sku', 'current_stock', 'days_since_last_sale', 'stock_ageing', 'movement_status'
+            ])
+        )],
+        f"movement_analysis_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
 @router.get("/inventory/reorder-level/excel")
 def download_reorder_level_excel(
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Reorder Level Alert - Excel Export"""
-    data_response = get_reorder_level_alert(db, current_user)
-    
-    df = pd.DataFrame(data_response.get('products', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Reorder Alert')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=reorder_level_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+    data_response = get_reorder_level_report(db, current_user)
+    
+    return export_response(
+        [ExportSheet(
+            'Reorder Alert',
+            ['Product Name', 'SKU', 'Current Stock', 'Minimum Stock', 'Suggested Reorder Qty', 'Estimated Cost (₹)'],
+            dict_rows(data_response['reorder_report'], [
+                'item_name', 'sku', 'current_stock', 'minimum_stock', 'suggested_reorder_quantity', 'estimated_cost'
+            ])
+        )],
+        f"reorder_level_{datetime.now().strftime('%Y%m%d')}",
+        format
     )
 
 
 @router.get("/inventory/high-value-stock/excel")
 def download_high_value_stock_excel(
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """High Value Stock Report - Excel Export"""
     data_response = get_high_value_stock_report(db, current_user)
     
-    df = pd.DataFrame(data_response.get('products', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='High Value Stock')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=high_value_stock_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'High Value Stock',
+            ['Product Name', 'SKU', 'Current Stock', 'Cost per Unit (₹)', 'Stock Value (₹)',
+             'Sales (Last 60 Days)', 'Movement Status', 'Capital Blocked (₹)'],
+            dict_rows(data_response['high_value_stock'], [
+                'item_name', 'sku', 'current_stock', 'cost_per_unit', 'stock_value',
+                'sales_last_60_days', 'movement_status', 'capital_blocked'
+            ])
+        )],
+        f"high_value_stock_{datetime.now().strftime('%Y%m%d')}",
+        format
     )
 
 
@@ -1733,26 +1710,24 @@ def download_high_value_stock_excel(
 def download_item_margin_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Item-wise Margin Report - Excel Export"""
     data_response = get_item_wise_margin_report(start_date, end_date, db, current_user)
     
-    df = pd.DataFrame(data_response.get('products', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Item Margins')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=item_margin_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Item Margins',
+            ['Product Name', 'SKU', 'Purchase Price (₹)', 'Selling Price (₹)', 'Discount (₹)',
+             'Net Margin per Unit (₹)', 'Margin %'],
+            dict_rows(data_response['margin_report'], [
+                'item_name', 'sku', 'purchase_price', 'selling_price', 'discount', 'net_margin', 'margin_percent'
+            ])
+        )],
+        f"item_margin_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
@@ -1760,26 +1735,21 @@ def download_item_margin_excel(
 def download_brand_profitability_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Brand-wise Profitability - Excel Export"""
     data_response = get_brand_wise_profitability(start_date, end_date, db, current_user)
     
-    df = pd.DataFrame(data_response.get('brands', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Brand Profitability')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=brand_profitability_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Brand Profitability',
+            ['Brand', 'Revenue (₹)', 'Gross Profit (₹)', 'Margin %'],
+            dict_rows(data_response['brand_report'], ['brand', 'revenue', 'gross_profit', 'margin_percent'])
+        )],
+        f"brand_profitability_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
@@ -1787,81 +1757,72 @@ def download_brand_profitability_excel(
 def download_discount_impact_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Discount Impact Analysis - Excel Export"""
-    data_response = get_discount_impact_analysis(start_date, end_date, db, current_user)
-    
-    # Create DataFrame from the response
-    discount_data = [{
-        'Total Discount Given (₹)': data_response.get('total_discount', 0),
-        'Total Sales (₹)': data_response.get('total_sales', 0),
-        'Discount %': data_response.get('discount_percentage', 0),
-        'Profit Impact (₹)': data_response.get('profit_impact', 0)
-    }]
-    
-    df = pd.DataFrame(discount_data)
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Discount Impact')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=discount_impact_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    data_response = get_discount_impact_report(start_date, end_date, db, current_user)
+    
+    return export_response(
+        [ExportSheet(
+            'Discount Impact',
+            ['Sales Before Discount (₹)', 'Total Discount Given (₹)', 'Sales After Discount (₹)',
+             'Discount %', 'Estimated Profit Erosion (₹)'],
+            dict_rows([data_response], [
+                'total_sales_before_discount', 'total_discount_given', 'total_sales_after_discount',
+                'discount_percentage', 'estimated_profit_erosion'
+            ])
+        )],
+        f"discount_impact_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
 @router.get("/customers/repeat-customers/excel")
 def download_repeat_customers_excel(
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Repeat Customer Analysis - Excel Export"""
-    data_response = get_repeat_customers(db, current_user)
-    
-    df = pd.DataFrame(data_response.get('customers', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Repeat Customers')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=repeat_customers_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+    data_response = get_repeat_customer_report(db, current_user)
+    
+    return export_response(
+        [ExportSheet(
+            'Repeat Customers',
+            ['Customer Name', 'Phone', 'Email', 'Repeat Visits', 'Lifetime Value (₹)', 'Preferred Category'],
+            dict_rows(data_response['repeat_customers'], [
+                'customer_name', 'phone', 'email', 'repeat_visits', 'lifetime_value', 'preferred_products'
+            ])
+        )],
+        f"repeat_customers_{datetime.now().strftime('%Y%m%d')}",
+        format
     )
 
 
 @router.get("/customers/warranty-due/excel")
 def download_warranty_due_excel(
     days_ahead: int = 30,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Warranty Expiry Alert - Excel Export"""
-    data_response = get_warranty_due_products(days_ahead, db, current_user)
-    
-    df = pd.DataFrame(data_response.get('products', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Warranty Expiring')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=warranty_expiring_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+    data_response = get_warranty_due_report(days_ahead, db, current_user)
+    
+    return export_response(
+        [ExportSheet(
+            'Warranty Expiring',
+            ['Customer Name', 'Phone', 'Product Name', 'Serial Number', 'Purchase Date',
+             'Warranty Expiry', 'Days Remaining'],
+            dict_rows(data_response['warranty_due_list'], [
+                'customer_name', 'phone', 'product_name', 'serial_number', 'purchase_date',
+                'warranty_expiry', 'days_remaining'
+            ])
+        )],
+        f"warranty_expiring_{datetime.now().strftime('%Y%m%d')}",
+        format
     )
 
 
@@ -1869,48 +1830,41 @@ def download_warranty_due_excel(
 def download_payment_mode_excel(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Payment Mode Breakdown - Excel Export"""
     data_response = get_payment_mode_report(start_date, end_date, db, current_user)
     
-    df = pd.DataFrame(data_response.get('payment_modes', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Payment Modes')
-    
-    output.seek(0)
-    start_dt = start_date or datetime.now().replace(day=1)
-    end_dt = end_date or datetime.now()
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=payment_modes_{start_dt.strftime('%Y%m%d')}_{end_dt.strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Payment Modes',
+            ['Payment Mode', 'Transactions', 'Total Amount (₹)'],
+            dict_rows(data_response['payment_breakdown'], ['payment_mode', 'transaction_count', 'total_amount'])
+        )],
+        f"payment_modes_{_range_suffix(start_date, end_date)}",
+        format
     )
 
 
 @router.get("/finance/outstanding-receivables/excel")
 def download_outstanding_receivables_excel(
+    format: str = "xlsx",
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """Outstanding Receivables - Excel Export"""
     data_response = get_outstanding_receivables(db, current_user)
     
-    df = pd.DataFrame(data_response.get('receivables', []))
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Outstanding')
-    
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=outstanding_receivables_{datetime.now().strftime('%Y%m%d')}.xlsx"}
+    return export_response(
+        [ExportSheet(
+            'Outstanding',
+            ['Invoice Number', 'Customer Name', 'Amount (₹)', 'Sale Date', 'Days Pending', 'Payment Mode'],
+            dict_rows(data_response['receivables'], [
+                'invoice_number', 'customer_name', 'amount', 'sale_date', 'days_pending', 'payment_mode'
+            ])
+        )],
+        f"outstanding_receivables_{datetime.now().strftime('%Y%m%d')}",
+        format
     )
-
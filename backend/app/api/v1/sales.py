@@ -1,137 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import func
 from typing import List
 from datetime import datetime, timedelta
 from app.db.database import get_db
 from app.db import models
-from app.schemas.sale import SaleCreate, SaleResponse, DailySalesStats, MonthlySalesStats
-from app.api.dependencies import get_current_user
-import json
-import random
+from app.schemas.sale import (
+    SaleCreate, SaleResponse, DailySalesStats, MonthlySalesStats, InvoiceNumberReservation, InvoiceNumberBlock,
+    BulkSaleRequest, BulkSaleResponse
+)
+from app.api.dependencies import get_current_user, get_store_filter
+from app.core.cache import response_cache, SALES
+from app.api.pagination import keyset_paginate
+from app.services.sale_pipeline import create_sale_record
+from app.services.invoice_numbers import allocate_invoice_numbers
+from app.services.bulk_sales import ingest_sales
+from app.services.rollups import sales_totals
 
 router = APIRouter()
 
-def generate_invoice_number(db: Session, store_id: int) -> str:
-    """Generate unique invoice number"""
-    today = datetime.now()
-    prefix = f"INV{store_id}{today.strftime('%Y%m%d')}"
-    
-    # Get count of invoices today
-    count = db.query(models.Sale).filter(
-        models.Sale.invoice_number.like(f"{prefix}%")
-    ).count()
-    
-    return f"{prefix}{count + 1:04d}"
-
 @router.post("/", response_model=SaleResponse)
 def create_sale(
     sale: SaleCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Verify all products exist and have sufficient stock
-    for item in sale.items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        if not product:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product with id {item.product_id} not found"
-            )
-        
-        if product.current_stock < item.quantity:
+    return create_sale_record(db, sale, current_user)
+
+@router.post("/bulk", response_model=BulkSaleResponse)
+def create_sales_bulk(
+    batch: BulkSaleRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Ingest a batch of bills replayed by an offline POS terminal"""
+    return ingest_sales(db, batch.sales, current_user)
+
+@router.post("/invoice-numbers/reserve", response_model=InvoiceNumberBlock)
+def reserve_invoice_numbers(
+    reservation: InvoiceNumberReservation,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Reserve a block of invoice numbers for an offline POS terminal"""
+    if current_user.role != models.UserRole.SUPER_ADMIN:
+        if reservation.store_id != current_user.store_id:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock for product {product.name}"
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
             )
     
-    # Calculate totals
-    subtotal = 0
-    gst_amount = 0
-    
-    for item in sale.items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        item_total = item.unit_price * item.quantity
-        item_gst = (item_total * product.gst_rate) / 100
-        subtotal += item_total
-        gst_amount += item_gst
-    
-    total_amount = subtotal + gst_amount - sale.discount
-    
-    # Create sale
-    db_sale = models.Sale(
-        invoice_number=generate_invoice_number(db, sale.store_id),
-        customer_id=sale.customer_id,
-        store_id=sale.store_id,
-        subtotal=subtotal,
-        gst_amount=gst_amount,
-        discount=sale.discount,
-        total_amount=total_amount,
-        payment_mode=sale.payment_mode,
-        created_by=current_user.id
-    )
-    
-    db.add(db_sale)
-    db.flush()
-    
-    # Create sale items and update stock
-    for item in sale.items:
-        product = db.query(models.Product).filter(models.Product.id == item.product_id).first()
-        
-        item_total = item.unit_price * item.quantity
-        item_gst = (item_total * product.gst_rate) / 100
-        
-        warranty_expires_at = None
-        if product.warranty_months > 0:
-            warranty_expires_at = datetime.now() + timedelta(days=product.warranty_months * 30)
-        
-        db_sale_item = models.SaleItem(
-            sale_id=db_sale.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            unit_price=item.unit_price,
-            gst_rate=product.gst_rate,
-            gst_amount=item_gst,
-            total_price=item_total + item_gst,
-            serial_number=item.serial_number,
-            warranty_expires_at=warranty_expires_at
-        )
-        
-        db.add(db_sale_item)
-        
-        # Update product stock
-        product.current_stock -= item.quantity
-    
-    # Update customer total purchases
-    if sale.customer_id:
-        customer = db.query(models.Customer).filter(models.Customer.id == sale.customer_id).first()
-        if customer:
-            customer.total_purchases += total_amount
-    
-    db.commit()
-    db.refresh(db_sale)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="sale",
-        entity_id=db_sale.id,
-        details=json.dumps({
-            "invoice_number": db_sale.invoice_number,
-            "total_amount": total_amount,
-            "items_count": len(sale.items)
-        })
+    sequence_date = datetime.now().date()
+    invoice_numbers = allocate_invoice_numbers(
+        db, reservation.store_id, reservation.count, sequence_date=sequence_date
     )
-    db.add(audit_log)
     db.commit()
     
-    return db_sale
+    return {
+        "store_id": reservation.store_id,
+        "sequence_date": sequence_date,
+        "invoice_numbers": invoice_numbers
+    }
 
 @router.get("/", response_model=List[SaleResponse])
 def get_sales(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: str = None,
     store_id: int = None,
     customer_id: int = None,
     start_date: datetime = None,
@@ -139,8 +75,8 @@ def get_sales(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    # Eagerly load sale_items to avoid lazy loading issues
-    query = db.query(models.Sale).options(joinedload(models.Sale.sale_items))
+    # Load sale_items in a second IN query so LIMIT applies to sales, not joined rows
+    query = db.query(models.Sale).options(selectinload(models.Sale.sale_items))
     
     # Filter by store
     if current_user.role != models.UserRole.SUPER_ADMIN:
@@ -158,8 +94,15 @@ def get_sales(
     if end_date:
         query = query.filter(models.Sale.sale_date <= end_date)
     
-    sales = query.order_by(models.Sale.sale_date.desc()).offset(skip).limit(limit).all()
-    return sales
+    # Keyset pagination over (sale_date, id), next page cursor in X-Next-Cursor
+    return keyset_paginate(
+        query,
+        [models.Sale.sale_date, models.Sale.id],
+        response,
+        cursor=cursor,
+        limit=limit,
+        skip=skip
+    )
 
 @router.get("/{sale_id}", response_model=SaleResponse)
 def get_sale(
@@ -196,36 +139,25 @@ def get_daily_sales_stats(
     if not date:
         date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     
-    end_date = date + timedelta(days=1)
-    
-    query = db.query(models.Sale).filter(
-        models.Sale.sale_date >= date,
-        models.Sale.sale_date < end_date
+    totals = sales_totals(
+        db,
+        date.date(),
+        date.date() + timedelta(days=1),
+        get_store_filter(current_user, store_id)
     )
+    by_mode = totals["by_payment_mode"]
     
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Sale.store_id == current_user.store_id)
-    elif store_id:
-        query = query.filter(models.Sale.store_id == store_id)
-    
-    sales = query.all()
-    
-    total_sales = sum(sale.total_amount for sale in sales)
-    total_transactions = len(sales)
-    cash_sales = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.CASH)
-    card_sales = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.CARD)
-    upi_sales = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.UPI)
-    qr_code_sales = sum(sale.total_amount for sale in sales if sale.payment_mode == models.PaymentMode.QR_CODE)
+    def mode_total(mode: models.PaymentMode) -> float:
+        return by_mode.get(mode, {}).get("total_amount", 0)
     
     return {
         "date": date,
-        "total_sales": total_sales,
-        "total_transactions": total_transactions,
-        "cash_sales": cash_sales,
-        "card_sales": card_sales,
-        "upi_sales": upi_sales,
-        "qr_code_sales": qr_code_sales
+        "total_sales": totals["total_amount"],
+        "total_transactions": totals["transaction_count"],
+        "cash_sales": mode_total(models.PaymentMode.CASH),
+        "card_sales": mode_total(models.PaymentMode.CARD),
+        "upi_sales": mode_total(models.PaymentMode.UPI),
+        "qr_code_sales": mode_total(models.PaymentMode.QR_CODE)
     }
 
 @router.get("/stats/monthly", response_model=MonthlySalesStats)
@@ -247,21 +179,10 @@ def get_monthly_sales_stats(
     else:
         end_date = datetime(year, month + 1, 1)
     
-    query = db.query(models.Sale).filter(
-        models.Sale.sale_date >= start_date,
-        models.Sale.sale_date < end_date
-    )
+    totals = sales_totals(db, start_date.date(), end_date.date(), get_store_filter(current_user, store_id))
     
-    # Filter by store
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Sale.store_id == current_user.store_id)
-    elif store_id:
-        query = query.filter(models.Sale.store_id == store_id)
-    
-    sales = query.all()
-    
-    total_sales = sum(sale.total_amount for sale in sales)
-    total_transactions = len(sales)
+    total_sales = totals["total_amount"]
+    total_transactions = totals["transaction_count"]
     average_transaction_value = total_sales / total_transactions if total_transactions > 0 else 0
     
     return {
@@ -277,36 +198,32 @@ def get_sales_dashboard(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    store_ids = get_store_filter(current_user)
+    today = datetime.now().date()
+    return response_cache.cached(
+        "sales.dashboard", store_ids, {"today": today}, [SALES],
+        lambda: _sales_dashboard(db, store_ids, today)
+    )
+
+def _sales_dashboard(db: Session, store_ids, today):
     # Get today's stats
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    end_today = today + timedelta(days=1)
-    
-    query = db.query(models.Sale)
-    if current_user.role != models.UserRole.SUPER_ADMIN:
-        query = query.filter(models.Sale.store_id == current_user.store_id)
-    
-    today_sales = query.filter(
-        models.Sale.sale_date >= today,
-        models.Sale.sale_date < end_today
-    ).all()
+    today_totals = sales_totals(db, today, today + timedelta(days=1), store_ids)
     
     # Get this month's stats
-    start_month = datetime(today.year, today.month, 1)
+    start_month = today.replace(day=1)
     if today.month == 12:
-        end_month = datetime(today.year + 1, 1, 1)
+        end_month = start_month.replace(year=today.year + 1, month=1)
     else:
-        end_month = datetime(today.year, today.month + 1, 1)
+        end_month = start_month.replace(month=today.month + 1)
     
-    month_sales = query.filter(
-        models.Sale.sale_date >= start_month,
-        models.Sale.sale_date < end_month
-    ).all()
+    month_totals = sales_totals(db, start_month, end_month, store_ids)
+    month_sales = month_totals["total_amount"]
+    month_transactions = month_totals["transaction_count"]
     
     return {
-        "today_sales": sum(sale.total_amount for sale in today_sales),
-        "today_transactions": len(today_sales),
-        "month_sales": sum(sale.total_amount for sale in month_sales),
-        "month_transactions": len(month_sales),
-        "average_transaction_value": sum(sale.total_amount for sale in month_sales) / len(month_sales) if month_sales else 0
+        "today_sales": today_totals["total_amount"],
+        "today_transactions": today_totals["transaction_count"],
+        "month_sales": month_sales,
+        "month_transactions": month_transactions,
+        "average_transaction_value": month_sales / month_transactions if month_transactions else 0
     }
-
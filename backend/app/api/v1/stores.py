@@ -6,7 +6,8 @@ from app.db.database import get_db
 from app.db import models
 from app.schemas.store import StoreCreate, StoreUpdate, StoreResponse, StoreStats
 from app.api.dependencies import get_super_admin, get_current_user
-import json
+from app.core.cache import response_cache, PRODUCTS, SALES, STORES
+from app.services import audit
 
 router = APIRouter()
 
@@ -30,19 +31,11 @@ def create_store(
     
     db_store = models.Store(**store.model_dump())
     db.add(db_store)
+    db.flush()
+    audit.record(db, current_user.id, "create", "store", db_store.id, {"name": db_store.name})
     db.commit()
     db.refresh(db_store)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="store",
-        entity_id=db_store.id,
-        details=json.dumps({"name": db_store.name})
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([STORES], [db_store.id])
     
     return db_store
 
@@ -70,13 +63,18 @@ def get_stores_stats(
 ):
     """Get statistics for all stores"""
     # Super admin sees all stores, others see their store only
-    if current_user.role == models.UserRole.SUPER_ADMIN:
-        stores = db.query(models.Store).filter(models.Store.is_active == True).all()
-    else:
-        stores = db.query(models.Store).filter(
-            models.Store.id == current_user.store_id,
-            models.Store.is_active == True
-        ).all()
+    store_ids = None if current_user.role == models.UserRole.SUPER_ADMIN else [current_user.store_id]
+    # Customer and user counts catch up when the entry expires
+    return response_cache.cached(
+        "stores.stats", store_ids, None, [STORES, PRODUCTS, SALES],
+        lambda: _stores_stats(db, store_ids)
+    )
+
+def _stores_stats(db: Session, store_ids) -> List[StoreStats]:
+    query = db.query(models.Store).filter(models.Store.is_active == True)
+    if store_ids is not None:
+        query = query.filter(models.Store.id.in_(store_ids))
+    stores = query.all()
     
     stats = []
     for store in stores:
@@ -162,19 +160,10 @@ def update_store(
     for field, value in update_data.items():
         setattr(store, field, value)
     
+    audit.record(db, current_user.id, "update", "store", store.id, update_data)
     db.commit()
     db.refresh(store)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="update",
-        entity_type="store",
-        entity_id=store.id,
-        details=json.dumps(update_data, default=str)
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([STORES], [store.id])
     
     return store
 
@@ -207,18 +196,9 @@ def delete_store(
     
     # Soft delete - just deactivate
     store.is_active = False
+    audit.record(db, current_user.id, "delete", "store", store_id, {"name": store.name})
     db.commit()
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="delete",
-        entity_type="store",
-        entity_id=store_id,
-        details=json.dumps({"name": store.name})
-    )
-    db.add(audit_log)
-    db.commit()
+    response_cache.invalidate([STORES], [store.id])
     
     return {"message": "Store deactivated successfully"}
 
@@ -4,9 +4,10 @@ from typing import List
 from app.db.database import get_db
 from app.db import models
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
+from app.core.principals import invalidate_user
 from app.core.security import get_password_hash
 from app.api.dependencies import get_current_user, get_super_admin, get_store_manager_or_admin
-import json
+from app.services import audit
 
 router = APIRouter()
 
@@ -52,20 +53,11 @@ def create_user(
     )
     
     db.add(db_user)
+    db.flush()
+    audit.record(db, current_user.id, "create", "user", db_user.id, {"username": db_user.username, "role": db_user.role.value})
     db.commit()
     db.refresh(db_user)
     
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="create",
-        entity_type="user",
-        entity_id=db_user.id,
-        details=json.dumps({"username": db_user.username, "role": db_user.role.value})
-    )
-    db.add(audit_log)
-    db.commit()
-    
     return db_user
 
 @router.get("/", response_model=List[UserResponse])
@@ -150,19 +142,10 @@ def update_user(
         else:
             setattr(user, field, value)
     
+    audit.record(db, current_user.id, "update", "user", user.id, {k: str(v) for k, v in update_data.items() if k != "password"})
     db.commit()
     db.refresh(user)
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="update",
-        entity_type="user",
-        entity_id=user.id,
-        details=json.dumps({k: str(v) for k, v in update_data.items() if k != "password"}, default=str)
-    )
-    db.add(audit_log)
-    db.commit()
+    invalidate_user(user.id)
     
     return user
 
@@ -201,18 +184,9 @@ def delete_user(
             )
     
     db.delete(user)
+    audit.record(db, current_user.id, "delete", "user", user_id, {"username": user.username})
     db.commit()
-    
-    # Create audit log
-    audit_log = models.AuditLog(
-        user_id=current_user.id,
-        action="delete",
-        entity_type="user",
-        entity_id=user_id,
-        details=json.dumps({"username": user.username})
-    )
-    db.add(audit_log)
-    db.commit()
+    invalidate_user(user_id)
     
     return {"message": "User deleted successfully"}
 
@@ -0,0 +1,260 @@
+"""
+Response cache for the dashboard endpoints.
+
+Entries are keyed by (endpoint, store scope, params) and expire after
+CACHE_TTL_SECONDS; the in-process backend also drops the least recently used
+entry beyond CACHE_MAX_ENTRIES. Set CACHE_BACKEND=redis to share the cache
+(and its invalidations) between worker processes through any Redis-compatible
+server at CACHE_REDIS_URL - there LRU is the server's maxmemory-policy.
+CACHE_BACKEND=none turns caching off.
+
+Invalidation is by generation counters: every cached endpoint depends on
+topics ("sales", "expenses", ...), a write bumps the topic's counter for the
+stores it touched and for "all stores", and since the counters are part of
+the key, older entries are simply never read again.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+from fastapi.encoders import jsonable_encoder
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SALES = "sales"
+EXPENSES = "expenses"
+PRODUCTS = "products"
+CAMPAIGNS = "campaigns"
+STORES = "stores"
+
+ALL_STORES = "all"
+
+
+class MemoryBackend:
+    """Thread-safe TTL + LRU dict, one per process"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def counters(self, names: Sequence[str]) -> List[int]:
+        with self._lock:
+            return [self._counters.get(name, 0) for name in names]
+
+    def bump(self, names: Iterable[str]) -> None:
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Any Redis-compatible server; needs the optional ``redis`` package"""
+
+    name = "redis"
+    evictions = None
+
+    def __init__(self, url: str, prefix: str = "skope:cache:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)") from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self._client.setex(self.prefix + key, ttl, json.dumps(value))
+
+    def counters(self, names: Sequence[str]) -> List[int]:
+        values = self._client.mget([self.prefix + "gen:" + name for name in names])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, names: Iterable[str]) -> None:
+        pipeline = self._client.pipeline(transaction=False)
+        for name in names:
+            pipeline.incr(self.prefix + "gen:" + name)
+        pipeline.execute()
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class ResponseCache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._errors = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _counter_names(topics: Sequence[str], store_ids: Optional[List[int]]) -> List[str]:
+        scopes = [ALL_STORES] if store_ids is None else [str(store_id) for store_id in sorted(store_ids)]
+        return [f"{topic}:{scope}" for topic in topics for scope in scopes]
+
+    def _count(self, counter, endpoint: str) -> None:
+        with self._lock:
+            counter[endpoint] += 1
+
+    def cached(
+        self,
+        endpoint: str,
+        store_ids: Optional[List[int]],
+        params: Optional[dict],
+        topics: Sequence[str],
+        compute: Callable[[], Any]
+    ) -> Any:
+        """Return the cached response of ``endpoint`` or compute and store it.
+
+        ``store_ids`` is the caller's scope (see get_store_filter), ``params``
+        any other inputs of the response and ``topics`` the data it reads.
+        """
+        if self.backend is None:
+            return compute()
+
+        try:
+            generations = self.backend.counters(self._counter_names(topics, store_ids))
+            key = json.dumps(
+                [endpoint, sorted(store_ids) if store_ids is not None else None, params or {}, generations],
+                sort_keys=True,
+                default=str
+            )
+            value = self.backend.get(key)
+        except Exception:
+            # A cache outage must not take the dashboards down with it
+            logger.warning("Response cache unavailable, computing %s", endpoint, exc_info=True)
+            with self._lock:
+                self._errors += 1
+            return compute()
+
+        if value is not None:
+            self._count(self._hits, endpoint)
+            return value
+
+        self._count(self._misses, endpoint)
+        value = jsonable_encoder(compute())
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception:
+            logger.warning("Could not store %s in the response cache", endpoint, exc_info=True)
+        return value
+
+    def invalidate(self, topics: Iterable[str], store_ids: Iterable[Optional[int]]) -> None:
+        """Call after committing a write to ``topics`` for the given stores"""
+        if self.backend is None:
+            return
+        names = set()
+        for topic in topics:
+            names.add(f"{topic}:{ALL_STORES}")
+            names.update(f"{topic}:{store_id}" for store_id in store_ids if store_id is not None)
+        try:
+            self.backend.bump(sorted(names))
+        except Exception:
+            # Entries still expire after the TTL
+            logger.warning("Could not invalidate the response cache for %s", sorted(names), exc_info=True)
+            with self._lock:
+                self._errors += 1
+            return
+        with self._lock:
+            self._invalidations += 1
+
+    def generations(self, topics: Sequence[str], store_ids: Optional[List[int]]) -> Optional[tuple]:
+        """Current write generations of ``topics`` in a scope, None when unknown.
+
+        Lets other caches notice the writes that invalidate() records.
+        """
+        if self.backend is None:
+            return None
+        try:
+            return tuple(self.backend.counters(self._counter_names(topics, store_ids)))
+        except Exception:
+            logger.warning("Response cache unavailable, write generations unknown", exc_info=True)
+            return None
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self._hits.values())
+            misses = sum(self._misses.values())
+            endpoints = {
+                endpoint: {
+                    "hits": self._hits[endpoint],
+                    "misses": self._misses[endpoint],
+                    "hit_ratio": round(self._hits[endpoint] / (self._hits[endpoint] + self._misses[endpoint]), 4)
+                }
+                for endpoint in sorted(set(self._hits) | set(self._misses))
+            }
+            return {
+                "backend": self.backend.name if self.backend is not None else "none",
+                "ttl_seconds": self.ttl,
+                "entries": self.backend.size() if self.backend is not None else 0,
+                "evictions": self.backend.evictions if self.backend is not None else 0,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0,
+                "invalidations": self._invalidations,
+                "errors": self._errors,
+                "endpoints": endpoints
+            }
+
+
+def _build_backend():
+    backend = settings.CACHE_BACKEND.lower()
+    if backend == "none":
+        return None
+    if backend == "redis":
+        return RedisBackend(settings.CACHE_REDIS_URL)
+    if backend == "memory":
+        return MemoryBackend(settings.CACHE_MAX_ENTRIES)
+    raise RuntimeError(f"Unknown CACHE_BACKEND '{settings.CACHE_BACKEND}', use memory, redis or none")
+
+
+response_cache = ResponseCache(_build_backend(), settings.CACHE_TTL_SECONDS)
@@ -7,6 +7,46 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 4096
+    
+    # Password hashing: stored hashes with another cost are upgraded at login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    
+    # Background report jobs
+    REPORT_JOB_DIR: str = "report_exports"
+    REPORT_JOB_WORKERS: int = 2
+    REPORT_JOB_TTL_MINUTES: int = 60
+    
+    # Audit log: async (queued, bulk-inserted in the background) or transactional
+    AUDIT_LOG_MODE: str = "async"
+    AUDIT_LOG_BATCH_SIZE: int = 500
+    AUDIT_LOG_FLUSH_SECONDS: float = 1.0
+    AUDIT_LOG_MAX_QUEUE: int = 10000
+    AUDIT_LOG_ENQUEUE_TIMEOUT: float = 0.05
+    
+    # Dashboard response cache: memory, redis or none
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_TTL_SECONDS: int = 30
+    CACHE_MAX_ENTRIES: int = 2048
+    
+    # Chatbot store context snapshots
+    CHAT_CONTEXT_REFRESH_SECONDS: float = 15.0
+    CHAT_CONTEXT_MAX_AGE_SECONDS: float = 300.0
+    CHAT_CONTEXT_IDLE_SECONDS: float = 3600.0
+    CHAT_PROMPT_TOKEN_BUDGET: int = 1200
+    CHAT_PROMPT_MAX_PRODUCTS: int = 15
+    CHAT_HISTORY_TOKEN_BUDGET: int = 1500
+    CHAT_ANSWER_CACHE_TTL_SECONDS: int = 600
+    CHAT_ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    
+    # Smart alerts evaluation, see app/services/smart_alerts.py
+    SMART_ALERTS_REFRESH_SECONDS: float = 60.0
+    SMART_ALERTS_MAX_AGE_SECONDS: float = 900.0
+    SMART_ALERTS_KEEP_RESOLVED_DAYS: int = 30
     
     class Config:
         env_file = ".env"
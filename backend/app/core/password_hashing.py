@@ -0,0 +1,108 @@
+"""
+Bounded worker pool for bcrypt.
+
+A bcrypt check takes a few hundred milliseconds of CPU at the default cost.
+Run inline it holds one of the server's request threads for that long, so a
+burst of logins at store opening stalls every other endpoint. Async callers
+instead await verify_password_async / hash_password_async, which run on
+PASSWORD_HASH_WORKERS dedicated threads (bcrypt releases the GIL while
+hashing). At most PASSWORD_HASH_MAX_PENDING calls may be queued or running;
+past that they fail fast with PasswordHashingBusy rather than pile up.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.core.security import get_password_hash, pwd_context
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_stats = {
+    "pending": 0,
+    "running": 0,
+    "max_pending": 0,
+    "completed": 0,
+    "rejected": 0,
+    "wait_seconds": 0.0,
+    "run_seconds": 0.0
+}
+
+
+class PasswordHashingBusy(Exception):
+    """Too many hashing calls are queued"""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash"
+        )
+    return _executor
+
+
+def shutdown_password_hashing() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _timed(function, queued_at: float, *args):
+    started = time.perf_counter()
+    with _lock:
+        _stats["running"] += 1
+        _stats["wait_seconds"] += started - queued_at
+    try:
+        return function(*args)
+    finally:
+        with _lock:
+            _stats["running"] -= 1
+            _stats["completed"] += 1
+            _stats["run_seconds"] += time.perf_counter() - started
+
+
+async def _submit(function, *args):
+    with _lock:
+        if _stats["pending"] >= settings.PASSWORD_HASH_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise PasswordHashingBusy()
+        _stats["pending"] += 1
+        _stats["max_pending"] = max(_stats["max_pending"], _stats["pending"])
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _timed, function, time.perf_counter(), *args)
+    finally:
+        with _lock:
+            _stats["pending"] -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Check a password; the second value is a new hash when the stored one
+    uses outdated settings (e.g. BCRYPT_ROUNDS changed), else None"""
+    return await _submit(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _submit(get_password_hash, password)
+
+
+def hashing_stats() -> dict:
+    with _lock:
+        completed = _stats["completed"]
+        return {
+            "workers": settings.PASSWORD_HASH_WORKERS,
+            "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+            "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+            "pending": _stats["pending"],
+            "queued": _stats["pending"] - _stats["running"],
+            "running": _stats["running"],
+            "peak_pending": _stats["max_pending"],
+            "completed": completed,
+            "rejected": _stats["rejected"],
+            "avg_wait_ms": round(_stats["wait_seconds"] / completed * 1000, 2) if completed else 0,
+            "avg_run_ms": round(_stats["run_seconds"] / completed * 1000, 2) if completed else 0
+        }
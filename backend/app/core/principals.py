@@ -0,0 +1,119 @@
+"""
+Authenticated principal cache.
+
+get_current_user resolves a bearer token to a Principal - a frozen snapshot
+of the user's row without the password hash - and keeps it for
+PRINCIPAL_CACHE_TTL_SECONDS (never past the token's own expiry), so most
+requests neither decode the JWT nor query ``users``. Endpoints that change a
+user (update, delete, password change) call invalidate_user after committing.
+
+The cache lives in each worker process: with several workers an edit made
+through one of them reaches the others when their entries expire, so keep
+the TTL short.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+from app.core.config import settings
+from app.db import models
+from app.db.models import UserRole
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Read-only stand-in for models.User outside of any session"""
+    id: int
+    email: str
+    username: str
+    full_name: Optional[str]
+    role: UserRole
+    store_id: Optional[int]
+    is_active: bool
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            full_name=user.full_name,
+            role=user.role,
+            store_id=user.store_id,
+            is_active=user.is_active,
+            created_at=user.created_at
+        )
+
+
+class PrincipalCache:
+    """TTL + LRU map of token -> Principal, indexed by user id for invalidation"""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        self._tokens = defaultdict(set)
+        self._generations = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at <= time.time():
+                self._drop(token)
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def generation(self, user_id: int) -> int:
+        """Read before loading the user and pass to put"""
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, token: str, principal: Principal, token_expires_at: Optional[float], generation: int) -> None:
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            # The user was changed while we were loading it
+            if self._generations.get(principal.id, 0) != generation:
+                return
+            self._entries[token] = (expires_at, principal)
+            self._entries.move_to_end(token)
+            self._tokens[principal.id].add(token)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] += 1
+            for token in self._tokens.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+    def _drop(self, token: str) -> None:
+        _, principal = self._entries.pop(token)
+        tokens = self._tokens.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[principal.id]
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_MAX_ENTRIES)
+
+
+def invalidate_user(user_id: int) -> None:
+    principal_cache.invalidate_user(user_id)
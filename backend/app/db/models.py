@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum as SQLEnum, JSON
+from sqlalchemy import Boolean, Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, Enum as SQLEnum, JSON, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -94,7 +94,7 @@ class Product(Base):
     warranty_months = Column(Integer, default=0)
     current_stock = Column(Integer, default=0)
     minimum_stock = Column(Integer, default=10)
-    store_id = Column(Integer, ForeignKey("stores.id"))
+    store_id = Column(Integer, ForeignKey("stores.id"), index=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -129,7 +129,7 @@ class Customer(Base):
     address = Column(Text)
     gst_number = Column(String)
     date_of_birth = Column(DateTime(timezone=True))
-    store_id = Column(Integer, ForeignKey("stores.id"))
+    store_id = Column(Integer, ForeignKey("stores.id"), index=True)
     total_purchases = Column(Float, default=0.0)
     loyalty_points = Column(Integer, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -140,9 +140,15 @@ class Customer(Base):
 
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_store_id_sale_date", "store_id", "sale_date"),
+        Index("ix_sales_customer_id_sale_date", "customer_id", "sale_date"),
+        Index("ix_sales_created_by_sale_date", "created_by", "sale_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     invoice_number = Column(String, unique=True, index=True, nullable=False)
+    idempotency_key = Column(String, unique=True, index=True, nullable=True)  # Client key for offline POS replays
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=True)
     store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
     subtotal = Column(Float, nullable=False)
@@ -152,7 +158,7 @@ class Sale(Base):
     payment_mode = Column(SQLEnum(PaymentMode), nullable=False)
     payment_status = Column(String, default="completed")
     created_by = Column(Integer, ForeignKey("users.id"))
-    sale_date = Column(DateTime(timezone=True), server_default=func.now())
+    sale_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     store = relationship("Store", back_populates="sales")
@@ -168,8 +174,8 @@ class SaleItem(Base):
     __tablename__ = "sale_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    sale_id = Column(Integer, ForeignKey("sales.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)
     gst_rate = Column(Float, nullable=False)
@@ -181,8 +187,161 @@ class SaleItem(Base):
     sale = relationship("Sale", back_populates="sale_items")
     product = relationship("Product", back_populates="sale_items")
 
+class InvoiceSequence(Base):
+    """Per-store, per-day invoice counter used to allocate invoice numbers"""
+    __tablename__ = "invoice_sequences"
+    __table_args__ = (
+        UniqueConstraint("store_id", "sequence_date", name="uq_invoice_sequences_store_date"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    sequence_date = Column(Date, nullable=False)
+    last_value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class DailySalesRollup(Base):
+    """Pre-aggregated sales per store, day and payment mode.
+
+    Maintained inside the sale transaction, rebuildable with
+    backfill_daily_sales_rollup.py.
+    """
+    __tablename__ = "daily_sales_rollup"
+    __table_args__ = (
+        UniqueConstraint("store_id", "sales_date", "payment_mode", name="uq_daily_sales_rollup_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    sales_date = Column(Date, nullable=False, index=True)
+    payment_mode = Column(SQLEnum(PaymentMode), nullable=False)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    subtotal = Column(Float, nullable=False, default=0.0)
+    gst_amount = Column(Float, nullable=False, default=0.0)
+    discount = Column(Float, nullable=False, default=0.0)
+    total_amount = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ReportJob(Base):
+    """Report export running in the background, see app/services/report_jobs.py"""
+    __tablename__ = "report_jobs"
+    
+    id = Column(String, primary_key=True)  # uuid4 hex, also used in the download URL
+    report = Column(String, nullable=False)
+    export_format = Column(String, nullable=False, default="xlsx")
+    params = Column(JSON)
+    dedup_key = Column(String, nullable=False, index=True)
+    store_id = Column(Integer, ForeignKey("stores.id"))  # store scope, NULL = all stores
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, completed, failed, expired
+    progress = Column(Integer, nullable=False, default=0)
+    rows_written = Column(Integer, nullable=False, default=0)
+    filename = Column(String)
+    file_path = Column(String)
+    file_size = Column(Integer)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    expires_at = Column(DateTime)
+
+class CustomerChurnScore(Base):
+    """Churn score per customer, precomputed nightly by precompute_churn_scores.py.
+
+    See app/services/churn.py; /analytics/predict/churn reads this table when
+    it has been filled.
+    """
+    __tablename__ = "customer_churn_scores"
+    __table_args__ = (
+        Index("ix_customer_churn_scores_store_id_churn_score", "store_id", "churn_score"),
+    )
+
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"))
+    churn_score = Column(Integer, nullable=False, index=True)
+    risk_level = Column(String, nullable=False)  # high, medium, low
+    days_since_purchase = Column(Integer, nullable=False)
+    purchase_count = Column(Integer, nullable=False)
+    recent_avg_order = Column(Float)  # last 3 orders
+    early_avg_order = Column(Float)  # first 3 orders
+    scored_at = Column(DateTime, nullable=False)
+
+class ProductBasketCount(Base):
+    """Number of sales (baskets) containing each product.
+
+    Maintained with ProductCooccurrence inside the sale transaction, see
+    app/services/cooccurrence.py; rebuildable with backfill_product_cooccurrence.py.
+    """
+    __tablename__ = "product_basket_counts"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    basket_count = Column(Integer, nullable=False, default=0, index=True)
+
+class ProductCooccurrence(Base):
+    """Number of sales containing both products, stored in both directions"""
+    __tablename__ = "product_cooccurrence"
+    __table_args__ = (
+        Index("ix_product_cooccurrence_product_id_basket_count", "product_id", "basket_count"),
+    )
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    other_product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    basket_count = Column(Integer, nullable=False, default=0, index=True)
+
+class ForecastModel(Base):
+    """Fitted forecast of a store's daily sales or a product's daily units.
+
+    Refitted nightly by fit_forecast_models.py, see app/services/forecasting.py.
+    """
+    __tablename__ = "forecast_models"
+    __table_args__ = (
+        Index("ix_forecast_models_store_id_product_id", "store_id", "product_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)  # NULL = store total sales
+    method = Column(String, nullable=False)  # seasonal_trend, holt_winters
+    level = Column(Float, nullable=False)
+    trend = Column(Float, nullable=False)
+    seasonal = Column(JSON, nullable=False)  # 7 weekday offsets, Monday first
+    residual_std = Column(Float, nullable=False)
+    holdout_mae = Column(Float)
+    history_days = Column(Integer, nullable=False)
+    origin_date = Column(Date, nullable=False)
+    fitted_at = Column(DateTime, nullable=False)
+
+class SmartAlert(Base):
+    """Alert fired by a rule in app/services/smart_alerts.py.
+
+    One row per dedup_key: re-firing updates it, resolved_at is set once the
+    condition no longer holds.
+    """
+    __tablename__ = "smart_alerts"
+    __table_args__ = (
+        Index("ix_smart_alerts_store_id_resolved_at", "store_id", "resolved_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    dedup_key = Column(String, unique=True, nullable=False)  # store:alert_type:source
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    alert_type = Column(String, nullable=False)
+    severity = Column(String, nullable=False)  # critical, warning, info
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    action_required = Column(Boolean, nullable=False, default=True)
+    recommended_action = Column(String)
+    entity_type = Column(String)
+    entity_id = Column(Integer)
+    first_fired_at = Column(DateTime, nullable=False)
+    last_fired_at = Column(DateTime, nullable=False)
+    resolved_at = Column(DateTime)  # NULL = active
+
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_store_id_expense_date", "store_id", "expense_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
@@ -194,7 +353,7 @@ class Expense(Base):
     receipt_number = Column(String)
     voucher_file = Column(String)  # Store file path/URL for bill/voucher
     created_by = Column(Integer, ForeignKey("users.id"))
-    expense_date = Column(DateTime(timezone=True), server_default=func.now())
+    expense_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     store = relationship("Store", back_populates="expenses")
@@ -1,10 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.api.v1 import auth, inventory, sales, customers, financial, reports, users, campaigns, marketing, stores, chatbot
+from app.api.v1 import ads, analytics, auth, automation, cache, inventory, sales, customers, financial, reports, report_jobs, users, campaigns, marketing, stores, chatbot
 from app.core.config import settings
-from app.db.database import engine
+from app.db.database import engine, SessionLocal
 from app.db import models
+from app.core.password_hashing import shutdown_password_hashing
+from app.services.audit import shutdown_audit_writer
+from app.services.chat_context import start_chat_context_refresher, stop_chat_context_refresher
+from app.services.cooccurrence import ensure_product_cooccurrence
+from app.services.http_client import close_http_clients
+from app.services.report_jobs import recover_report_jobs, shutdown_report_jobs
+from app.services.rollups import ensure_daily_sales_rollup
+from app.services.smart_alerts import start_smart_alerts_refresher, stop_smart_alerts_refresher
 import os
 
 # Create database tables
@@ -23,7 +31,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=["Content-Disposition", "X-Next-Cursor"],
 )
 
 # Create upload directories
@@ -43,9 +51,74 @@ app.include_router(sales.router, prefix="/api/v1/sales", tags=["Sales"])
 app.include_router(customers.router, prefix="/api/v1/customers", tags=["Customers"])
 app.include_router(financial.router, prefix="/api/v1/financial", tags=["Financial"])
 app.include_router(reports.router, prefix="/api/v1/reports", tags=["Reports"])
+app.include_router(report_jobs.router, prefix="/api/v1/reports/jobs", tags=["Report Jobs"])
 app.include_router(campaigns.router, prefix="/api/v1/campaigns", tags=["Marketing Campaigns"])
 app.include_router(marketing.router, prefix="/api/v1/marketing", tags=["Marketing Integrations"])
+app.include_router(ads.router, prefix="/api/v1/ads", tags=["Ad Integrations"])
 app.include_router(chatbot.router, prefix="/api/v1/chatbot", tags=["AI Chatbot"])
+app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
+app.include_router(automation.router, prefix="/api/v1/automation", tags=["Automation"])
+app.include_router(cache.router, prefix="/api/v1/cache", tags=["Cache"])
+
+@app.on_event("startup")
+def backfill_sales_rollup():
+    # Databases created before the rollup existed get it filled once
+    db = SessionLocal()
+    try:
+        ensure_daily_sales_rollup(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def backfill_product_cooccurrence():
+    # Same for the product co-occurrence index
+    db = SessionLocal()
+    try:
+        ensure_product_cooccurrence(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def cleanup_report_jobs():
+    # Jobs from a previous process can't finish, and expired files go
+    db = SessionLocal()
+    try:
+        recover_report_jobs(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_chat_context():
+    start_chat_context_refresher()
+
+@app.on_event("shutdown")
+def stop_chat_context():
+    stop_chat_context_refresher()
+
+@app.on_event("startup")
+def start_smart_alerts():
+    start_smart_alerts_refresher()
+
+@app.on_event("shutdown")
+def stop_smart_alerts():
+    stop_smart_alerts_refresher()
+
+@app.on_event("shutdown")
+def stop_report_jobs():
+    shutdown_report_jobs()
+
+@app.on_event("shutdown")
+def stop_password_hashing():
+    shutdown_password_hashing()
+
+@app.on_event("shutdown")
+async def close_outbound_http():
+    await close_http_clients()
+
+@app.on_event("shutdown")
+def flush_audit_log():
+    # Queued audit rows would be lost with the process
+    shutdown_audit_writer()
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class ReportJobCreate(BaseModel):
+    report: str  # one of the JOB_EXPORTS keys, e.g. "sales", "profit-loss", "tax"
+    format: str = "xlsx"
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    store_id: Optional[int] = None
+
+class ReportJobResponse(BaseModel):
+    id: str
+    report: str
+    export_format: str
+    params: Optional[dict] = None
+    store_id: Optional[int] = None
+    status: str
+    progress: int
+    rows_written: int
+    filename: Optional[str] = None
+    file_size: Optional[int] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
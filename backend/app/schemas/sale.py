@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 from app.db.models import PaymentMode
 
 class SaleItemBase(BaseModel):
@@ -61,3 +61,33 @@ class MonthlySalesStats(BaseModel):
     total_transactions: int
     average_transaction_value: float
 
+
+class InvoiceNumberReservation(BaseModel):
+    store_id: int
+    count: int = Field(default=100, ge=1, le=1000)
+
+class InvoiceNumberBlock(BaseModel):
+    store_id: int
+    sequence_date: date
+    invoice_numbers: List[str]
+
+class BulkSaleEntry(SaleCreate):
+    idempotency_key: str = Field(min_length=1, max_length=128)
+    invoice_number: Optional[str] = None  # From a reserved block, allocated if omitted
+    sale_date: Optional[datetime] = None  # When the bill was rung up offline
+
+class BulkSaleRequest(BaseModel):
+    sales: List[BulkSaleEntry] = Field(max_length=5000)
+
+class BulkSaleResult(BaseModel):
+    idempotency_key: str
+    status: str  # created, duplicate, failed
+    sale_id: Optional[int] = None
+    invoice_number: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkSaleResponse(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    results: List[BulkSaleResult]
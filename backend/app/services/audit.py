@@ -0,0 +1,246 @@
+"""
+Audit log writer.
+
+Write paths call record() (or record_many()) before committing their own
+transaction, and AUDIT_LOG_MODE decides what happens to the rows:
+
+- "transactional": the rows are added to the caller's session and commit
+  with the change they describe - durable, at the cost of the inserts
+  running inside the request's transaction.
+- "async" (default): the rows wait on the session until it commits (a
+  rolled-back change logs nothing), then go to an in-memory queue that a
+  background thread bulk-inserts whenever AUDIT_LOG_BATCH_SIZE rows are
+  waiting or AUDIT_LOG_FLUSH_SECONDS have passed. Rows still queued when the
+  process dies are lost. Sessions bound to a single-connection pool
+  (StaticPool, SingletonThreadPool) always log transactionally, since the
+  flusher would otherwise share their one connection mid-transaction.
+
+The queue holds at most AUDIT_LOG_MAX_QUEUE rows. When the flusher falls that
+far behind, committing requests wait up to AUDIT_LOG_ENQUEUE_TIMEOUT seconds
+for room and then write their rows themselves: under load audit writes slow
+down instead of being dropped. shutdown_audit_writer() flushes what is left.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
+from app.core.config import settings
+from app.db import models
+
+logger = logging.getLogger(__name__)
+
+TRANSACTIONAL = "transactional"
+ASYNC = "async"
+
+_PENDING_KEY = "pending_audit_rows"
+
+
+def audit_row(
+    user_id: int,
+    action: str,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    details: Any = None,
+    ip_address: Optional[str] = None
+) -> dict:
+    """One audit_logs row; ``details`` that isn't a string is JSON-encoded"""
+    if details is not None and not isinstance(details, str):
+        details = json.dumps(details, default=str)
+    return {
+        "user_id": user_id,
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "details": details,
+        "ip_address": ip_address,
+        # Taken now rather than when the flusher gets to it
+        "created_at": datetime.now(timezone.utc)
+    }
+
+
+def record(db: Session, user_id: int, action: str, entity_type: Optional[str] = None,
+           entity_id: Optional[int] = None, details: Any = None) -> None:
+    """Log one action as part of the caller's next commit"""
+    record_many(db, [audit_row(user_id, action, entity_type, entity_id, details)])
+
+
+def _single_connection(bind) -> bool:
+    return isinstance(getattr(bind, "pool", None), (StaticPool, SingletonThreadPool))
+
+
+def record_many(db: Session, rows: List[dict]) -> None:
+    if not rows:
+        return
+    if settings.AUDIT_LOG_MODE == TRANSACTIONAL or _single_connection(db.get_bind()):
+        db.execute(insert(models.AuditLog.__table__), rows)
+        return
+    db.info.setdefault(_PENDING_KEY, []).extend(rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed(session: Session) -> None:
+    rows = session.info.pop(_PENDING_KEY, None)
+    if rows:
+        writer.enqueue(session.get_bind(), rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _insert_rows(engine, rows: List[dict]) -> None:
+    with engine.begin() as connection:
+        connection.execute(insert(models.AuditLog.__table__), rows)
+
+
+class AuditLogWriter:
+    """Bounded queue of (engine, row) drained by one daemon thread"""
+
+    def __init__(self, batch_size: int, flush_seconds: float, max_queue: int, enqueue_timeout: float):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = defaultdict(int)
+
+    def enqueue(self, engine, rows: List[dict]) -> None:
+        self._ensure_started()
+        overflow = []
+        for row in rows:
+            try:
+                self._queue.put((engine, row), timeout=self.enqueue_timeout)
+            except queue.Full:
+                overflow.append(row)
+        self._count("enqueued", len(rows) - len(overflow))
+        if overflow:
+            # Backpressure: the flusher can't keep up, so this request pays for its own rows
+            _insert_rows(engine, overflow)
+            self._count("overflow_writes", len(overflow))
+
+    def flush(self) -> int:
+        """Write everything queued right now from the calling thread"""
+        return self._write(self._drain(self._queue.qsize()))
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=max(5.0, self.flush_seconds * 2))
+        self.flush()
+        self._thread = None
+        self._stop.clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "mode": settings.AUDIT_LOG_MODE,
+                "queued": self._queue.qsize(),
+                # Includes the batch the flusher is collecting
+                "pending": self._stats["enqueued"] - self._stats["written"] - self._stats["dropped"],
+                "enqueued": self._stats["enqueued"],
+                "written": self._stats["written"],
+                "batches": self._stats["batches"],
+                "overflow_writes": self._stats["overflow_writes"],
+                "failed_batches": self._stats["failed_batches"],
+                "dropped": self._stats["dropped"]
+            }
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                self._thread.start()
+
+    def _drain(self, limit: int) -> List[tuple]:
+        items = []
+        while len(items) < limit:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.flush_seconds
+            batch = []
+            # Collect until the batch is full or the interval is over
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.5)))
+                except queue.Empty:
+                    continue
+                batch.extend(self._drain(self.batch_size - len(batch)))
+            self._write(batch)
+
+    def _write(self, items: List[tuple]) -> int:
+        if not items:
+            return 0
+        by_engine = defaultdict(list)
+        for engine, row in items:
+            by_engine[engine].append(row)
+
+        written = 0
+        for engine, rows in by_engine.items():
+            for attempt in range(3):
+                try:
+                    _insert_rows(engine, rows)
+                    written += len(rows)
+                    break
+                except Exception:
+                    logger.warning("Audit log batch failed (attempt %d)", attempt + 1, exc_info=True)
+                    time.sleep(0.1 * 2 ** attempt)
+            else:
+                self._count("failed_batches")
+                self._count("dropped", len(rows))
+                logger.error("Dropped %d audit log rows after repeated failures", len(rows))
+
+        self._count("written", written)
+        self._count("batches")
+        return written
+
+
+writer = AuditLogWriter(
+    settings.AUDIT_LOG_BATCH_SIZE,
+    settings.AUDIT_LOG_FLUSH_SECONDS,
+    settings.AUDIT_LOG_MAX_QUEUE,
+    settings.AUDIT_LOG_ENQUEUE_TIMEOUT
+)
+
+
+def flush_audit_log() -> int:
+    return writer.flush()
+
+
+def shutdown_audit_writer() -> None:
+    writer.shutdown()
+
+
+def audit_stats() -> dict:
+    return writer.stats()
+
+
+# Scripts that record audit rows never see the app's shutdown event
+atexit.register(shutdown_audit_writer)
@@ -0,0 +1,267 @@
+"""
+Bulk sale ingestion for offline POS batches.
+
+A terminal that lost connectivity replays its bills in one request. Every bill
+carries a client idempotency key so a replay of the same batch is harmless.
+The batch is validated against a single product snapshot, stock is reserved
+per product with conditional updates, and sales, sale_items, customer totals,
+the daily rollup and the co-occurrence index are written with executemany in
+one transaction, with the audit rows handed to app.services.audit. Invoice
+numbers a terminal supplies must come from a block it reserved, so they are
+already behind the store's counter and never collide with the next online sale.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.cache import response_cache, SALES
+from app.db import models
+from app.schemas.sale import BulkSaleEntry
+from app.services import audit
+from app.services.cooccurrence import apply_baskets
+from app.services.invoice_numbers import allocate_invoice_numbers, issued_up_to, parse_invoice_number
+from app.services.rollups import apply_sales
+from app.services.sale_pipeline import IN_CHUNK_SIZE, build_sale, load_products
+from app.services.stock import InsufficientStockError, aggregate_quantities, reserve_stock
+
+# Re-validate against a fresh snapshot if online tills drain stock mid-batch
+MAX_SNAPSHOT_ATTEMPTS = 3
+
+
+def _chunks(values: List, size: int = IN_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _existing_keys(db: Session, keys: List[str]) -> Dict[str, models.Sale]:
+    found = {}
+    for chunk in _chunks(sorted(set(keys))):
+        rows = db.query(
+            models.Sale.id, models.Sale.invoice_number, models.Sale.idempotency_key
+        ).filter(models.Sale.idempotency_key.in_(chunk))
+        for row in rows:
+            found[row.idempotency_key] = row
+    return found
+
+
+def _existing_invoice_numbers(db: Session, invoice_numbers: List[str]) -> set:
+    found = set()
+    for chunk in _chunks(sorted(set(invoice_numbers))):
+        rows = db.query(models.Sale.invoice_number).filter(models.Sale.invoice_number.in_(chunk))
+        found.update(invoice_number for (invoice_number,) in rows)
+    return found
+
+
+def _result(entry: BulkSaleEntry, outcome: str, sale_id: Optional[int] = None,
+            invoice_number: Optional[str] = None, error: Optional[str] = None) -> dict:
+    return {
+        "idempotency_key": entry.idempotency_key,
+        "status": outcome,
+        "sale_id": sale_id,
+        "invoice_number": invoice_number,
+        "error": error
+    }
+
+
+def _validate_against_snapshot(entries, pending, products, results) -> List[int]:
+    """Return the entries that fit the snapshot, failing the rest in ``results``"""
+    available = {product_id: product.current_stock for product_id, product in products.items()}
+    accepted = []
+
+    for index in pending:
+        entry = entries[index]
+        missing = [item.product_id for item in entry.items if item.product_id not in products]
+        if missing:
+            results[index] = _result(entry, "failed", error=f"Product with id {missing[0]} not found")
+            continue
+
+        quantities = aggregate_quantities((item.product_id, item.quantity) for item in entry.items)
+        short = [product_id for product_id, quantity in quantities.items() if available[product_id] < quantity]
+        if short:
+            names = ", ".join(products[product_id].name for product_id in short)
+            results[index] = _result(entry, "failed", error=f"Insufficient stock for product {names}")
+            continue
+
+        for product_id, quantity in quantities.items():
+            available[product_id] -= quantity
+        results[index] = None
+        accepted.append(index)
+
+    return accepted
+
+
+def _insert_sales(db: Session, rows: List[dict]) -> List[int]:
+    """executemany INSERT, then map the new ids back through the invoice number.
+
+    INSERT ... RETURNING with ordered results is not batched on every driver,
+    the unique invoice number gives the same answer in a handful of queries.
+    """
+    if not rows:
+        return []
+    db.execute(insert(models.Sale.__table__), rows)
+
+    ids = {}
+    for chunk in _chunks([row["invoice_number"] for row in rows]):
+        for sale_id, invoice_number in db.query(models.Sale.id, models.Sale.invoice_number).filter(
+            models.Sale.invoice_number.in_(chunk)
+        ):
+            ids[invoice_number] = sale_id
+    return [ids[row["invoice_number"]] for row in rows]
+
+
+def ingest_sales(db: Session, entries: List[BulkSaleEntry], current_user: models.User) -> dict:
+    results: List[Optional[dict]] = [None] * len(entries)
+
+    # Idempotency: replays of already ingested bills, or repeats inside the batch
+    existing = _existing_keys(db, [entry.idempotency_key for entry in entries])
+    supplied_numbers = _existing_invoice_numbers(
+        db, [entry.invoice_number for entry in entries if entry.invoice_number]
+    )
+    parsed_numbers = {
+        index: parse_invoice_number(entry.invoice_number, entry.store_id)
+        for index, entry in enumerate(entries) if entry.invoice_number
+    }
+    issued = issued_up_to(db, (
+        (entries[index].store_id, parsed[0]) for index, parsed in parsed_numbers.items() if parsed
+    ))
+
+    pending = []
+    seen_keys = set()
+    seen_numbers = set()
+    for index, entry in enumerate(entries):
+        if entry.idempotency_key in existing:
+            sale = existing[entry.idempotency_key]
+            results[index] = _result(entry, "duplicate", sale.id, sale.invoice_number)
+        elif entry.idempotency_key in seen_keys:
+            results[index] = _result(entry, "duplicate", error="Idempotency key repeated in batch")
+        elif current_user.role != models.UserRole.SUPER_ADMIN and entry.store_id != current_user.store_id:
+            results[index] = _result(entry, "failed", error="Not enough permissions")
+        elif not entry.items:
+            results[index] = _result(entry, "failed", error="Sale has no items")
+        elif entry.invoice_number and parsed_numbers[index] is None:
+            results[index] = _result(
+                entry, "failed", error=f"Invoice number {entry.invoice_number} is not a store {entry.store_id} invoice number"
+            )
+        elif entry.invoice_number and parsed_numbers[index][1] > issued[(entry.store_id, parsed_numbers[index][0])]:
+            # Above the counter the next online sale would be handed this number
+            results[index] = _result(entry, "failed", error=f"Invoice number {entry.invoice_number} was not reserved")
+        elif entry.invoice_number and (entry.invoice_number in supplied_numbers or entry.invoice_number in seen_numbers):
+            results[index] = _result(entry, "failed", error=f"Invoice number {entry.invoice_number} already used")
+        else:
+            seen_keys.add(entry.idempotency_key)
+            if entry.invoice_number:
+                seen_numbers.add(entry.invoice_number)
+            pending.append(index)
+
+    product_ids = {item.product_id for index in pending for item in entries[index].items}
+
+    accepted = []
+    for _ in range(MAX_SNAPSHOT_ATTEMPTS):
+        products = load_products(db, product_ids)
+        accepted = _validate_against_snapshot(entries, pending, products, results)
+        try:
+            reserve_stock(db, aggregate_quantities(
+                (item.product_id, item.quantity)
+                for index in accepted
+                for item in entries[index].items
+            ))
+            break
+        except InsufficientStockError:
+            # Stock moved under us - drop the partial reservation and retry
+            db.rollback()
+    else:
+        for index in accepted:
+            results[index] = _result(entries[index], "failed", error="Stock changed during ingestion, please retry")
+        accepted = []
+
+    try:
+        # Allocate invoice numbers per store in one block each
+        missing_numbers = defaultdict(list)
+        for index in accepted:
+            if not entries[index].invoice_number:
+                missing_numbers[entries[index].store_id].append(index)
+        invoice_numbers = {}
+        for store_id, indexes in missing_numbers.items():
+            block = allocate_invoice_numbers(db, store_id, len(indexes))
+            invoice_numbers.update(zip(indexes, block))
+
+        sale_rows = []
+        item_rows = []
+        for index in accepted:
+            entry = entries[index]
+            sale_row, sale_items = build_sale(
+                entry,
+                products,
+                invoice_number=entry.invoice_number or invoice_numbers[index],
+                created_by=current_user.id
+            )
+            sale_row["idempotency_key"] = entry.idempotency_key
+            if entry.sale_date:
+                sale_row["sale_date"] = entry.sale_date
+            sale_rows.append(sale_row)
+            item_rows.append(sale_items)
+
+        sale_ids = _insert_sales(db, sale_rows)
+
+        all_items = []
+        for sale_id, sale_items in zip(sale_ids, item_rows):
+            for row in sale_items:
+                row["sale_id"] = sale_id
+                all_items.append(row)
+        if all_items:
+            db.execute(insert(models.SaleItem.__table__), all_items)
+
+        # Customer totals, one executemany for the whole batch
+        customer_totals = defaultdict(float)
+        for row in sale_rows:
+            if row["customer_id"]:
+                customer_totals[row["customer_id"]] += row["total_amount"]
+        if customer_totals:
+            customers = models.Customer.__table__
+            db.execute(
+                update(customers)
+                .where(customers.c.id == bindparam("b_customer_id"))
+                .values(total_purchases=customers.c.total_purchases + bindparam("b_amount")),
+                [{"b_customer_id": customer_id, "b_amount": amount} for customer_id, amount in customer_totals.items()]
+            )
+
+        apply_sales(db, sale_rows)
+        apply_baskets(db, ([row["product_id"] for row in sale_items] for sale_items in item_rows))
+
+        audit.record_many(db, [
+            audit.audit_row(current_user.id, "create", "sale", sale_id, {
+                "invoice_number": row["invoice_number"],
+                "total_amount": row["total_amount"],
+                "items_count": len(sale_items),
+                "source": "bulk"
+            })
+            for sale_id, row, sale_items in zip(sale_ids, sale_rows, item_rows)
+        ])
+
+        db.commit()
+    except IntegrityError:
+        # Another request ingested one of these keys or invoice numbers first.
+        # Retrying the batch is safe: committed bills come back as duplicates.
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Batch conflicted with a concurrent ingestion, please retry"
+        )
+    except Exception:
+        db.rollback()
+        raise
+
+    if sale_rows:
+        response_cache.invalidate([SALES], {row["store_id"] for row in sale_rows})
+
+    for index, sale_id, row in zip(accepted, sale_ids, sale_rows):
+        results[index] = _result(entries[index], "created", sale_id, row["invoice_number"])
+
+    return {
+        "created": sum(1 for result in results if result["status"] == "created"),
+        "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+        "failed": sum(1 for result in results if result["status"] == "failed"),
+        "results": results
+    }
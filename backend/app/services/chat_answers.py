@@ -0,0 +1,93 @@
+"""
+Answer cache for the AI chatbot.
+
+Most chat questions are the same few ("today's sales", "low stock", "top
+customers"), so answers are kept in an in-process LRU (the response cache's
+MemoryBackend) for CHAT_ANSWER_CACHE_TTL_SECONDS, at most
+CHAT_ANSWER_CACHE_MAX_ENTRIES of them. The key is:
+
+- the question lowercased with punctuation and extra spaces dropped, words
+  kept in order, so "How are today's sales?" and "how are todays sales"
+  share an answer while "Why did sales drop?" and "When did sales drop?"
+  don't;
+- the store scope;
+- the data version: the write generations of sales, products and expenses
+  for the scope (see app.core.cache) and when the context snapshot was
+  built, so any write or snapshot rebuild makes old answers unreachable;
+- the mode: Ollama answers and fallback answers are kept apart, and Ollama
+  answers to follow-up questions also depend on the conversation so far.
+"""
+import hashlib
+import json
+import re
+import threading
+from typing import List, Optional
+from app.core.cache import MemoryBackend, response_cache
+from app.core.config import settings
+from app.services.chat_context import TOPICS, ContextSnapshot
+
+LLM = "llm"
+FALLBACK = "fallback"
+
+
+def question_key(question: str) -> str:
+    # Every word counts: question words and word order change the answer
+    return " ".join(re.findall(r"[a-z0-9]+", re.sub(r"['’]", "", question.lower())))
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int, ttl: int):
+        self.ttl = ttl
+        self._backend = MemoryBackend(max_entries) if ttl > 0 and max_entries > 0 else None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def key(self, mode: str, question: str, store_id: Optional[int], snapshot: ContextSnapshot,
+            history: Optional[List[dict]] = None) -> Optional[str]:
+        """None when the question can't be cached"""
+        normalized = question_key(question)
+        generations = response_cache.generations(TOPICS, [store_id] if store_id is not None else None)
+        # Without write generations a write could go unnoticed for the whole TTL
+        if not normalized or generations is None or "error" in snapshot.context:
+            return None
+        conversation = None
+        if mode == LLM and history:
+            conversation = hashlib.sha1(json.dumps(history, sort_keys=True, default=str).encode()).hexdigest()
+        return json.dumps([mode, store_id, generations, snapshot.built_at, normalized, conversation])
+
+    def get(self, key: Optional[str]) -> Optional[dict]:
+        if key is None or self._backend is None:
+            return None
+        value = self._backend.get(key)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def set(self, key: Optional[str], value: dict) -> None:
+        if key is not None and self._backend is not None:
+            self._backend.set(key, value, self.ttl)
+
+    def clear(self) -> None:
+        if self._backend is not None:
+            self._backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self._backend is not None,
+                "ttl_seconds": self.ttl,
+                "entries": self._backend.size() if self._backend is not None else 0,
+                "max_entries": self._backend.max_entries if self._backend is not None else 0,
+                "evictions": self._backend.evictions if self._backend is not None else 0,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0
+            }
+
+
+answer_cache = AnswerCache(settings.CHAT_ANSWER_CACHE_MAX_ENTRIES, settings.CHAT_ANSWER_CACHE_TTL_SECONDS)
@@ -0,0 +1,283 @@
+"""
+Store context snapshots for the AI chatbot.
+
+Every chat message used to load all products, customers and the last 30
+days of sales and expenses through the ORM on the event loop. The context is
+now a small dict of aggregates per scope (one store, or every store for
+super admins) built by a handful of SQL aggregates and kept in memory:
+
+- get_chat_context() is a dict lookup, so chat latency no longer depends on
+  catalog size. Only the first message of a scope waits for a build, which
+  runs on a worker thread while the event loop keeps serving.
+- A background thread rebuilds a snapshot every CHAT_CONTEXT_REFRESH_SECONDS
+  when a sale, product or expense write was recorded for its scope (the
+  response cache's write generations, see app.core.cache), when the day
+  rolled over, or when it is older than CHAT_CONTEXT_MAX_AGE_SECONDS.
+  Scopes nobody chatted in for CHAT_CONTEXT_IDLE_SECONDS are dropped.
+
+Each snapshot also carries a ProductIndex of the scope's products, which
+app.services.chat_prompt uses to put the products a question names into
+the prompt.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from app.core.cache import response_cache, EXPENSES, PRODUCTS, SALES
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+from app.services.chat_prompt import ProductIndex
+from app.services.rollups import sales_totals
+
+logger = logging.getLogger(__name__)
+
+TOPICS = [SALES, PRODUCTS, EXPENSES]
+WINDOW_DAYS = 30
+LOW_STOCK_ITEMS = 10
+TOP_ITEMS = 5
+DEFAULT_MINIMUM_STOCK = 5
+
+
+@dataclass(frozen=True)
+class ContextSnapshot:
+    context: dict
+    built_at: float
+    day: date
+    generations: Optional[tuple]
+    product_index: Optional[ProductIndex] = None
+
+
+_snapshots: Dict[Optional[int], ContextSnapshot] = {}
+_last_read: Dict[Optional[int], float] = {}
+_building: Dict[Optional[int], Future] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_refresher: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def context_scope(user: models.User) -> Optional[int]:
+    """Store the user's context covers, None for every store"""
+    if user.role != models.UserRole.SUPER_ADMIN and user.store_id:
+        return user.store_id
+    return None
+
+
+def build_store_context(db: Session, store_id: Optional[int]) -> dict:
+    """Aggregates the chatbot prompt is built from"""
+    def scoped(query, column):
+        return query.filter(column == store_id) if store_id is not None else query
+
+    context = {}
+    product = models.Product
+    stock = func.coalesce(product.current_stock, 0)
+    value = func.coalesce(product.cost_price, 0) * stock
+    # A minimum of 0 counts as unset
+    low_stock = stock <= func.coalesce(func.nullif(product.minimum_stock, 0), DEFAULT_MINIMUM_STOCK)
+
+    total_products, inventory_value, low_stock_count, out_of_stock_count = scoped(db.query(
+        func.count(product.id),
+        func.sum(value),
+        func.sum(case((low_stock, 1), else_=0)),
+        func.sum(case((stock == 0, 1), else_=0))
+    ), product.store_id).one()
+    low_stock_items = scoped(
+        db.query(product.name, product.current_stock, product.minimum_stock).filter(low_stock),
+        product.store_id
+    ).order_by(product.id).limit(LOW_STOCK_ITEMS).all()
+    top_by_value = scoped(db.query(product.name, value), product.store_id).order_by(
+        value.desc(), product.id
+    ).limit(TOP_ITEMS).all()
+
+    context["inventory"] = {
+        "total_products": total_products,
+        "total_inventory_value": round(inventory_value or 0, 2),
+        "low_stock_count": low_stock_count or 0,
+        "out_of_stock_count": out_of_stock_count or 0,
+        "low_stock_items": [
+            {"name": name, "stock": current_stock, "min_level": minimum_stock}
+            for name, current_stock, minimum_stock in low_stock_items
+        ],
+        "top_products_by_value": [
+            {"name": name, "value": round(product_value or 0, 2)} for name, product_value in top_by_value
+        ]
+    }
+
+    # Sales from the daily rollup
+    today = date.today()
+    store_ids = [store_id] if store_id is not None else None
+    window = sales_totals(db, today - timedelta(days=WINDOW_DAYS), today + timedelta(days=1), store_ids)
+    today_totals = sales_totals(db, today, today + timedelta(days=1), store_ids)
+    total_sales = window["total_amount"]
+    total_transactions = window["transaction_count"]
+    context["sales"] = {
+        "last_30_days_revenue": round(total_sales, 2),
+        "last_30_days_transactions": total_transactions,
+        "average_transaction_value": round(total_sales / total_transactions, 2) if total_transactions > 0 else 0,
+        "today_revenue": round(today_totals["total_amount"], 2),
+        "today_transactions": today_totals["transaction_count"]
+    }
+
+    customer = models.Customer
+    purchases = func.coalesce(customer.total_purchases, 0)
+    total_customers = scoped(db.query(func.count(customer.id)), customer.store_id).scalar()
+    top_customers = scoped(db.query(customer.name, purchases), customer.store_id).order_by(
+        purchases.desc(), customer.id
+    ).limit(TOP_ITEMS).all()
+    context["customers"] = {
+        "total_customers": total_customers,
+        "top_customers": [{"name": name, "total_purchases": round(total or 0, 2)} for name, total in top_customers]
+    }
+
+    expense = models.Expense
+    category = func.coalesce(expense.category, "Other")
+    window_start = datetime.combine(today - timedelta(days=WINDOW_DAYS), datetime.min.time())
+    by_category = scoped(
+        db.query(category, func.sum(expense.amount)).filter(expense.expense_date >= window_start),
+        expense.store_id
+    ).group_by(category).all()
+    total_expenses = sum(amount or 0 for _, amount in by_category)
+    context["financial"] = {
+        "last_30_days_expenses": round(total_expenses, 2),
+        "estimated_profit": round(total_sales - total_expenses, 2),
+        "expense_breakdown": {name: round(amount or 0, 2) for name, amount in by_category}
+    }
+
+    if store_id is not None:
+        store = db.query(models.Store.name, models.Store.address).filter(models.Store.id == store_id).first()
+        if store:
+            context["store"] = {"name": store.name, "address": store.address}
+
+    return context
+
+
+def build_product_index(db: Session, store_id: Optional[int]) -> ProductIndex:
+    product = models.Product
+    query = db.query(
+        product.id, product.sku, product.name, product.category, product.brand,
+        product.current_stock, product.minimum_stock, product.unit_price
+    )
+    if store_id is not None:
+        query = query.filter(product.store_id == store_id)
+    return ProductIndex(query.yield_per(1000))
+
+
+def refresh_snapshot(store_id: Optional[int]) -> ContextSnapshot:
+    """Rebuild one scope's snapshot on the calling thread"""
+    # Read first: a write landing during the build makes the next check rebuild
+    generations = response_cache.generations(TOPICS, [store_id] if store_id is not None else None)
+    day = date.today()
+    db = SessionLocal()
+    try:
+        context = build_store_context(db, store_id)
+        product_index = build_product_index(db, store_id)
+    finally:
+        db.close()
+    snapshot = ContextSnapshot(context, time.time(), day, generations, product_index)
+    with _lock:
+        _snapshots[store_id] = snapshot
+    return snapshot
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-context")
+    return _executor
+
+
+def _submit_refresh(store_id: Optional[int]) -> Future:
+    """One build per scope at a time"""
+    with _lock:
+        future = _building.get(store_id)
+        if future is None:
+            future = _building[store_id] = _get_executor().submit(refresh_snapshot, store_id)
+            future.add_done_callback(lambda _: _done_building(store_id))
+        return future
+
+
+def _done_building(store_id: Optional[int]) -> None:
+    with _lock:
+        _building.pop(store_id, None)
+
+
+async def get_chat_snapshot(user: models.User) -> ContextSnapshot:
+    """The user's store context and product index without blocking the event loop"""
+    store_id = context_scope(user)
+    now = time.time()
+    with _lock:
+        snapshot = _snapshots.get(store_id)
+        _last_read[store_id] = now
+    if snapshot is None:
+        try:
+            snapshot = await asyncio.wrap_future(_submit_refresh(store_id))
+        except Exception as e:
+            return ContextSnapshot({"error": f"Error fetching some data: {str(e)}"}, now, date.today(), None)
+    elif now - snapshot.built_at > settings.CHAT_CONTEXT_MAX_AGE_SECONDS:
+        # Refresher behind or stopped: answer from the old snapshot, rebuild for the next message
+        _submit_refresh(store_id)
+    return snapshot
+
+
+async def get_chat_context(user: models.User) -> dict:
+    return (await get_chat_snapshot(user)).context
+
+
+def _is_stale(store_id: Optional[int], snapshot: ContextSnapshot, now: float) -> bool:
+    if snapshot.day != date.today() or now - snapshot.built_at > settings.CHAT_CONTEXT_MAX_AGE_SECONDS:
+        return True
+    generations = response_cache.generations(TOPICS, [store_id] if store_id is not None else None)
+    return generations is None or generations != snapshot.generations
+
+
+def refresh_stale_snapshots() -> int:
+    """Drop idle scopes and rebuild stale ones, returns how many were rebuilt"""
+    now = time.time()
+    with _lock:
+        for store_id in [s for s, read_at in _last_read.items() if now - read_at > settings.CHAT_CONTEXT_IDLE_SECONDS]:
+            _last_read.pop(store_id, None)
+            _snapshots.pop(store_id, None)
+        snapshots = list(_snapshots.items())
+
+    rebuilt = 0
+    for store_id, snapshot in snapshots:
+        if not _is_stale(store_id, snapshot, now):
+            continue
+        try:
+            _submit_refresh(store_id).result()
+            rebuilt += 1
+        except Exception:
+            logger.warning("Could not refresh chatbot context for store %s", store_id, exc_info=True)
+    return rebuilt
+
+
+def _run_refresher() -> None:
+    while not _stop.wait(settings.CHAT_CONTEXT_REFRESH_SECONDS):
+        try:
+            refresh_stale_snapshots()
+        except Exception:
+            logger.warning("Chatbot context refresh failed", exc_info=True)
+
+
+def start_chat_context_refresher() -> None:
+    global _refresher
+    if _refresher is None:
+        _stop.clear()
+        _refresher = threading.Thread(target=_run_refresher, name="chat-context-refresher", daemon=True)
+        _refresher.start()
+
+
+def stop_chat_context_refresher() -> None:
+    global _refresher, _executor
+    _stop.set()
+    _refresher = None
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,267 @@
+"""
+System prompt building for the AI chatbot under a token budget.
+
+Prompt size dominates how long the model takes to answer, so the prompt
+only carries what the question needs:
+
+- Context sections (inventory, sales, customers, finances) are ranked by how
+  many of their keywords the question contains. Sections the question is
+  about are rendered in full, the rest as a one-line summary, and whatever
+  no longer fits in CHAT_PROMPT_TOKEN_BUDGET is left out.
+- Products named in the question are looked up in a ProductIndex, an
+  inverted index over product names, SKUs, categories and brands, ranked
+  by inverse document frequency so rare words ("kurta") outweigh common
+  ones ("cotton"). At most CHAT_PROMPT_MAX_PRODUCTS go in, ahead of the
+  other sections.
+
+Tokens are estimated at four characters each, close enough for budgeting
+without a tokenizer for the model.
+"""
+import math
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+
+CHARS_PER_TOKEN = 4
+NAME_WEIGHT = 1.0
+TAG_WEIGHT = 0.5
+SKU_WEIGHT = 10.0
+
+STOPWORDS = {
+    "a", "about", "all", "am", "an", "and", "any", "are", "as", "at", "be", "by", "can", "could", "do",
+    "does", "for", "from", "get", "give", "have", "how", "i", "in", "is", "it", "its", "list", "many",
+    "me", "much", "my", "of", "on", "or", "our", "please", "show", "tell", "than", "that", "the", "there",
+    "this", "to", "us", "was", "we", "what", "when", "which", "who", "why", "will", "with", "you", "your"
+}
+
+HEADER = """You are an AI assistant for SKOPE ERP, a retail management system.
+You help store managers and staff understand their business data and answer questions about inventory, sales, customers, and finances.
+
+Here is the current store data you have access to:
+"""
+
+INSTRUCTIONS = """
+Instructions:
+1. Answer questions based on the data provided above
+2. Be helpful, concise, and professional
+3. If asked about data you don't have, politely say you don't have that specific information
+4. Use Indian Rupees (₹) for currency
+5. Provide actionable insights when relevant
+6. Format numbers nicely (e.g., ₹1,23,456.00)
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _normalize(word: str) -> str:
+    # Plurals match their singular: "shirts" finds "Shirt"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def terms(text: Optional[str]) -> List[str]:
+    """Lowercased words of ``text`` without stopwords, plurals folded"""
+    if not text:
+        return []
+    return [_normalize(word) for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class ProductEntry:
+    id: int
+    sku: str
+    name: str
+    category: Optional[str]
+    current_stock: Optional[int]
+    minimum_stock: Optional[int]
+    unit_price: Optional[float]
+
+
+class ProductIndex:
+    """Inverted index from name, category and brand terms to products"""
+
+    def __init__(self, rows: Iterable[tuple]):
+        """``rows`` of (id, sku, name, category, brand, current_stock, minimum_stock, unit_price)"""
+        self.products: List[ProductEntry] = []
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._skus: Dict[str, int] = {}
+        for product_id, sku, name, category, brand, current_stock, minimum_stock, unit_price in rows:
+            position = len(self.products)
+            self.products.append(ProductEntry(product_id, sku, name, category, current_stock, minimum_stock, unit_price))
+            for term in terms(category) + terms(brand):
+                self._postings[term][position] = TAG_WEIGHT
+            for term in terms(name):
+                self._postings[term][position] = NAME_WEIGHT
+            if sku:
+                self._skus[sku.lower()] = position
+        self._postings = dict(self._postings)
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def search(self, question: str, limit: int) -> List[ProductEntry]:
+        """Products the question mentions, best match first"""
+        scores: Dict[int, float] = defaultdict(float)
+        total = len(self.products)
+        for term in set(terms(question)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for position, weight in postings.items():
+                scores[position] += weight * idf
+        for word in re.findall(r"[\w-]+", question.lower()):
+            position = self._skus.get(word)
+            if position is not None:
+                scores[position] += SKU_WEIGHT
+        best = sorted(scores.items(), key=lambda item: (-item[1], self.products[item[0]].id))[:limit]
+        return [self.products[position] for position, _ in best]
+
+
+def _money(value) -> str:
+    return f"₹{value or 0:,.2f}"
+
+
+def _inventory(context: dict, full: bool) -> List[str]:
+    inventory = context.get("inventory", {})
+    lines = [
+        "## Inventory Summary",
+        f"- Products: {inventory.get('total_products', 'N/A')}, value {_money(inventory.get('total_inventory_value'))}, "
+        f"low stock {inventory.get('low_stock_count', 'N/A')}, out of stock {inventory.get('out_of_stock_count', 'N/A')}"
+    ]
+    if full:
+        low = ", ".join(f"{item['name']} ({item['stock']}/{item['min_level']})" for item in inventory.get("low_stock_items", []))
+        top = ", ".join(f"{item['name']} {_money(item['value'])}" for item in inventory.get("top_products_by_value", []))
+        if low:
+            lines.append(f"- Low stock (stock/minimum): {low}")
+        if top:
+            lines.append(f"- Top products by value: {top}")
+    return lines
+
+
+def _sales(context: dict, full: bool) -> List[str]:
+    sales = context.get("sales", {})
+    lines = [
+        "## Sales Summary (Last 30 Days)",
+        f"- Revenue {_money(sales.get('last_30_days_revenue'))} from {sales.get('last_30_days_transactions', 'N/A')} transactions"
+    ]
+    if full:
+        lines.append(f"- Average transaction {_money(sales.get('average_transaction_value'))}")
+        lines.append(f"- Today: {_money(sales.get('today_revenue'))} from {sales.get('today_transactions', 'N/A')} transactions")
+    return lines
+
+
+def _customers(context: dict, full: bool) -> List[str]:
+    customers = context.get("customers", {})
+    lines = ["## Customer Summary", f"- Customers: {customers.get('total_customers', 'N/A')}"]
+    top = ", ".join(f"{item['name']} {_money(item['total_purchases'])}" for item in customers.get("top_customers", []))
+    if full and top:
+        lines.append(f"- Top customers by purchases: {top}")
+    return lines
+
+
+def _financial(context: dict, full: bool) -> List[str]:
+    financial = context.get("financial", {})
+    lines = [
+        "## Financial Summary (Last 30 Days)",
+        f"- Expenses {_money(financial.get('last_30_days_expenses'))}, estimated profit {_money(financial.get('estimated_profit'))}"
+    ]
+    breakdown = ", ".join(f"{name} {_money(amount)}" for name, amount in financial.get("expense_breakdown", {}).items())
+    if full and breakdown:
+        lines.append(f"- Expenses by category: {breakdown}")
+    return lines
+
+
+# name, question keywords (normalized like terms()), renderer
+SECTIONS: List[Tuple[str, set, Callable[[dict, bool], List[str]]]] = [
+    ("inventory", {"inventory", "stock", "product", "item", "reorder", "low", "out", "restock", "value", "warehouse"}, _inventory),
+    ("sales", {"sale", "sold", "sell", "selling", "revenue", "transaction", "today", "turnover", "order"}, _sales),
+    ("customers", {"customer", "buyer", "client", "loyal", "loyalty", "top", "shopper"}, _customers),
+    ("financial", {"expense", "profit", "cost", "spend", "spent", "finance", "financial", "margin", "rent", "loss"}, _financial),
+]
+
+
+@dataclass
+class PromptStats:
+    tokens: int = 0
+    chars: int = 0
+    sections: List[str] = field(default_factory=list)
+    products_matched: int = 0
+    build_ms: float = 0.0
+
+
+def _product_lines(products: List[ProductEntry]) -> List[str]:
+    lines = []
+    for product in products:
+        details = f"stock {product.current_stock or 0} (minimum {product.minimum_stock or 0}), price {_money(product.unit_price)}"
+        category = f", {product.category}" if product.category else ""
+        lines.append(f"- {product.name} (SKU {product.sku}{category}): {details}")
+    return lines
+
+
+def build_system_prompt(context: dict, question: str, index: Optional[ProductIndex] = None,
+                        budget: Optional[int] = None) -> Tuple[str, PromptStats]:
+    """The system prompt for ``question``, at most ``budget`` tokens plus the fixed text"""
+    started = time.perf_counter()
+    budget = settings.CHAT_PROMPT_TOKEN_BUDGET if budget is None else budget
+    stats = PromptStats()
+    parts: List[str] = []
+    used = 0
+
+    def add(lines: List[str], reserve: int = 0) -> bool:
+        nonlocal used
+        text = "\n".join(lines) + "\n"
+        cost = estimate_tokens(text)
+        if used + cost + reserve > budget:
+            return False
+        parts.append(text)
+        used += cost
+        return True
+
+    if "store" in context:
+        add([f"Store: {context['store']['name']}"])
+
+    # Products the question names come first, as many as fit next to the one-line summaries
+    matched = index.search(question, settings.CHAT_PROMPT_MAX_PRODUCTS) if index is not None else []
+    if matched:
+        reserve = sum(estimate_tokens("\n".join(render(context, False)) + "\n") for _, _, render in SECTIONS)
+        lines = _product_lines(matched)
+        while lines and not add(["## Products Mentioned"] + lines, reserve):
+            lines.pop()
+        if lines:
+            stats.products_matched = len(lines)
+            stats.sections.append("products")
+
+    question_terms = set(terms(question))
+    hits = {name: len(question_terms & keywords) for name, keywords, _ in SECTIONS}
+    # A question about nothing in particular gets every section in full
+    asked = {name for name, count in hits.items() if count} or {name for name, _, _ in SECTIONS}
+    ranked = sorted(SECTIONS, key=lambda section: -hits[section[0]])
+    for name, _, render in ranked:
+        if (name in asked and add(render(context, True))) or add(render(context, False)):
+            stats.sections.append(name)
+
+    prompt = HEADER + "\n" + "\n".join(parts) + INSTRUCTIONS
+    stats.chars = len(prompt)
+    stats.tokens = estimate_tokens(prompt)
+    stats.build_ms = (time.perf_counter() - started) * 1000
+    return prompt, stats
+
+
+def trim_history(history: List[dict], budget: Optional[int] = None) -> List[dict]:
+    """The most recent messages that fit in ``budget`` tokens"""
+    budget = settings.CHAT_HISTORY_TOKEN_BUDGET if budget is None else budget
+    kept, used = [], 0
+    for message in reversed(history):
+        cost = estimate_tokens(str(message.get("content", "")))
+        if used + cost > budget:
+            break
+        kept.append(message)
+        used += cost
+    return kept[::-1]
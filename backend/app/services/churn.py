@@ -0,0 +1,242 @@
+"""
+Customer churn scoring.
+
+Features come from one query: window functions rank every customer's sales
+newest-first and oldest-first, and a grouped pass over that yields days since
+the last purchase, order count and the average of the three most recent and
+three earliest orders. Scoring is vectorized over all customers at once:
+
+- recency (30): 30 after 180 days, 20 after 90, 10 after 60
+- frequency (30): 30 for a single order, 15 for two
+- declining spend (40, three or more orders): 40 when the recent average is
+  under 70% of the early one, 20 when it is lower at all
+
+50 and up is medium risk, 70 and up high. precompute_churn_scores() stores
+the scores of every customer in ``customer_churn_scores``; run it nightly
+with precompute_churn_scores.py so the endpoint only reads that table.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import String, case, func, insert, type_coerce
+from sqlalchemy.orm import Session
+from app.db import models
+
+MEDIUM_RISK = 50
+HIGH_RISK = 70
+
+RISK_LEVELS = np.array(["low", "medium", "high"])
+
+RECOMMENDED_ACTIONS = {
+    "high": "Send personalized offer",
+    "medium": "Send re-engagement email",
+}
+
+# Orders averaged at each end of a customer's history
+ORDER_WINDOW = 3
+
+
+class ChurnScores:
+    """Per-customer features and scores, aligned by position"""
+
+    def __init__(self, customer_ids, store_ids, recency, frequency, recent_avg, early_avg, score):
+        self.customer_ids = customer_ids
+        self.store_ids = store_ids
+        self.recency = recency
+        self.frequency = frequency
+        self.recent_avg = recent_avg
+        self.early_avg = early_avg
+        self.score = score
+
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+    @property
+    def risk_level(self) -> np.ndarray:
+        return RISK_LEVELS[(self.score >= MEDIUM_RISK).astype(int) + (self.score >= HIGH_RISK)]
+
+
+def load_churn_features(db: Session, store_ids: Optional[List[int]] = None, now: Optional[datetime] = None):
+    Sale = models.Sale
+    ranked = db.query(
+        Sale.customer_id.label("customer_id"),
+        Sale.sale_date.label("sale_date"),
+        Sale.total_amount.label("total_amount"),
+        func.row_number().over(
+            partition_by=Sale.customer_id, order_by=(Sale.sale_date.desc(), Sale.id.desc())
+        ).label("recent_rank"),
+        func.row_number().over(
+            partition_by=Sale.customer_id, order_by=(Sale.sale_date, Sale.id)
+        ).label("early_rank")
+    ).filter(Sale.customer_id.isnot(None)).subquery()
+
+    query = db.query(
+        ranked.c.customer_id,
+        models.Customer.store_id,
+        # Parsed by NumPy in one go, see app/services/rfm.py
+        type_coerce(func.max(ranked.c.sale_date), String),
+        func.count(),
+        func.avg(case((ranked.c.recent_rank <= ORDER_WINDOW, ranked.c.total_amount))),
+        func.avg(case((ranked.c.early_rank <= ORDER_WINDOW, ranked.c.total_amount)))
+    ).join(models.Customer, models.Customer.id == ranked.c.customer_id)
+
+    if store_ids is not None:
+        query = query.filter(models.Customer.store_id.in_(store_ids))
+
+    rows = query.group_by(ranked.c.customer_id, models.Customer.store_id).all()
+    if not rows:
+        return None
+
+    customer_ids, customer_stores, last_purchase, frequency, recent_avg, early_avg = zip(*rows)
+    last_purchase = np.array(last_purchase, dtype="datetime64[us]")
+    recency = (np.datetime64(now or datetime.now(), "us") - last_purchase) // np.timedelta64(1, "D")
+
+    return (
+        np.array(customer_ids, dtype=np.int64),
+        np.array(customer_stores, dtype=object),
+        recency.astype(np.int64),
+        np.array(frequency, dtype=np.int64),
+        np.array(recent_avg, dtype=np.float64),
+        np.array(early_avg, dtype=np.float64),
+    )
+
+
+def score_churn(recency: np.ndarray, frequency: np.ndarray, recent_avg: np.ndarray, early_avg: np.ndarray) -> np.ndarray:
+    recency_points = np.select([recency > 180, recency > 90, recency > 60], [30, 20, 10], 0)
+    frequency_points = np.select([frequency == 1, frequency == 2], [30, 15], 0)
+    enough_orders = frequency >= ORDER_WINDOW
+    decline_points = np.select(
+        [enough_orders & (recent_avg < early_avg * 0.7), enough_orders & (recent_avg < early_avg)],
+        [40, 20],
+        0
+    )
+    return (recency_points + frequency_points + decline_points).astype(np.int64)
+
+
+def compute_churn_scores(
+    db: Session,
+    store_ids: Optional[List[int]] = None,
+    now: Optional[datetime] = None
+) -> Optional[ChurnScores]:
+    features = load_churn_features(db, store_ids, now)
+    if features is None:
+        return None
+    customer_ids, customer_stores, recency, frequency, recent_avg, early_avg = features
+    return ChurnScores(
+        customer_ids, customer_stores, recency, frequency, recent_avg, early_avg,
+        score_churn(recency, frequency, recent_avg, early_avg)
+    )
+
+
+def precompute_churn_scores(db: Session, batch_size: int = 10000) -> int:
+    """Replace customer_churn_scores with fresh scores for every customer"""
+    scored_at = datetime.now()
+    scores = compute_churn_scores(db, now=scored_at)
+
+    db.query(models.CustomerChurnScore).delete(synchronize_session=False)
+    if scores is not None:
+        risk_levels = scores.risk_level
+        table = models.CustomerChurnScore.__table__
+        for start in range(0, len(scores), batch_size):
+            stop = min(start + batch_size, len(scores))
+            db.execute(insert(table), [
+                {
+                    "customer_id": int(scores.customer_ids[i]),
+                    "store_id": scores.store_ids[i],
+                    "churn_score": int(scores.score[i]),
+                    "risk_level": str(risk_levels[i]),
+                    "days_since_purchase": int(scores.recency[i]),
+                    "purchase_count": int(scores.frequency[i]),
+                    "recent_avg_order": float(scores.recent_avg[i]),
+                    "early_avg_order": float(scores.early_avg[i]),
+                    "scored_at": scored_at
+                }
+                for i in range(start, stop)
+            ])
+    db.commit()
+    return 0 if scores is None else len(scores)
+
+
+def _customer_entry(customer_id, name, phone, lifetime_value, score, days_since_purchase) -> Dict:
+    risk_level = "high" if score >= HIGH_RISK else "medium"
+    return {
+        "customer_id": customer_id,
+        "customer_name": name,
+        "phone": phone,
+        "churn_score": score,
+        "risk_level": risk_level,
+        "days_since_purchase": days_since_purchase,
+        "lifetime_value": round(lifetime_value or 0, 2),
+        "recommended_action": RECOMMENDED_ACTIONS[risk_level]
+    }
+
+
+def live_churn_report(db: Session, store_ids: Optional[List[int]], limit: int) -> Dict:
+    """Score the customers in scope now"""
+    scores = compute_churn_scores(db, store_ids)
+    if scores is None:
+        return {"total_at_risk": 0, "high_risk_count": 0, "customers": []}
+
+    at_risk = np.flatnonzero(scores.score >= MEDIUM_RISK)
+    # Highest score first, ties by customer id
+    order = np.lexsort((scores.customer_ids[at_risk], -scores.score[at_risk]))
+    top = at_risk[order[:limit]]
+
+    top_ids = [int(customer_id) for customer_id in scores.customer_ids[top]]
+    customers = {
+        row.id: row for row in db.query(
+            models.Customer.id, models.Customer.name, models.Customer.phone, models.Customer.total_purchases
+        ).filter(models.Customer.id.in_(top_ids)).all()
+    } if top_ids else {}
+
+    return {
+        "total_at_risk": int(at_risk.size),
+        "high_risk_count": int(np.count_nonzero(scores.score >= HIGH_RISK)),
+        "customers": [
+            _customer_entry(
+                customer_id,
+                customers[customer_id].name,
+                customers[customer_id].phone,
+                customers[customer_id].total_purchases,
+                int(scores.score[position]),
+                int(scores.recency[position])
+            )
+            for position, customer_id in zip(top, top_ids)
+        ]
+    }
+
+
+def precomputed_churn_report(db: Session, store_ids: Optional[List[int]], limit: int) -> Optional[Dict]:
+    """Read the nightly scores; None when they haven't been computed for this scope"""
+    Score = models.CustomerChurnScore
+
+    def scoped(query):
+        if store_ids is not None:
+            query = query.filter(Score.store_id.in_(store_ids))
+        return query
+
+    total_at_risk, high_risk_count, scored_at = scoped(db.query(
+        func.count(case((Score.churn_score >= MEDIUM_RISK, 1))),
+        func.count(case((Score.churn_score >= HIGH_RISK, 1))),
+        func.max(Score.scored_at)
+    )).one()
+    if scored_at is None:
+        return None
+
+    rows = scoped(db.query(
+        Score.customer_id,
+        models.Customer.name,
+        models.Customer.phone,
+        models.Customer.total_purchases,
+        Score.churn_score,
+        Score.days_since_purchase
+    ).join(models.Customer, models.Customer.id == Score.customer_id)).filter(
+        Score.churn_score >= MEDIUM_RISK
+    ).order_by(Score.churn_score.desc(), Score.customer_id).limit(limit).all()
+
+    return {
+        "total_at_risk": total_at_risk,
+        "high_risk_count": high_risk_count,
+        "scored_at": scored_at,
+        "customers": [_customer_entry(*row) for row in rows]
+    }
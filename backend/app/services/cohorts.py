@@ -0,0 +1,140 @@
+"""
+Cohort retention matrix.
+
+A cohort is the customers whose first purchase fell in a calendar month; cell
+(cohort, k) is the share of them who bought again k calendar months later.
+One query returns the distinct (customer, month) pairs of customers first
+seen inside the window and NumPy turns them into the whole matrix.
+
+Results are cached per (store scope, window, horizon, current month) and
+reused until the sales watermark - highest sale id and sale count - moves,
+i.e. until a sale is added or removed.
+"""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import extract, func
+from sqlalchemy.orm import Session
+from app.db import models
+
+# Cached matrices kept, least recently used dropped first
+CACHE_SIZE = 64
+
+_cache: "OrderedDict[tuple, Tuple[tuple, List[Dict]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _month_index(column):
+    """Months since year 0, so consecutive calendar months differ by one"""
+    return extract("year", column) * 12 + extract("month", column) - 1
+
+
+def _month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _scoped(query, store_ids: Optional[List[int]]):
+    if store_ids is not None:
+        query = query.filter(models.Sale.store_id.in_(store_ids))
+    return query
+
+
+def sales_watermark(db: Session) -> tuple:
+    return tuple(db.query(func.max(models.Sale.id), func.count(models.Sale.id)).one())
+
+
+def build_cohort_matrix(
+    db: Session,
+    store_ids: Optional[List[int]],
+    months: int,
+    horizon: int,
+    now: Optional[datetime] = None
+) -> List[Dict]:
+    now = now or datetime.now()
+    current_month = now.year * 12 + now.month - 1
+    first_cohort = current_month - months + 1
+    window_start = datetime(first_cohort // 12, first_cohort % 12 + 1, 1)
+
+    new_customers = _scoped(
+        db.query(models.Sale.customer_id).filter(models.Sale.customer_id.isnot(None)),
+        store_ids
+    ).group_by(models.Sale.customer_id).having(
+        func.min(models.Sale.sale_date) >= window_start
+    )
+
+    month = _month_index(models.Sale.sale_date)
+    pairs = _scoped(
+        db.query(models.Sale.customer_id, month).filter(
+            models.Sale.customer_id.in_(new_customers.subquery().select())
+        ),
+        store_ids
+    ).group_by(models.Sale.customer_id, month).order_by(models.Sale.customer_id, month).all()
+
+    if not pairs:
+        return []
+
+    customers, purchase_months = (np.array(column, dtype=np.int64) for column in zip(*pairs))
+    # Pairs are sorted by customer then month, so a customer's first row is its cohort
+    _, first_rows, inverse = np.unique(customers, return_index=True, return_inverse=True)
+    first_months = purchase_months[first_rows]
+    offsets = purchase_months - first_months[inverse]
+
+    cohort_index = first_months - first_cohort
+    sizes = np.bincount(cohort_index, minlength=months)
+
+    in_horizon = offsets < horizon
+    active = np.bincount(
+        cohort_index[inverse[in_horizon]] * horizon + offsets[in_horizon],
+        minlength=months * horizon
+    ).reshape(months, horizon)
+
+    cohort_data = []
+    for cohort in range(months):
+        size = int(sizes[cohort])
+        if size == 0:
+            continue
+        # Offsets that haven't happened yet have no retention to report
+        elapsed = min(horizon, months - cohort)
+        cohort_data.append({
+            "cohort": _month_label(first_cohort + cohort),
+            "size": size,
+            "retention": {
+                f"month_{k}": round(active[cohort, k] / size * 100, 2) if k < elapsed else None
+                for k in range(horizon)
+            }
+        })
+    return cohort_data
+
+
+def cohort_matrix(
+    db: Session,
+    store_ids: Optional[List[int]],
+    months: int,
+    horizon: int
+) -> List[Dict]:
+    """Cached build_cohort_matrix, rebuilt once new sales arrive"""
+    now = datetime.now()
+    key = (
+        tuple(sorted(store_ids)) if store_ids is not None else None,
+        months,
+        horizon,
+        now.year * 12 + now.month - 1
+    )
+    watermark = sales_watermark(db)
+
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == watermark:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    cohort_data = build_cohort_matrix(db, store_ids, months, horizon, now)
+
+    with _cache_lock:
+        _cache[key] = (watermark, cohort_data)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return cohort_data
@@ -0,0 +1,279 @@
+"""
+Product co-occurrence index.
+
+``product_basket_counts`` holds how many sales contain each product and
+``product_cooccurrence`` how many contain both products of a pair, stored in
+both directions so a product's partners are one index range. The sale
+pipelines call apply_baskets inside their transaction, so the index is always
+current; rebuild_product_cooccurrence recomputes it from sale_items.
+
+For products A and B with n_A, n_B and n_AB baskets out of N:
+
+- support = n_AB / N
+- confidence(A -> B) = n_AB / n_A
+- lift = n_AB * N / (n_A * n_B), above 1 when they sell together more than chance
+
+N is the number of sales of the products' store, from daily_sales_rollup.
+"""
+from collections import Counter
+from itertools import permutations
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from app.db import models
+
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _increment_rows(db: Session, model, keys: List[str], rows: List[dict]) -> None:
+    """Add each row's basket_count to the stored count, creating missing rows"""
+    if not rows:
+        return
+    table = model.__table__
+    upsert = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if upsert is not None:
+        statement = upsert(table)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=keys,
+                set_={"basket_count": table.c.basket_count + statement.excluded.basket_count}
+            ),
+            rows
+        )
+        return
+
+    # Other databases: update, then insert what wasn't there (see rollups.apply_sales)
+    for row in rows:
+        condition = and_(*(table.c[key] == row[key] for key in keys))
+        increment = update(table).where(condition).values(basket_count=table.c.basket_count + row["basket_count"])
+        if db.execute(increment).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(table).values(**row))
+        except IntegrityError:
+            db.execute(increment)
+
+
+def apply_baskets(db: Session, baskets: Iterable[Iterable[int]]) -> None:
+    """Add sales to the index inside the caller's transaction.
+
+    ``baskets`` holds the product ids of each new sale; a product listed
+    twice in one sale counts once.
+    """
+    products = Counter()
+    pairs = Counter()
+    for basket in baskets:
+        basket = set(basket)
+        products.update(basket)
+        pairs.update(permutations(basket, 2))
+
+    # Rows in key order, so concurrent sales lock them in the same order
+    _increment_rows(db, models.ProductBasketCount, ["product_id"], [
+        {"product_id": product_id, "basket_count": count}
+        for product_id, count in sorted(products.items())
+    ])
+    _increment_rows(db, models.ProductCooccurrence, ["product_id", "other_product_id"], [
+        {"product_id": product_id, "other_product_id": other_product_id, "basket_count": count}
+        for (product_id, other_product_id), count in sorted(pairs.items())
+    ])
+
+
+def rebuild_product_cooccurrence(db: Session) -> int:
+    """Recompute the whole index from sale_items and commit, returns the pair rows written"""
+    item = models.SaleItem
+    other = aliased(models.SaleItem)
+
+    try:
+        db.query(models.ProductCooccurrence).delete(synchronize_session=False)
+        db.query(models.ProductBasketCount).delete(synchronize_session=False)
+
+        db.execute(insert(models.ProductBasketCount.__table__).from_select(
+            ["product_id", "basket_count"],
+            select(item.product_id, func.count(func.distinct(item.sale_id))).group_by(item.product_id)
+        ))
+        pairs = db.execute(insert(models.ProductCooccurrence.__table__).from_select(
+            ["product_id", "other_product_id", "basket_count"],
+            select(item.product_id, other.product_id, func.count(func.distinct(item.sale_id)))
+            .join(other, and_(other.sale_id == item.sale_id, other.product_id != item.product_id))
+            .group_by(item.product_id, other.product_id)
+        )).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return pairs
+
+
+def ensure_product_cooccurrence(db: Session) -> None:
+    """Backfill an empty index when sales already exist (e.g. after upgrading)"""
+    if db.query(models.ProductBasketCount.product_id).first() is None and db.query(models.SaleItem.id).first() is not None:
+        rebuild_product_cooccurrence(db)
+
+
+def store_baskets(db: Session, store_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """Number of sales per store, the N of support and lift"""
+    rollup = models.DailySalesRollup
+    query = db.query(rollup.store_id, func.sum(rollup.transaction_count))
+    if store_ids is not None:
+        query = query.filter(rollup.store_id.in_(list(store_ids)))
+    return {store_id: count or 0 for store_id, count in query.group_by(rollup.store_id)}
+
+
+def pair_metrics(pair_count: int, count: int, other_count: int, baskets: int) -> Dict:
+    return {
+        "co_occurrence_count": pair_count,
+        "support": round(pair_count / baskets, 4) if baskets else 0,
+        "confidence": round(pair_count / count, 4) if count else 0,
+        "lift": round(pair_count * baskets / (count * other_count), 2) if baskets and count and other_count else 0
+    }
+
+
+def product_partners(db: Session, product: models.Product, limit: int) -> List[Dict]:
+    """Top ``limit`` products sold with ``product``, one index range read"""
+    pair = models.ProductCooccurrence
+    other_count = aliased(models.ProductBasketCount)
+    count = db.query(models.ProductBasketCount.basket_count).filter(
+        models.ProductBasketCount.product_id == product.id
+    ).scalar() or 0
+    baskets = store_baskets(db, [product.store_id]).get(product.store_id, 0)
+
+    rows = db.query(
+        pair.other_product_id,
+        models.Product.name,
+        pair.basket_count,
+        other_count.basket_count
+    ).join(
+        models.Product, models.Product.id == pair.other_product_id
+    ).join(
+        other_count, other_count.product_id == pair.other_product_id
+    ).filter(
+        pair.product_id == product.id
+    ).order_by(pair.basket_count.desc(), pair.other_product_id).limit(limit).all()
+
+    return [
+        {
+            "product_id": other_product_id,
+            "product_name": name,
+            **pair_metrics(pair_count, count, other_product_count, baskets)
+        }
+        for other_product_id, name, pair_count, other_product_count in rows
+    ]
+
+
+def top_pairs(db: Session, store_ids: Optional[List[int]], limit: int) -> List[Dict]:
+    """Most frequent product pairs overall, each pair once"""
+    pair = models.ProductCooccurrence
+    product = aliased(models.Product)
+    other = aliased(models.Product)
+    count = aliased(models.ProductBasketCount)
+    other_count = aliased(models.ProductBasketCount)
+
+    query = db.query(
+        product.id, product.name, product.store_id,
+        other.id, other.name,
+        pair.basket_count, count.basket_count, other_count.basket_count
+    ).join(
+        product, product.id == pair.product_id
+    ).join(
+        other, other.id == pair.other_product_id
+    ).join(
+        count, count.product_id == pair.product_id
+    ).join(
+        other_count, other_count.product_id == pair.other_product_id
+    ).filter(pair.product_id < pair.other_product_id)
+
+    if store_ids is not None:
+        query = query.filter(product.store_id.in_(store_ids))
+
+    rows = query.order_by(pair.basket_count.desc(), pair.product_id, pair.other_product_id).limit(limit).all()
+    baskets = store_baskets(db, {row[2] for row in rows}) if rows else {}
+
+    results = []
+    for product_id, name, store_id, other_id, other_name, pair_count, product_count, other_product_count in rows:
+        metrics = pair_metrics(pair_count, product_count, other_product_count, baskets.get(store_id, 0))
+        results.append({
+            "product_a": {"product_id": product_id, "product_name": name},
+            "product_b": {"product_id": other_id, "product_name": other_name},
+            "co_occurrence_count": pair_count,
+            "support": metrics["support"],
+            "confidence_a_to_b": metrics["confidence"],
+            "confidence_b_to_a": round(pair_count / other_product_count, 4) if other_product_count else 0,
+            "lift": metrics["lift"]
+        })
+    return results
+
+
+def _purchased_products(customer_id: int):
+    return select(models.SaleItem.product_id).join(
+        models.Sale, models.Sale.id == models.SaleItem.sale_id
+    ).where(models.Sale.customer_id == customer_id).distinct()
+
+
+def recommend_for_customer(db: Session, customer_id: int, limit: int) -> List[Dict]:
+    """Products most often bought with what the customer already bought.
+
+    Takes the top ``limit`` partners of each purchased product and ranks the
+    ones the customer doesn't have by their best confidence.
+    """
+    pair = models.ProductCooccurrence
+    purchased = _purchased_products(customer_id)
+
+    ranked = select(
+        pair.product_id,
+        pair.other_product_id,
+        pair.basket_count,
+        func.row_number().over(
+            partition_by=pair.product_id,
+            order_by=(pair.basket_count.desc(), pair.other_product_id)
+        ).label("rank")
+    ).where(pair.product_id.in_(purchased)).subquery()
+
+    confidence = func.max(ranked.c.basket_count * 1.0 / models.ProductBasketCount.basket_count)
+    rows = db.query(
+        models.Product.id,
+        models.Product.name,
+        confidence
+    ).join(
+        ranked, ranked.c.other_product_id == models.Product.id
+    ).join(
+        models.ProductBasketCount, models.ProductBasketCount.product_id == ranked.c.product_id
+    ).filter(
+        ranked.c.rank <= limit,
+        models.Product.id.notin_(purchased)
+    ).group_by(
+        models.Product.id, models.Product.name
+    ).order_by(confidence.desc(), func.sum(ranked.c.basket_count).desc(), models.Product.id).limit(limit).all()
+
+    return [
+        {
+            "product_id": product_id,
+            "product_name": name,
+            "confidence_score": round(min(0.9, score), 2),
+            "reason": "Customers like you also bought this"
+        }
+        for product_id, name, score in rows
+    ]
+
+
+def popular_products(db: Session, limit: int, customer_id: Optional[int] = None) -> List[Dict]:
+    """Products in the most baskets, skipping what the customer already bought"""
+    query = db.query(models.Product.id, models.Product.name).join(
+        models.ProductBasketCount, models.ProductBasketCount.product_id == models.Product.id
+    )
+    if customer_id is not None:
+        query = query.filter(models.Product.id.notin_(_purchased_products(customer_id)))
+
+    rows = query.order_by(models.ProductBasketCount.basket_count.desc(), models.Product.id).limit(limit).all()
+    return [
+        {
+            "product_id": product_id,
+            "product_name": name,
+            "confidence_score": 0.7,
+            "reason": "Popular product - trending now"
+        }
+        for product_id, name in rows
+    ]
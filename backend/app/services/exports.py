@@ -0,0 +1,168 @@
+"""
+Streaming report exports.
+
+Report routes describe their output as ExportSheets - a title, the header row
+and an iterable of row tuples - and hand them to export_response. Rows are
+pulled lazily, usually from stream_query, so nothing holds the whole report:
+
+* CSV is generated and sent while the rows are still being read.
+* XLSX goes through openpyxl's write-only workbook (rows are serialised as
+  they are appended) into a SpooledTemporaryFile that spills to disk past
+  SPOOL_MAX_SIZE, then is streamed back in chunks.
+
+write_export writes the same output to any binary file object, so background
+jobs can reuse the sheet builders.
+"""
+import csv
+import io
+from datetime import date, datetime
+from enum import Enum
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Sequence
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from sqlalchemy.orm import Query
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+EXPORT_FORMATS = {"xlsx": XLSX_MEDIA_TYPE, "csv": CSV_MEDIA_TYPE}
+
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+CSV_FLUSH_ROWS = 500
+
+# Excel limits sheet titles to 31 characters and rejects a few symbols
+_INVALID_TITLE_CHARS = str.maketrans({char: " " for char in "[]:*?/\\"})
+
+
+class ExportSheet:
+    """One sheet of an export: a title, the header row and lazily read rows.
+
+    ``count`` optionally returns the number of rows up front (usually the
+    query's count method); background jobs call it to report progress.
+    """
+
+    def __init__(self, title: str, headers: Sequence[str], rows: Iterable[Sequence],
+                 count: Optional[Callable[[], int]] = None):
+        self.title = title
+        self.headers = list(headers)
+        self.rows = rows
+        self.count = count
+
+
+def stream_query(query: Query, batch_size: int = YIELD_PER) -> Iterator:
+    """Iterate a query through a server-side cursor, batch_size rows at a time"""
+    return iter(query.yield_per(batch_size))
+
+
+def dict_rows(records: Iterable[dict], keys: Sequence[str]) -> Iterator[tuple]:
+    """Rows from the list-of-dicts payloads the JSON report endpoints return"""
+    for record in records:
+        yield tuple(record.get(key, "") for key in keys)
+
+
+def check_format(export_format: str) -> str:
+    export_format = (export_format or "xlsx").lower()
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format '{export_format}', use one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    return export_format
+
+
+def _cell(value):
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _csv_cell(value):
+    value = _cell(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def write_xlsx(sheets: List[ExportSheet], fileobj: BinaryIO) -> None:
+    workbook = Workbook(write_only=True)
+    for sheet in sheets:
+        worksheet = workbook.create_sheet(title=sheet.title.translate(_INVALID_TITLE_CHARS)[:31])
+        worksheet.append(sheet.headers)
+        for row in sheet.rows:
+            worksheet.append([_cell(value) for value in row])
+    if not sheets:
+        workbook.create_sheet(title="Report")
+    workbook.save(fileobj)
+
+
+def iter_csv(sheets: List[ExportSheet]) -> Iterator[bytes]:
+    """Encode sheets as CSV, yielding every CSV_FLUSH_ROWS rows.
+
+    Multi-sheet reports are written one block after another, each block
+    preceded by its sheet title and separated by an empty line.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the file as UTF-8 (rupee signs, names)
+    buffer.write("\ufeff")
+
+    for index, sheet in enumerate(sheets):
+        if len(sheets) > 1:
+            if index:
+                writer.writerow([])
+            writer.writerow([sheet.title])
+        writer.writerow(sheet.headers)
+        for count, row in enumerate(sheet.rows, start=1):
+            writer.writerow([_csv_cell(value) for value in row])
+            if count % CSV_FLUSH_ROWS == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+
+    yield buffer.getvalue().encode("utf-8")
+
+
+def write_export(sheets: List[ExportSheet], fileobj: BinaryIO, export_format: str = "xlsx") -> None:
+    """Write the export to a binary file object"""
+    if check_format(export_format) == "csv":
+        for chunk in iter_csv(sheets):
+            fileobj.write(chunk)
+    else:
+        write_xlsx(sheets, fileobj)
+
+
+def iter_file(fileobj: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Read a file in chunks and close it once exhausted"""
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def export_response(sheets: List[ExportSheet], filename: str, export_format: str = "xlsx") -> StreamingResponse:
+    """Stream the sheets as ``filename``.xlsx or ``filename``.csv"""
+    export_format = check_format(export_format)
+    headers = {"Content-Disposition": f"attachment; filename={filename}.{export_format}"}
+
+    if export_format == "csv":
+        body = iter_csv(sheets)
+    else:
+        # The xlsx zip can only be finished once every row is in, build it
+        # in a spooled file before sending
+        spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            write_xlsx(sheets, spool)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        body = iter_file(spool)
+
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[export_format], headers=headers)
@@ -0,0 +1,346 @@
+"""
+Sales forecasting.
+
+Every series - daily sales of a store, daily units of a product - is fitted
+with two additive weekly-seasonal models, both vectorized across all series
+of a batch:
+
+- seasonal_trend: least squares on a linear trend plus one level per weekday
+- holt_winters: additive Holt-Winters with a 7-day season, smoothing
+  parameters picked per series from HW_GRID by one-step-ahead error
+
+Each series keeps the model with the lower error on the last HOLDOUT_DAYS
+days. A fit is stored as its state on the origin day (the last day of
+history): level, daily trend, seven weekday offsets and the residual standard
+deviation, so a forecast for day d is
+
+    level + trend * (d - origin) + seasonal[d.weekday()] +/- 1.96 * residual_std
+
+fit_forecast_models() refits every store and product and replaces the rows
+of ``forecast_models``; run it nightly with fit_forecast_models.py.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import String, func, insert, type_coerce
+from sqlalchemy.orm import Session
+from app.db import models
+
+HISTORY_DAYS = 180
+HOLDOUT_DAYS = 14
+# Series with fewer days of sales in the history are not forecast
+MIN_ACTIVE_DAYS = 7
+
+SEASONAL_TREND = "seasonal_trend"
+HOLT_WINTERS = "holt_winters"
+METHODS = (SEASONAL_TREND, HOLT_WINTERS)
+
+# (alpha, beta, gamma) tried for every series
+HW_GRID = [
+    (alpha, beta, gamma)
+    for alpha in (0.1, 0.3, 0.5)
+    for beta in (0.0, 0.05)
+    for gamma in (0.1, 0.3)
+]
+
+Z_95 = 1.96
+
+
+class ForecastFit:
+    """Fitted state of n series on ``origin``, one entry (column) per series"""
+
+    def __init__(self, origin: date, method, level, trend, seasonal, residual_std, holdout_mae=None):
+        self.origin = origin
+        self.method = method  # (n,) method names
+        self.level = level  # (n,)
+        self.trend = trend  # (n,) per day
+        self.seasonal = seasonal  # (7, n), row 0 is Monday
+        self.residual_std = residual_std  # (n,)
+        self.holdout_mae = holdout_mae  # (n,) or None
+
+    def __len__(self) -> int:
+        return len(self.level)
+
+    def predict(self, dates: Sequence[date]) -> np.ndarray:
+        """(len(dates), n) point forecasts, never below zero"""
+        steps = np.array([(day - self.origin).days for day in dates], dtype=np.float64)
+        weekdays = np.array([day.weekday() for day in dates], dtype=np.int64)
+        values = self.level[None, :] + steps[:, None] * self.trend[None, :] + self.seasonal[weekdays, :]
+        return np.maximum(values, 0)
+
+
+def _weekdays(start: date, n_days: int) -> np.ndarray:
+    return (start.weekday() + np.arange(n_days)) % 7
+
+
+def fit_seasonal_trend(Y: np.ndarray, start: date) -> ForecastFit:
+    """Least squares on [day, weekday one-hot] for all columns of Y at once"""
+    n_days = Y.shape[0]
+    weekdays = _weekdays(start, n_days)
+    X = np.zeros((n_days, 8))
+    X[:, 0] = np.arange(n_days)
+    X[np.arange(n_days), 1 + weekdays] = 1.0
+
+    coefficients, _, _, _ = np.linalg.lstsq(X, Y, rcond=None)
+    residuals = Y - X @ coefficients
+    residual_std = np.sqrt((residuals ** 2).sum(axis=0) / max(n_days - X.shape[1], 1))
+
+    trend = coefficients[0]
+    weekday_levels = coefficients[1:]
+    mean_level = weekday_levels.mean(axis=0)
+    return ForecastFit(
+        origin=start + timedelta(days=n_days - 1),
+        method=np.full(Y.shape[1], SEASONAL_TREND, dtype=object),
+        level=mean_level + trend * (n_days - 1),
+        trend=trend,
+        seasonal=weekday_levels - mean_level,
+        residual_std=residual_std
+    )
+
+
+def fit_holt_winters(Y: np.ndarray, start: date) -> ForecastFit:
+    """Additive Holt-Winters over all columns of Y, best HW_GRID entry per column"""
+    n_days, n_series = Y.shape
+    weekdays = _weekdays(start, n_days)
+
+    best_sse = np.full(n_series, np.inf)
+    best_level = np.zeros(n_series)
+    best_trend = np.zeros(n_series)
+    best_seasonal = np.zeros((7, n_series))
+
+    for alpha, beta, gamma in HW_GRID:
+        # First week sets the level and season, the second the trend
+        level = Y[:7].mean(axis=0)
+        trend = (Y[7:14].mean(axis=0) - level) / 7
+        seasonal = np.zeros((7, n_series))
+        seasonal[weekdays[:7]] = Y[:7] - level
+        sse = np.zeros(n_series)
+
+        for t in range(7, n_days):
+            weekday = weekdays[t]
+            error = Y[t] - (level + trend + seasonal[weekday])
+            sse += error ** 2
+            new_level = alpha * (Y[t] - seasonal[weekday]) + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            seasonal[weekday] = gamma * (Y[t] - new_level) + (1 - gamma) * seasonal[weekday]
+            level = new_level
+
+        better = sse < best_sse
+        best_sse = np.where(better, sse, best_sse)
+        best_level = np.where(better, level, best_level)
+        best_trend = np.where(better, trend, best_trend)
+        best_seasonal = np.where(better[None, :], seasonal, best_seasonal)
+
+    # Offsets around zero, their mean belongs to the level
+    offset = best_seasonal.mean(axis=0)
+    return ForecastFit(
+        origin=start + timedelta(days=n_days - 1),
+        method=np.full(n_series, HOLT_WINTERS, dtype=object),
+        level=best_level + offset,
+        trend=best_trend,
+        seasonal=best_seasonal - offset,
+        residual_std=np.sqrt(best_sse / max(n_days - 7, 1))
+    )
+
+
+FITTERS = {SEASONAL_TREND: fit_seasonal_trend, HOLT_WINTERS: fit_holt_winters}
+
+
+def fit_series(Y: np.ndarray, start: date, holdout_days: int = HOLDOUT_DAYS) -> ForecastFit:
+    """Fit every method, keep per series the one with the lowest holdout MAE.
+
+    ``Y`` is (days, series) starting on ``start``; it needs at least two weeks
+    of history before the holdout.
+    """
+    n_days = Y.shape[0]
+    holdout_dates = [start + timedelta(days=n_days - holdout_days + i) for i in range(holdout_days)]
+    actual = Y[n_days - holdout_days:]
+
+    holdout_mae = np.stack([
+        np.abs(FITTERS[method](Y[:n_days - holdout_days], start).predict(holdout_dates) - actual).mean(axis=0)
+        for method in METHODS
+    ])
+    choice = holdout_mae.argmin(axis=0)
+    columns = np.arange(Y.shape[1])
+
+    fits = [FITTERS[method](Y, start) for method in METHODS]
+    return ForecastFit(
+        origin=fits[0].origin,
+        method=np.array(METHODS, dtype=object)[choice],
+        level=np.stack([fit.level for fit in fits])[choice, columns],
+        trend=np.stack([fit.trend for fit in fits])[choice, columns],
+        seasonal=np.stack([fit.seasonal for fit in fits])[choice, :, columns].T,
+        residual_std=np.stack([fit.residual_std for fit in fits])[choice, columns],
+        holdout_mae=holdout_mae[choice, columns]
+    )
+
+
+def history_window(history_days: int = HISTORY_DAYS, today: Optional[date] = None) -> Tuple[date, date]:
+    """[start, end) of the complete days a fit uses; today is still being sold"""
+    end = today or date.today()
+    return end - timedelta(days=history_days), end
+
+
+def _dense(keys, days, values, start: date, n_days: int):
+    """(n_days, n_series) matrix from (series key, day, value) rows, missing days are 0"""
+    if not keys:
+        return [], np.zeros((n_days, 0))
+    series, columns = np.unique(np.array(keys), axis=0, return_inverse=True)
+    day_index = (np.array(days, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64)
+    Y = np.zeros((n_days, len(series)))
+    np.add.at(Y, (day_index, columns.ravel()), np.array(values, dtype=np.float64))
+    return [tuple(int(part) for part in key) for key in series], Y
+
+
+def load_store_series(db: Session, start: date, end: date, store_ids: Optional[List[int]] = None):
+    """Daily sales per store from the daily rollup: ([(store_id,)], Y)"""
+    rollup = models.DailySalesRollup
+    query = db.query(
+        rollup.store_id,
+        type_coerce(rollup.sales_date, String),
+        func.sum(rollup.total_amount)
+    ).filter(rollup.sales_date >= start, rollup.sales_date < end)
+    if store_ids is not None:
+        query = query.filter(rollup.store_id.in_(store_ids))
+
+    rows = query.group_by(rollup.store_id, rollup.sales_date).all()
+    store_column, days, totals = zip(*rows) if rows else ((), (), ())
+    return _dense([(store_id,) for store_id in store_column], days, totals, start, (end - start).days)
+
+
+def load_product_series(
+    db: Session,
+    start: date,
+    end: date,
+    store_ids: Optional[List[int]] = None,
+    product_ids: Optional[List[int]] = None
+):
+    """Daily units sold per product: ([(store_id, product_id)], Y)"""
+    sale_day = func.date(models.Sale.sale_date)
+    query = db.query(
+        models.Sale.store_id,
+        models.SaleItem.product_id,
+        type_coerce(sale_day, String),
+        func.sum(models.SaleItem.quantity)
+    ).join(
+        models.Sale, models.Sale.id == models.SaleItem.sale_id
+    ).filter(
+        models.Sale.sale_date >= datetime.combine(start, datetime.min.time()),
+        models.Sale.sale_date < datetime.combine(end, datetime.min.time())
+    )
+    if store_ids is not None:
+        query = query.filter(models.Sale.store_id.in_(store_ids))
+    if product_ids is not None:
+        query = query.filter(models.SaleItem.product_id.in_(product_ids))
+
+    rows = query.group_by(models.Sale.store_id, models.SaleItem.product_id, sale_day).all()
+    stores, products, days, quantities = zip(*rows) if rows else ((), (), (), ())
+    return _dense(list(zip(stores, products)), days, quantities, start, (end - start).days)
+
+
+def fit_active(keys, Y: np.ndarray, start: date, holdout_days: int = HOLDOUT_DAYS):
+    """fit_series on the series with at least MIN_ACTIVE_DAYS days of sales"""
+    active = (Y > 0).sum(axis=0) >= MIN_ACTIVE_DAYS
+    keys = [key for key, keep in zip(keys, active) if keep]
+    if not keys:
+        return [], None
+    return keys, fit_series(Y[:, active], start, holdout_days)
+
+
+def _model_rows(keys, fit: ForecastFit, history_days: int, fitted_at: datetime, product_level: bool) -> List[dict]:
+    return [
+        {
+            "store_id": key[0],
+            "product_id": key[1] if product_level else None,
+            "method": fit.method[i],
+            "level": float(fit.level[i]),
+            "trend": float(fit.trend[i]),
+            "seasonal": [float(value) for value in fit.seasonal[:, i]],
+            "residual_std": float(fit.residual_std[i]),
+            "holdout_mae": float(fit.holdout_mae[i]),
+            "history_days": history_days,
+            "origin_date": fit.origin,
+            "fitted_at": fitted_at
+        }
+        for i, key in enumerate(keys)
+    ]
+
+
+def fit_forecast_models(
+    db: Session,
+    history_days: int = HISTORY_DAYS,
+    holdout_days: int = HOLDOUT_DAYS,
+    batch_size: int = 5000
+) -> Dict[str, int]:
+    """Refit every store and product and replace forecast_models, returns counts"""
+    fitted_at = datetime.now()
+    start, end = history_window(history_days)
+
+    store_keys, store_fit = fit_active(*load_store_series(db, start, end), start, holdout_days)
+    product_keys, product_fit = fit_active(*load_product_series(db, start, end), start, holdout_days)
+
+    rows = []
+    if store_fit is not None:
+        rows += _model_rows(store_keys, store_fit, history_days, fitted_at, product_level=False)
+    if product_fit is not None:
+        rows += _model_rows(product_keys, product_fit, history_days, fitted_at, product_level=True)
+
+    try:
+        db.query(models.ForecastModel).delete(synchronize_session=False)
+        for offset in range(0, len(rows), batch_size):
+            db.execute(insert(models.ForecastModel.__table__), rows[offset:offset + batch_size])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {"stores": len(store_keys), "products": len(product_keys)}
+
+
+def fit_from_models(rows: List[models.ForecastModel]) -> ForecastFit:
+    """Stored models as one fit; levels are moved to the latest origin if they differ"""
+    origin = max(row.origin_date for row in rows)
+    return ForecastFit(
+        origin=origin,
+        method=np.array([row.method for row in rows], dtype=object),
+        level=np.array([row.level + row.trend * (origin - row.origin_date).days for row in rows]),
+        trend=np.array([row.trend for row in rows]),
+        seasonal=np.array([row.seasonal for row in rows]).T,
+        residual_std=np.array([row.residual_std for row in rows]),
+        holdout_mae=np.array([row.holdout_mae or 0 for row in rows])
+    )
+
+
+def forecast_days(fit: ForecastFit, days: int, value_key: str, first_day: Optional[date] = None) -> Dict:
+    """Daily forecast of the sum of the fitted series.
+
+    Series are treated as independent, so their variances add up.
+    """
+    first_day = first_day or date.today() + timedelta(days=1)
+    dates = [first_day + timedelta(days=i) for i in range(days)]
+    predicted = fit.predict(dates).sum(axis=1)
+    margin = Z_95 * np.sqrt((fit.residual_std ** 2).sum())
+    level = float(fit.level.sum())
+    trend = float(fit.trend.sum())
+
+    methods = sorted(set(fit.method))
+    return {
+        "trend": "increasing" if trend > 0 else "decreasing",
+        "trend_percentage": round(abs(trend) / level * 100, 2) if level > 0 else 0,
+        "forecasts": [
+            {
+                "date": day.strftime("%Y-%m-%d"),
+                value_key: round(float(value), 2),
+                "confidence_interval_low": round(max(float(value) - margin, 0), 2),
+                "confidence_interval_high": round(float(value) + margin, 2)
+            }
+            for day, value in zip(dates, predicted)
+        ],
+        "model": {
+            "method": methods[0] if len(methods) == 1 else "mixed",
+            "series": len(fit),
+            "origin_date": fit.origin.isoformat(),
+            # Per-series errors don't add up to the error of a sum
+            "holdout_mae": round(float(fit.holdout_mae[0]), 2) if len(fit) == 1 else None
+        }
+    }
@@ -0,0 +1,79 @@
+"""
+Shared outbound HTTP client for async endpoints.
+
+One pooled httpx.AsyncClient per event loop keeps connections to the ad
+platforms alive between requests instead of paying DNS + TLS on every call,
+and, unlike ``requests``, never blocks the event loop while waiting.
+
+request() retries what is safe to retry: connection failures and connect or
+pool timeouts (the request never reached the server) for any method, and
+other timeouts, 429 and 5xx only for GET. An OAuth code can only be redeemed
+once, so a code exchange is never re-sent after the server has seen it: POSTs
+aren't, and Meta's exchange, a GET, passes retries=0.
+"""
+import asyncio
+import logging
+from typing import Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+RETRIES = 2
+BACKOFF_SECONDS = 0.25
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_clients = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The pooled client of the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _clients[loop] = httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS)
+    return client
+
+
+async def close_http_clients() -> None:
+    loop = asyncio.get_running_loop()
+    for client_loop, client in list(_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+        del _clients[client_loop]
+
+
+async def request(method: str, url: str, retries: int = RETRIES, **kwargs) -> httpx.Response:
+    client = get_http_client()
+    idempotent = method.upper() == "GET"
+    attempt = 0
+    while True:
+        try:
+            response = await client.request(method, url, **kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            # Never sent, so safe to repeat for any method
+            if attempt >= retries:
+                raise
+        except httpx.TimeoutException:
+            if not idempotent or attempt >= retries:
+                raise
+        else:
+            if not idempotent or response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            retry_after: Optional[str] = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                await asyncio.sleep(min(float(retry_after), 5.0))
+                attempt += 1
+                continue
+        attempt += 1
+        logger.info("Retrying %s %s (attempt %d)", method, url, attempt + 1)
+        await asyncio.sleep(BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
+
+
+async def post(url: str, **kwargs) -> httpx.Response:
+    return await request("POST", url, **kwargs)
@@ -0,0 +1,133 @@
+"""
+Invoice number allocation.
+
+Numbers come from a per-store, per-day counter row in ``invoice_sequences``.
+Each allocation is a single ``UPDATE ... SET last_value = last_value + n
+RETURNING last_value``, so it is O(1) per sale and the row lock serialises
+concurrent checkouts across uvicorn workers instead of letting them collide on
+the unique invoice number. Blocks of numbers can be reserved up front for
+offline POS terminals; unused numbers in a block simply leave a gap. A number
+a client supplies must be one the counter already handed out, see
+parse_invoice_number and issued_up_to.
+"""
+import re
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.db import models
+
+
+def invoice_prefix(store_id: int, sequence_date: date) -> str:
+    return f"INV{store_id}{sequence_date.strftime('%Y%m%d')}"
+
+
+def format_invoice_number(store_id: int, sequence_date: date, value: int) -> str:
+    return f"{invoice_prefix(store_id, sequence_date)}{value:04d}"
+
+
+def parse_invoice_number(invoice_number: str, store_id: int) -> Optional[Tuple[date, int]]:
+    """(sequence date, counter value) of a store's invoice number, None if it isn't one"""
+    match = re.fullmatch(rf"INV{store_id}(\d{{8}})(\d{{4,}})", invoice_number)
+    if not match:
+        return None
+    try:
+        sequence_date = datetime.strptime(match.group(1), "%Y%m%d").date()
+    except ValueError:
+        return None
+    value = int(match.group(2))
+    if value < 1 or format_invoice_number(store_id, sequence_date, value) != invoice_number:
+        return None
+    return sequence_date, value
+
+
+def issued_up_to(db: Session, keys: Iterable[Tuple[int, date]]) -> Dict[Tuple[int, date], int]:
+    """Last counter value handed out per (store_id, sequence_date), 0 if none yet"""
+    keys = set(keys)
+    issued = {key: 0 for key in keys}
+    if not keys:
+        return issued
+    sequence = models.InvoiceSequence
+    rows = db.query(sequence.store_id, sequence.sequence_date, sequence.last_value).filter(
+        sequence.store_id.in_(sorted({store_id for store_id, _ in keys})),
+        sequence.sequence_date.in_(sorted({sequence_date for _, sequence_date in keys}))
+    )
+    for store_id, sequence_date, last_value in rows:
+        if (store_id, sequence_date) in issued:
+            issued[(store_id, sequence_date)] = last_value
+    return issued
+
+
+def _legacy_high_water_mark(db: Session, store_id: int, sequence_date: date) -> int:
+    """Highest number already issued for the day before the counter existed.
+
+    Only runs the first time a store allocates on a given day.
+    """
+    prefix = invoice_prefix(store_id, sequence_date)
+    rows = db.query(models.Sale.invoice_number).filter(
+        models.Sale.store_id == store_id,
+        models.Sale.invoice_number.like(f"{prefix}%")
+    ).all()
+
+    high = 0
+    for (invoice_number,) in rows:
+        suffix = invoice_number[len(prefix):]
+        if suffix.isdigit():
+            high = max(high, int(suffix))
+    return high
+
+
+def _increment(db: Session, store_id: int, sequence_date: date, count: int) -> Optional[int]:
+    table = models.InvoiceSequence.__table__
+    return db.execute(
+        update(table)
+        .where(table.c.store_id == store_id, table.c.sequence_date == sequence_date)
+        .values(last_value=table.c.last_value + count)
+        .returning(table.c.last_value)
+    ).scalar()
+
+
+def allocate_invoice_numbers(
+    db: Session,
+    store_id: int,
+    count: int = 1,
+    sequence_date: Optional[date] = None
+) -> List[str]:
+    """Allocate ``count`` consecutive invoice numbers for a store.
+
+    Runs inside the caller's transaction; the numbers are only consumed once
+    that transaction commits.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1")
+
+    sequence_date = sequence_date or datetime.now().date()
+    last_value = _increment(db, store_id, sequence_date, count)
+
+    if last_value is None:
+        # First allocation for this store today - create the counter row.
+        # A concurrent worker may win the insert, in which case we fall back
+        # to incrementing the row it created.
+        start = _legacy_high_water_mark(db, store_id, sequence_date)
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.InvoiceSequence.__table__).values(
+                    store_id=store_id,
+                    sequence_date=sequence_date,
+                    last_value=start + count
+                ))
+            last_value = start + count
+        except IntegrityError:
+            last_value = _increment(db, store_id, sequence_date, count)
+
+    first_value = last_value - count + 1
+    return [
+        format_invoice_number(store_id, sequence_date, value)
+        for value in range(first_value, last_value + 1)
+    ]
+
+
+def generate_invoice_number(db: Session, store_id: int) -> str:
+    """Allocate the next invoice number for a store"""
+    return allocate_invoice_numbers(db, store_id, 1)[0]
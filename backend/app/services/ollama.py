@@ -0,0 +1,130 @@
+"""
+Ollama chat client for the AI chatbot.
+
+Requests go through the shared pooled client (app.services.http_client), so
+chat messages reuse keep-alive connections to Ollama. stream_chat() asks
+Ollama for ``"stream": true`` and yields the text of each NDJSON chunk as it
+arrives; the chatbot relays those to the browser as server-sent events.
+
+ChatMetrics keeps in-process timings per mode: time to first token, total
+generation time and chunk counts, over the last METRIC_SAMPLES requests.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import AsyncIterator, List, Optional
+import httpx
+import numpy as np
+from app.services import http_client
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "phi4")  # Will work with any phi4 variant
+
+# Generation can take minutes; a read timeout applies between chunks, not to the whole answer
+CHAT_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+OPTIONS = {"temperature": 0.7, "num_predict": 1000}
+METRIC_SAMPLES = 1000
+
+
+class OllamaError(Exception):
+    """Ollama answered with something other than a 200"""
+
+
+def chat_payload(messages: List[dict], stream: bool) -> dict:
+    return {"model": OLLAMA_MODEL, "messages": messages, "stream": stream, "options": OPTIONS}
+
+
+async def chat(messages: List[dict]) -> str:
+    """The whole answer in one response"""
+    response = await http_client.post(
+        f"{OLLAMA_BASE_URL}/api/chat", json=chat_payload(messages, stream=False), timeout=CHAT_TIMEOUT, retries=0
+    )
+    if response.status_code != 200:
+        raise OllamaError(response.text)
+    return response.json().get("message", {}).get("content", "I apologize, but I couldn't generate a response.")
+
+
+async def stream_chat(messages: List[dict]) -> AsyncIterator[str]:
+    """Answer text as Ollama generates it"""
+    client = http_client.get_http_client()
+    async with client.stream(
+        "POST", f"{OLLAMA_BASE_URL}/api/chat", json=chat_payload(messages, stream=True), timeout=CHAT_TIMEOUT
+    ) as response:
+        if response.status_code != 200:
+            raise OllamaError((await response.aread()).decode(errors="replace"))
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise OllamaError(chunk["error"])
+            content = chunk.get("message", {}).get("content")
+            if content:
+                yield content
+            if chunk.get("done"):
+                break
+
+
+class ChatMetrics:
+    """Rolling chat timings per mode (stream, blocking, fallback)"""
+
+    def __init__(self, samples: int = METRIC_SAMPLES):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+        self._failed = defaultdict(int)
+        self._first_token = defaultdict(lambda: deque(maxlen=samples))
+        self._total = defaultdict(lambda: deque(maxlen=samples))
+        self._chunks = defaultdict(lambda: deque(maxlen=samples))
+
+    def record(self, mode: str, first_token: Optional[float], total: float, chunks: int) -> None:
+        with self._lock:
+            self._counts[mode] += 1
+            if first_token is not None:
+                self._first_token[mode].append(first_token)
+            self._total[mode].append(total)
+            self._chunks[mode].append(chunks)
+
+    def failed(self, mode: str) -> None:
+        with self._lock:
+            self._failed[mode] += 1
+
+    def stats(self) -> dict:
+        def ms(values, q):
+            return round(float(np.percentile(values, q)) * 1000, 1) if values else None
+
+        with self._lock:
+            modes = {}
+            for mode in sorted(set(self._counts) | set(self._failed)):
+                first_token, total = list(self._first_token[mode]), list(self._total[mode])
+                modes[mode] = {
+                    "completed": self._counts[mode],
+                    "failed": self._failed[mode],
+                    "time_to_first_token_p50_ms": ms(first_token, 50),
+                    "time_to_first_token_p95_ms": ms(first_token, 95),
+                    "total_p50_ms": ms(total, 50),
+                    "total_p95_ms": ms(total, 95),
+                    "average_chunks": round(float(np.mean(self._chunks[mode])), 1) if self._chunks[mode] else None
+                }
+            return {"model": OLLAMA_MODEL, "base_url": OLLAMA_BASE_URL, "modes": modes}
+
+
+metrics = ChatMetrics()
+
+
+class Timer:
+    """Measures one chat request for ChatMetrics"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.chunks = 0
+
+    def chunk(self) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.started
+        self.chunks += 1
+
+    def record(self, mode: str) -> None:
+        metrics.record(mode, self.first_token, time.perf_counter() - self.started, self.chunks)
@@ -0,0 +1,263 @@
+"""
+Background report jobs.
+
+Large exports run in a small thread pool instead of inside the request. A job
+row in ``report_jobs`` tracks status and progress; the worker writes the file
+to REPORT_JOB_DIR through app.services.exports and the client downloads it
+from /reports/jobs/{id}/download.
+
+Jobs are de-duplicated on (report, format, parameters, store scope): while an
+identical job is queued or running, or its finished file is younger than
+REPORT_JOB_TTL_MINUTES, submitting again returns the existing job.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+from app.services.exports import ExportSheet, write_export
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+EXPIRED = "expired"
+
+# Rows between progress updates
+PROGRESS_EVERY = 1000
+
+ExportBuilder = Callable[[Session, models.User], Tuple[List[ExportSheet], str]]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_submit_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.REPORT_JOB_WORKERS,
+            thread_name_prefix="report-job"
+        )
+    return _executor
+
+
+def shutdown_report_jobs() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def job_scope(current_user: models.User, store_id: Optional[int]) -> Optional[int]:
+    """The store a job's output covers; None means every store (super admin only)"""
+    if current_user.role != models.UserRole.SUPER_ADMIN:
+        return current_user.store_id
+    return store_id
+
+
+def can_access_job(job: models.ReportJob, current_user: models.User) -> bool:
+    if current_user.role == models.UserRole.SUPER_ADMIN:
+        return True
+    return job.store_id is not None and job.store_id == current_user.store_id
+
+
+def _dedup_key(report: str, export_format: str, params: dict, store_id: Optional[int]) -> str:
+    payload = json.dumps(
+        {"report": report, "format": export_format, "params": params, "store_id": store_id},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _remove_file(job: models.ReportJob) -> None:
+    if job.file_path and os.path.exists(job.file_path):
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            logger.warning("Could not remove expired report %s", job.file_path)
+
+
+def is_expired(job: models.ReportJob) -> bool:
+    return job.status == COMPLETED and (
+        (job.expires_at is not None and job.expires_at <= datetime.now())
+        or not (job.file_path and os.path.exists(job.file_path))
+    )
+
+
+def expire_job(db: Session, job: models.ReportJob) -> None:
+    _remove_file(job)
+    job.status = EXPIRED
+    job.file_path = None
+    db.commit()
+
+
+def purge_expired_jobs(db: Session) -> int:
+    """Delete files of finished jobs past their TTL, returns how many expired"""
+    jobs = db.query(models.ReportJob).filter(
+        models.ReportJob.status == COMPLETED,
+        models.ReportJob.expires_at <= datetime.now()
+    ).all()
+    for job in jobs:
+        _remove_file(job)
+        job.status = EXPIRED
+        job.file_path = None
+    db.commit()
+    return len(jobs)
+
+
+def recover_report_jobs(db: Session) -> None:
+    """On startup: jobs that were queued or running died with the old process"""
+    db.query(models.ReportJob).filter(
+        models.ReportJob.status.in_([QUEUED, RUNNING])
+    ).update(
+        {"status": FAILED, "error": "Interrupted by a server restart", "finished_at": datetime.now()},
+        synchronize_session=False
+    )
+    db.commit()
+    purge_expired_jobs(db)
+
+
+def submit_job(
+    db: Session,
+    report: str,
+    params: dict,
+    export_format: str,
+    current_user: models.User,
+    build: ExportBuilder
+) -> models.ReportJob:
+    """Queue ``build`` for the user, or return an identical live or cached job.
+
+    ``params`` are the submitted parameters, used for de-duplication and shown
+    back to the client; ``build(db, user)`` returns the sheets and filename.
+    """
+    store_id = job_scope(current_user, params.get("store_id"))
+    dedup_key = _dedup_key(report, export_format, params, store_id)
+
+    with _submit_lock:
+        existing = db.query(models.ReportJob).filter(
+            models.ReportJob.dedup_key == dedup_key,
+            models.ReportJob.status.in_([QUEUED, RUNNING, COMPLETED])
+        ).order_by(models.ReportJob.created_at.desc()).first()
+
+        if existing is not None:
+            if not is_expired(existing):
+                return existing
+            expire_job(db, existing)
+
+        job = models.ReportJob(
+            id=uuid.uuid4().hex,
+            report=report,
+            export_format=export_format,
+            params=params,
+            dedup_key=dedup_key,
+            store_id=store_id,
+            requested_by=current_user.id,
+            status=QUEUED
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+    _get_executor().submit(_run_job, job.id, build)
+    return job
+
+
+class _Progress:
+    """Counts rows as the writer pulls them and saves progress every PROGRESS_EVERY rows"""
+
+    def __init__(self, job_id: str, total: Optional[int]):
+        self.job_id = job_id
+        self.total = total
+        self.rows = 0
+
+    def track(self, rows):
+        for row in rows:
+            yield row
+            self.rows += 1
+            if self.rows % PROGRESS_EVERY == 0:
+                self.save()
+
+    def percent(self) -> int:
+        if not self.total:
+            return 0
+        # 100 is reserved for the finished file
+        return min(99, self.rows * 100 // self.total)
+
+    def save(self) -> None:
+        # Separate session: the export session is in the middle of a cursor
+        db = SessionLocal()
+        try:
+            db.query(models.ReportJob).filter(models.ReportJob.id == self.job_id).update(
+                {"rows_written": self.rows, "progress": self.percent()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            # Progress is informational, never fail the export over it
+            db.rollback()
+            logger.warning("Could not save progress for report job %s", self.job_id)
+        finally:
+            db.close()
+
+
+def _run_job(job_id: str, build: ExportBuilder) -> None:
+    db = SessionLocal()
+    path = None
+    try:
+        job = db.get(models.ReportJob, job_id)
+        user = db.get(models.User, job.requested_by)
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        db.commit()
+
+        sheets, filename = build(db, user)
+
+        counts = [sheet.count() for sheet in sheets if sheet.count is not None]
+        progress = _Progress(job_id, sum(counts) if len(counts) == len(sheets) else None)
+        for sheet in sheets:
+            sheet.rows = progress.track(sheet.rows)
+
+        os.makedirs(settings.REPORT_JOB_DIR, exist_ok=True)
+        path = os.path.join(settings.REPORT_JOB_DIR, f"{job_id}.{job.export_format}")
+        partial = path + ".part"
+        with open(partial, "wb") as output:
+            write_export(sheets, output, job.export_format)
+        os.replace(partial, path)
+
+        # The export session may still hold the streamed rows' transaction
+        db.rollback()
+        job = db.get(models.ReportJob, job_id)
+        job.status = COMPLETED
+        job.progress = 100
+        job.rows_written = progress.rows
+        job.filename = f"{filename}.{job.export_format}"
+        job.file_path = path
+        job.file_size = os.path.getsize(path)
+        job.finished_at = datetime.now()
+        job.expires_at = job.finished_at + timedelta(minutes=settings.REPORT_JOB_TTL_MINUTES)
+        db.commit()
+    except Exception as e:
+        logger.exception("Report job %s failed", job_id)
+        db.rollback()
+        if path and os.path.exists(path + ".part"):
+            os.remove(path + ".part")
+        job = db.get(models.ReportJob, job_id)
+        if job is not None:
+            job.status = FAILED
+            job.error = str(e) or e.__class__.__name__
+            job.finished_at = datetime.now()
+            db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,213 @@
+"""
+RFM (Recency, Frequency, Monetary) customer segmentation.
+
+One grouped query over ``sales`` yields a customer's last purchase, number of
+orders and total spend; everything after that runs on NumPy arrays, so the
+cost is one pass over the sales table plus a few vector operations however
+many customers a store has.
+
+Each metric is scored 1-5 by quintile across the scored customers (5 is best:
+most recent, most frequent, biggest spend) and a customer's segment is the
+first rule in SEGMENTS that matches its scores.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+from pydantic import BaseModel, Field
+from sqlalchemy import String, func, type_coerce
+from sqlalchemy.orm import Session
+from app.db import models
+
+SEGMENTS = (
+    "champions",
+    "loyal_customers",
+    "potential_loyalists",
+    "at_risk",
+    "hibernating",
+    "lost",
+)
+
+SEGMENT_CHARACTERISTICS = {
+    "champions": "Best customers - Recent, frequent, high value",
+    "loyal_customers": "Regular buyers - Good frequency",
+    "potential_loyalists": "Recent buyers - Can become loyal",
+    "at_risk": "Haven't purchased recently - Need attention",
+    "hibernating": "Long time since purchase - Re-engage",
+    "lost": "Inactive customers - Win-back campaigns",
+}
+
+QUINTILES = (0.2, 0.4, 0.6, 0.8)
+
+
+class RFMThresholds(BaseModel):
+    """Score cut-offs (1-5) for each segment, checked in SEGMENTS order"""
+    champion_min_score: int = Field(4, ge=1, le=5, description="Minimum R, F and M score of a champion")
+    loyal_min_frequency: int = Field(4, ge=1, le=5, description="Minimum F score of a loyal customer")
+    loyal_min_recency: int = Field(3, ge=1, le=5, description="Minimum R score of a loyal customer")
+    potential_min_recency: int = Field(4, ge=1, le=5, description="Minimum R score of a potential loyalist")
+    at_risk_max_recency: int = Field(2, ge=1, le=5, description="Maximum R score of an at-risk customer")
+    at_risk_min_frequency: int = Field(3, ge=1, le=5, description="Minimum F score of an at-risk customer")
+    lost_max_recency: int = Field(1, ge=1, le=5, description="Maximum R score of a lost customer")
+    lost_max_frequency: int = Field(2, ge=1, le=5, description="Maximum F score of a lost customer")
+
+
+class RFMResult:
+    """Per-customer metrics, scores and segment index, aligned by position"""
+
+    def __init__(self, customer_ids, recency, frequency, monetary, r_score, f_score, m_score, segment):
+        self.customer_ids = customer_ids
+        self.recency = recency
+        self.frequency = frequency
+        self.monetary = monetary
+        self.r_score = r_score
+        self.f_score = f_score
+        self.m_score = m_score
+        self.segment = segment
+
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+
+
+def load_rfm_metrics(db: Session, store_ids: Optional[List[int]] = None, now: Optional[datetime] = None):
+    """Customer ids, days since last purchase, order count and spend as arrays"""
+    query = db.query(
+        models.Sale.customer_id,
+        # Skip the driver's per-row datetime parsing, NumPy parses the whole
+        # column at once (and takes datetimes too where the driver returns them)
+        type_coerce(func.max(models.Sale.sale_date), String),
+        func.count(models.Sale.id),
+        func.sum(models.Sale.total_amount)
+    ).filter(models.Sale.customer_id.isnot(None))
+
+    if store_ids is not None:
+        query = query.join(
+            models.Customer, models.Sale.customer_id == models.Customer.id
+        ).filter(models.Customer.store_id.in_(store_ids))
+
+    rows = query.group_by(models.Sale.customer_id).all()
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0, dtype=np.float64)
+
+    customer_ids, last_purchase, frequency, monetary = zip(*rows)
+    last_purchase = np.array(last_purchase, dtype="datetime64[us]")
+    recency = (np.datetime64(now or datetime.now(), "us") - last_purchase) // np.timedelta64(1, "D")
+
+    return (
+        np.array(customer_ids, dtype=np.int64),
+        recency.astype(np.int64),
+        np.array(frequency, dtype=np.int64),
+        np.array(monetary, dtype=np.float64),
+    )
+
+
+def quintile_scores(values: np.ndarray, higher_is_better: bool = True) -> np.ndarray:
+    """Score each value 1-5 by which quintile of ``values`` it falls in.
+
+    Ties at a quintile edge go to the lower score, so when most customers
+    bought once they all share the bottom frequency score instead of being
+    spread across several.
+    """
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int8)
+    edges = np.quantile(values, QUINTILES)
+    if higher_is_better:
+        scores = np.searchsorted(edges, values, side="left") + 1
+    else:
+        scores = 5 - np.searchsorted(edges, values, side="right")
+    return scores.astype(np.int8)
+
+
+def assign_segments(r: np.ndarray, f: np.ndarray, m: np.ndarray, thresholds: RFMThresholds) -> np.ndarray:
+    """Index into SEGMENTS for every customer; customers no rule matches are hibernating"""
+    t = thresholds
+    conditions = [
+        (r >= t.champion_min_score) & (f >= t.champion_min_score) & (m >= t.champion_min_score),
+        (f >= t.loyal_min_frequency) & (r >= t.loyal_min_recency),
+        r >= t.potential_min_recency,
+        (r <= t.at_risk_max_recency) & (f >= t.at_risk_min_frequency),
+        (r <= t.lost_max_recency) & (f <= t.lost_max_frequency),
+    ]
+    choices = [
+        SEGMENTS.index("champions"),
+        SEGMENTS.index("loyal_customers"),
+        SEGMENTS.index("potential_loyalists"),
+        SEGMENTS.index("at_risk"),
+        SEGMENTS.index("lost"),
+    ]
+    return np.select(conditions, choices, default=SEGMENTS.index("hibernating")).astype(np.int8)
+
+
+def score_customers(customer_ids, recency, frequency, monetary, thresholds: RFMThresholds) -> RFMResult:
+    r = quintile_scores(recency, higher_is_better=False)
+    f = quintile_scores(frequency)
+    m = quintile_scores(monetary)
+    return RFMResult(
+        customer_ids, recency, frequency, monetary, r, f, m,
+        assign_segments(r, f, m, thresholds)
+    )
+
+
+def segment_summary(result: RFMResult) -> List[Dict]:
+    counts = np.bincount(result.segment, minlength=len(SEGMENTS))
+    revenue = np.bincount(result.segment, weights=result.monetary, minlength=len(SEGMENTS))
+    summary = []
+    for index, name in enumerate(SEGMENTS):
+        count = int(counts[index])
+        if count == 0:
+            continue
+        summary.append({
+            "segment": name,
+            "customer_count": count,
+            "avg_order_value": round(float(revenue[index]) / count, 2),
+            "total_revenue": round(float(revenue[index]), 2),
+            "characteristics": SEGMENT_CHARACTERISTICS[name]
+        })
+    return summary
+
+
+def customer_page(
+    db: Session,
+    result: RFMResult,
+    segment: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> Dict:
+    """One page of scored customers, best RFM score and biggest spend first"""
+    positions = np.arange(len(result))
+    if segment is not None:
+        positions = positions[result.segment == SEGMENTS.index(segment)]
+
+    total_score = (
+        result.r_score[positions].astype(np.int16)
+        + result.f_score[positions]
+        + result.m_score[positions]
+    )
+    # lexsort sorts by the last key first, both negated for descending order
+    order = np.lexsort((-result.monetary[positions], -total_score))
+    page = positions[order[skip:skip + limit]]
+
+    page_ids = [int(customer_id) for customer_id in result.customer_ids[page]]
+    names = dict(
+        db.query(models.Customer.id, models.Customer.name).filter(
+            models.Customer.id.in_(page_ids)
+        ).all()
+    ) if page_ids else {}
+
+    customers = []
+    for position, customer_id in zip(page, page_ids):
+        r, f, m = int(result.r_score[position]), int(result.f_score[position]), int(result.m_score[position])
+        customers.append({
+            "customer_id": customer_id,
+            "name": names.get(customer_id),
+            "recency_days": int(result.recency[position]),
+            "frequency": int(result.frequency[position]),
+            "monetary": round(float(result.monetary[position]), 2),
+            "r_score": r,
+            "f_score": f,
+            "m_score": m,
+            "rfm_score": f"{r}{f}{m}",
+            "segment": SEGMENTS[result.segment[position]]
+        })
+
+    return {"total": int(positions.size), "skip": skip, "limit": limit, "customers": customers}
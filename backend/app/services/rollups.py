@@ -0,0 +1,205 @@
+"""
+Daily sales rollup.
+
+``daily_sales_rollup`` keeps one row per (store, day, payment mode) with the
+bill count and the subtotal / GST / discount / total sums. The sale pipelines
+call apply_sales inside their transaction, so dashboards and summaries read a
+handful of rows instead of loading every Sale in the range.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import and_, func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.db import models
+
+MEASURES = ("transaction_count", "subtotal", "gst_amount", "discount", "total_amount")
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _increment(db: Session, key: tuple, deltas: Dict[str, float]) -> int:
+    table = models.DailySalesRollup.__table__
+    store_id, sales_date, payment_mode = key
+    result = db.execute(
+        update(table)
+        .where(
+            table.c.store_id == store_id,
+            table.c.sales_date == sales_date,
+            table.c.payment_mode == payment_mode
+        )
+        .values({name: table.c[name] + deltas[name] for name in MEASURES})
+    )
+    return result.rowcount
+
+
+def apply_sales(db: Session, sale_rows: Iterable[dict]) -> None:
+    """Add sales to the rollup inside the caller's transaction.
+
+    ``sale_rows`` are dicts with store_id, sale_date, payment_mode, subtotal,
+    gst_amount, discount and total_amount - the rows the sale pipelines build.
+    """
+    grouped = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    for row in sale_rows:
+        key = (row["store_id"], _as_date(row["sale_date"]), row["payment_mode"])
+        deltas = grouped[key]
+        deltas["transaction_count"] += 1
+        deltas["subtotal"] += row["subtotal"] or 0
+        deltas["gst_amount"] += row["gst_amount"] or 0
+        deltas["discount"] += row["discount"] or 0
+        deltas["total_amount"] += row["total_amount"] or 0
+
+    for key, deltas in grouped.items():
+        if _increment(db, key, deltas):
+            continue
+        # First sale for this store/day/mode; a concurrent writer may create
+        # the row first, in which case we increment theirs.
+        store_id, sales_date, payment_mode = key
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.DailySalesRollup.__table__).values(
+                    store_id=store_id,
+                    sales_date=sales_date,
+                    payment_mode=payment_mode,
+                    **deltas
+                ))
+        except IntegrityError:
+            _increment(db, key, deltas)
+
+
+def rebuild_daily_sales_rollup(
+    db: Session,
+    store_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> int:
+    """Recompute the rollup from the sales table and commit.
+
+    Optionally limited to one store and/or a [start_date, end_date) window.
+    Returns the number of rollup rows written.
+    """
+    rollup = models.DailySalesRollup
+    sale_day = func.date(models.Sale.sale_date)
+
+    delete_query = db.query(rollup)
+    sales_query = db.query(
+        models.Sale.store_id,
+        sale_day.label("sales_date"),
+        models.Sale.payment_mode,
+        func.count(models.Sale.id),
+        func.coalesce(func.sum(models.Sale.subtotal), 0),
+        func.coalesce(func.sum(models.Sale.gst_amount), 0),
+        func.coalesce(func.sum(models.Sale.discount), 0),
+        func.coalesce(func.sum(models.Sale.total_amount), 0)
+    )
+
+    if store_id:
+        delete_query = delete_query.filter(rollup.store_id == store_id)
+        sales_query = sales_query.filter(models.Sale.store_id == store_id)
+    if start_date:
+        delete_query = delete_query.filter(rollup.sales_date >= start_date)
+        sales_query = sales_query.filter(models.Sale.sale_date >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        delete_query = delete_query.filter(rollup.sales_date < end_date)
+        sales_query = sales_query.filter(models.Sale.sale_date < datetime.combine(end_date, datetime.min.time()))
+
+    rows = [
+        {
+            "store_id": row[0],
+            "sales_date": _as_date(row[1]),
+            "payment_mode": row[2],
+            "transaction_count": row[3],
+            "subtotal": row[4],
+            "gst_amount": row[5],
+            "discount": row[6],
+            "total_amount": row[7]
+        }
+        for row in sales_query.group_by(models.Sale.store_id, sale_day, models.Sale.payment_mode)
+    ]
+
+    try:
+        delete_query.delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(rollup.__table__), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(rows)
+
+
+def ensure_daily_sales_rollup(db: Session) -> None:
+    """Backfill an empty rollup when sales already exist (e.g. after upgrading)"""
+    if db.query(models.DailySalesRollup.id).first() is None and db.query(models.Sale.id).first() is not None:
+        rebuild_daily_sales_rollup(db)
+
+
+def _scoped(query, store_ids: Optional[List[int]], start_date: date, end_date: date):
+    rollup = models.DailySalesRollup
+    query = query.filter(and_(rollup.sales_date >= start_date, rollup.sales_date < end_date))
+    if store_ids is not None:
+        query = query.filter(rollup.store_id.in_(store_ids))
+    return query
+
+
+def sales_totals(db: Session, start_date: date, end_date: date, store_ids: Optional[List[int]] = None) -> dict:
+    """Totals over [start_date, end_date), overall and per payment mode.
+
+    ``store_ids`` of None covers every store (see get_store_filter).
+    """
+    rollup = models.DailySalesRollup
+    rows = _scoped(
+        db.query(
+            rollup.payment_mode,
+            func.sum(rollup.transaction_count),
+            func.sum(rollup.subtotal),
+            func.sum(rollup.gst_amount),
+            func.sum(rollup.discount),
+            func.sum(rollup.total_amount)
+        ),
+        store_ids, start_date, end_date
+    ).group_by(rollup.payment_mode).all()
+
+    totals = dict.fromkeys(MEASURES, 0)
+    totals["by_payment_mode"] = {}
+    for payment_mode, count, subtotal, gst_amount, discount, total_amount in rows:
+        totals["transaction_count"] += count or 0
+        totals["subtotal"] += subtotal or 0
+        totals["gst_amount"] += gst_amount or 0
+        totals["discount"] += discount or 0
+        totals["total_amount"] += total_amount or 0
+        totals["by_payment_mode"][payment_mode] = {
+            "transaction_count": count or 0,
+            "total_amount": total_amount or 0
+        }
+    return totals
+
+
+def daily_totals(db: Session, start_date: date, end_date: date, store_ids: Optional[List[int]] = None) -> List[dict]:
+    """Per-day totals over [start_date, end_date), oldest first"""
+    rollup = models.DailySalesRollup
+    rows = _scoped(
+        db.query(
+            rollup.sales_date,
+            func.sum(rollup.transaction_count),
+            func.sum(rollup.total_amount)
+        ),
+        store_ids, start_date, end_date
+    ).group_by(rollup.sales_date).order_by(rollup.sales_date).all()
+
+    return [
+        {
+            "date": _as_date(sales_date),
+            "transaction_count": count or 0,
+            "total_amount": total_amount or 0
+        }
+        for sales_date, count, total_amount in rows
+    ]
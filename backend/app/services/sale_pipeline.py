@@ -0,0 +1,172 @@
+"""
+Sale creation pipeline.
+
+Loads every product in the basket with one ``IN`` query, prices the sale from
+that snapshot, and in one transaction writes the sale and its items, reserves
+stock with conditional updates (see app.services.stock) so concurrent tills
+cannot oversell, and updates the customer total, the daily rollup, the
+co-occurrence index and the audit log. The store's cached dashboards are
+invalidated once it commits.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.core.cache import response_cache, SALES
+from app.db import models
+from app.schemas.sale import SaleCreate
+from app.services import audit
+from app.services.cooccurrence import apply_baskets
+from app.services.invoice_numbers import generate_invoice_number
+from app.services.rollups import apply_sales
+from app.services.stock import InsufficientStockError, aggregate_quantities, reserve_stock
+
+
+# Upper bound for IN lists so large batches stay under driver parameter limits
+IN_CHUNK_SIZE = 500
+
+
+def load_products(db: Session, product_ids: Iterable[int]) -> Dict[int, models.Product]:
+    """Fetch all requested products keyed by id.
+
+    A normal basket is a single round-trip; very large sets are split into
+    IN_CHUNK_SIZE chunks.
+    """
+    ids = sorted(set(product_ids))
+    products = {}
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        chunk = ids[start:start + IN_CHUNK_SIZE]
+        for product in db.query(models.Product).filter(models.Product.id.in_(chunk)):
+            products[product.id] = product
+    return products
+
+
+def validate_sale_items(sale: SaleCreate, products: Dict[int, models.Product]) -> None:
+    """Check the sale has lines and every line refers to a known product.
+
+    Stock levels are enforced by reserve_stock when the sale is written.
+    """
+    if not sale.items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sale has no items"
+        )
+    for item in sale.items:
+        if item.product_id not in products:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with id {item.product_id} not found"
+            )
+
+
+def build_sale(
+    sale: SaleCreate,
+    products: Dict[int, models.Product],
+    invoice_number: str,
+    created_by: int
+) -> Tuple[dict, List[dict]]:
+    """Build the sales and sale_items rows from the product snapshot.
+
+    Rows are returned as plain dicts so items (and whole batches of sales)
+    can be written with a single executemany once the sale ids are known.
+    """
+    subtotal = 0
+    gst_amount = 0
+    sale_items = []
+
+    for item in sale.items:
+        product = products[item.product_id]
+
+        item_total = item.unit_price * item.quantity
+        item_gst = (item_total * product.gst_rate) / 100
+        subtotal += item_total
+        gst_amount += item_gst
+
+        warranty_expires_at = None
+        if product.warranty_months and product.warranty_months > 0:
+            warranty_expires_at = datetime.now() + timedelta(days=product.warranty_months * 30)
+
+        sale_items.append({
+            "product_id": item.product_id,
+            "quantity": item.quantity,
+            "unit_price": item.unit_price,
+            "gst_rate": product.gst_rate,
+            "gst_amount": item_gst,
+            "total_price": item_total + item_gst,
+            "serial_number": item.serial_number,
+            "warranty_expires_at": warranty_expires_at
+        })
+
+    sale_row = {
+        "invoice_number": invoice_number,
+        "customer_id": sale.customer_id,
+        "store_id": sale.store_id,
+        "subtotal": subtotal,
+        "gst_amount": gst_amount,
+        "discount": sale.discount,
+        "total_amount": subtotal + gst_amount - sale.discount,
+        "payment_mode": sale.payment_mode,
+        "created_by": created_by,
+        "sale_date": datetime.now()
+    }
+    return sale_row, sale_items
+
+
+def create_sale_record(db: Session, sale: SaleCreate, current_user: models.User) -> models.Sale:
+    """Validate and persist a sale in a single transaction"""
+    products = load_products(db, (item.product_id for item in sale.items))
+    validate_sale_items(sale, products)
+
+    try:
+        try:
+            reserve_stock(db, aggregate_quantities(
+                (item.product_id, item.quantity) for item in sale.items
+            ))
+        except InsufficientStockError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=e.message
+            )
+
+        sale_row, sale_items = build_sale(
+            sale,
+            products,
+            invoice_number=generate_invoice_number(db, sale.store_id),
+            created_by=current_user.id
+        )
+        db_sale = models.Sale(**sale_row)
+        db.add(db_sale)
+        db.flush()
+
+        for row in sale_items:
+            row["sale_id"] = db_sale.id
+        # An empty executemany would be INSERT ... DEFAULT VALUES
+        if sale_items:
+            db.execute(insert(models.SaleItem.__table__), sale_items)
+
+        # Update customer total purchases without loading the row
+        if sale.customer_id:
+            db.query(models.Customer).filter(
+                models.Customer.id == sale.customer_id
+            ).update(
+                {models.Customer.total_purchases: models.Customer.total_purchases + db_sale.total_amount},
+                synchronize_session=False
+            )
+
+        apply_sales(db, [sale_row])
+        apply_baskets(db, [[row["product_id"] for row in sale_items]])
+
+        audit.record(db, current_user.id, "create", "sale", db_sale.id, {
+            "invoice_number": db_sale.invoice_number,
+            "total_amount": db_sale.total_amount,
+            "items_count": len(sale.items)
+        })
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    response_cache.invalidate([SALES], [db_sale.store_id])
+    return db_sale
@@ -0,0 +1,346 @@
+"""
+Smart alerts rule engine.
+
+GET /automation/alerts/smart used to run five query families on every poll.
+Alerts are now materialized in the smart_alerts table and the endpoint only
+reads it. evaluate_smart_alerts() runs every rule for a set of stores, each
+rule as one set-based query over all of them, and reconciles the result
+with the table:
+
+- an alert is identified by its dedup_key (store, alert type and the row
+  that fired it), so a condition that keeps holding stays one row, with
+  first_fired_at kept and the message refreshed;
+- alerts whose condition no longer holds get resolved_at, and fire again
+  (as the same row) if it comes back;
+- resolved alerts older than SMART_ALERTS_KEEP_RESOLVED_DAYS are deleted.
+
+A background thread calls refresh_smart_alerts() every
+SMART_ALERTS_REFRESH_SECONDS. It only evaluates stores touched since their
+last evaluation, going by the response cache's sales and products write
+generations (see app.core.cache). Stores are also evaluated when the day
+rolled over, or after SMART_ALERTS_MAX_AGE_SECONDS, since time alone
+changes some rules (inactivity, warranty windows). Every store is evaluated
+once after a restart.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from app.core.cache import response_cache, PRODUCTS, SALES
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+TOPICS = [SALES, PRODUCTS]
+SEVERITY_ORDER = {"critical": 0, "warning": 1, "info": 2}
+
+CRITICAL_STOCK_RATIO = 0.3
+HIGH_VALUE_PURCHASES = 100000
+INACTIVE_DAYS = 30
+WARRANTY_DAYS = 30
+SALES_AVERAGE_DAYS = 7
+SALES_DROP_RATIO = 0.5
+STAFF_WINDOW_DAYS = 30
+STAFF_MIN_SALES = 5
+
+
+@dataclass(frozen=True)
+class Rule:
+    alert_type: str
+    severity: str
+    # Alerts shown per alert type, None for all
+    display_limit: Optional[int]
+    evaluate: Callable[[Session, Sequence[int], datetime], List[dict]]
+
+
+def _fired(store_id: int, source: str, entity_type: str, entity_id: Optional[int],
+           title: str, message: str, recommended_action: str) -> dict:
+    return {
+        "store_id": store_id,
+        "source": source,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "title": title,
+        "message": message,
+        "recommended_action": recommended_action
+    }
+
+
+def critical_stock(db: Session, store_ids: Sequence[int], now: datetime) -> List[dict]:
+    product = models.Product
+    rows = db.query(product.id, product.store_id, product.name, product.current_stock, product.minimum_stock).filter(
+        product.store_id.in_(store_ids),
+        product.is_active == True,
+        product.current_stock <= product.minimum_stock * CRITICAL_STOCK_RATIO
+    ).all()
+    return [
+        _fired(
+            row.store_id, f"product:{row.id}", "product", row.id,
+            f"Critical: {row.name} Almost Out of Stock",
+            f"Only {row.current_stock} units left. Minimum required: {row.minimum_stock}",
+            f"Reorder {row.minimum_stock * 2} units immediately"
+        )
+        for row in rows
+    ]
+
+
+def inactive_high_value_customers(db: Session, store_ids: Sequence[int], now: datetime) -> List[dict]:
+    recent = db.query(models.Sale.customer_id).filter(
+        models.Sale.sale_date >= now - timedelta(days=INACTIVE_DAYS),
+        models.Sale.customer_id.isnot(None)
+    ).distinct().subquery()
+    customer = models.Customer
+    rows = db.query(customer.id, customer.store_id, customer.name, customer.total_purchases).outerjoin(
+        recent, recent.c.customer_id == customer.id
+    ).filter(
+        customer.store_id.in_(store_ids),
+        customer.total_purchases >= HIGH_VALUE_PURCHASES,
+        recent.c.customer_id.is_(None)
+    ).all()
+    return [
+        _fired(
+            row.store_id, f"customer:{row.id}", "customer", row.id,
+            f"High-Value Customer Inactive: {row.name}",
+            f"Customer with ₹{row.total_purchases:,.0f} lifetime value hasn't purchased in {INACTIVE_DAYS}+ days",
+            "Send personalized re-engagement offer"
+        )
+        for row in rows
+    ]
+
+
+def expiring_warranties(db: Session, store_ids: Sequence[int], now: datetime) -> List[dict]:
+    item = models.SaleItem
+    rows = db.query(
+        item.id, item.warranty_expires_at, models.Sale.store_id, models.Customer.id.label("customer_id"),
+        models.Customer.name.label("customer_name"), models.Product.name.label("product_name")
+    ).join(
+        models.Sale, item.sale_id == models.Sale.id
+    ).join(
+        models.Customer, models.Sale.customer_id == models.Customer.id
+    ).join(
+        models.Product, item.product_id == models.Product.id
+    ).filter(
+        models.Sale.store_id.in_(store_ids),
+        item.warranty_expires_at.isnot(None),
+        item.warranty_expires_at <= now + timedelta(days=WARRANTY_DAYS),
+        item.warranty_expires_at >= now
+    ).all()
+    return [
+        _fired(
+            row.store_id, f"sale_item:{row.id}", "customer", row.customer_id,
+            f"Warranty Expiring: {row.product_name}",
+            f"Customer {row.customer_name}'s warranty expires in {(row.warranty_expires_at - now).days} days",
+            "Offer extended warranty or AMC package"
+        )
+        for row in rows
+    ]
+
+
+def sales_drop(db: Session, store_ids: Sequence[int], now: datetime) -> List[dict]:
+    """Today's sales under half the daily average of the previous week, from the rollup"""
+    rollup = models.DailySalesRollup
+    today = now.date()
+    week_start = today - timedelta(days=SALES_AVERAGE_DAYS)
+    rows = db.query(
+        rollup.store_id,
+        func.sum(case((rollup.sales_date == today, rollup.total_amount), else_=0)).label("today_total"),
+        func.sum(case((rollup.sales_date < today, rollup.total_amount), else_=0)).label("week_total")
+    ).filter(
+        rollup.store_id.in_(store_ids),
+        rollup.sales_date >= week_start,
+        rollup.sales_date <= today
+    ).group_by(rollup.store_id).all()
+
+    fired = []
+    for row in rows:
+        today_total = row.today_total or 0
+        average = (row.week_total or 0) / SALES_AVERAGE_DAYS
+        if average > 0 and today_total < average * SALES_DROP_RATIO:
+            fired.append(_fired(
+                row.store_id, f"store:{row.store_id}", "sales", None,
+                "Unusual Sales Pattern Detected",
+                f"Today's sales (₹{today_total:,.0f}) are significantly lower than average (₹{average:,.0f})",
+                "Review store operations and run promotional campaigns"
+            ))
+    return fired
+
+
+def low_performing_staff(db: Session, store_ids: Sequence[int], now: datetime) -> List[dict]:
+    user = models.User
+    rows = db.query(
+        user.id, user.store_id, user.full_name, func.count(models.Sale.id).label("sales_count")
+    ).join(
+        models.Sale, user.id == models.Sale.created_by
+    ).filter(
+        user.store_id.in_(store_ids),
+        user.role == models.UserRole.SALES_STAFF,
+        models.Sale.sale_date >= now - timedelta(days=STAFF_WINDOW_DAYS)
+    ).group_by(user.id, user.store_id, user.full_name).having(
+        func.count(models.Sale.id) < STAFF_MIN_SALES
+    ).all()
+    return [
+        _fired(
+            row.store_id, f"user:{row.id}", "staff", row.id,
+            f"Low Performance: {row.full_name}",
+            f"Only {row.sales_count} sales in last {STAFF_WINDOW_DAYS} days",
+            "Provide training and set clear targets"
+        )
+        for row in rows
+    ]
+
+
+RULES = [
+    Rule("inventory_critical", "critical", 10, critical_stock),
+    Rule("customer_retention", "warning", 5, inactive_high_value_customers),
+    Rule("warranty_expiring", "info", 10, expiring_warranties),
+    Rule("sales_anomaly", "warning", None, sales_drop),
+    Rule("staff_performance", "warning", None, low_performing_staff),
+]
+
+
+def evaluate_smart_alerts(db: Session, store_ids: Sequence[int], now: Optional[datetime] = None) -> dict:
+    """Run every rule for ``store_ids`` and reconcile the smart_alerts table"""
+    store_ids = list(store_ids)
+    stats = {"stores": len(store_ids), "fired": 0, "new": 0, "resolved": 0, "deleted": 0}
+    if not store_ids:
+        return stats
+    now = now or datetime.now()
+
+    fired = {}
+    for rule in RULES:
+        for row in rule.evaluate(db, store_ids, now):
+            source = row.pop("source")
+            row.update(alert_type=rule.alert_type, severity=rule.severity, action_required=True)
+            fired[f"{row['store_id']}:{rule.alert_type}:{source}"] = row
+    stats["fired"] = len(fired)
+
+    existing = db.query(models.SmartAlert).filter(models.SmartAlert.store_id.in_(store_ids)).all()
+    keep_resolved_since = now - timedelta(days=settings.SMART_ALERTS_KEEP_RESOLVED_DAYS)
+    for alert in existing:
+        row = fired.pop(alert.dedup_key, None)
+        if row is not None:
+            if alert.resolved_at is not None:
+                # Fired again after having cleared
+                alert.resolved_at = None
+                alert.first_fired_at = now
+                stats["new"] += 1
+            for name, value in row.items():
+                setattr(alert, name, value)
+            alert.last_fired_at = now
+        elif alert.resolved_at is None:
+            alert.resolved_at = now
+            stats["resolved"] += 1
+        elif alert.resolved_at < keep_resolved_since:
+            db.delete(alert)
+            stats["deleted"] += 1
+
+    for dedup_key, row in fired.items():
+        db.add(models.SmartAlert(dedup_key=dedup_key, first_fired_at=now, last_fired_at=now, **row))
+    stats["new"] += len(fired)
+    db.commit()
+    return stats
+
+
+def active_alerts(db: Session, store_ids: Optional[List[int]]) -> List[models.SmartAlert]:
+    """Active alerts in a scope (see get_store_filter), oldest first within each type up to its display_limit"""
+    alert = models.SmartAlert
+    rank = func.row_number().over(partition_by=alert.alert_type, order_by=(alert.first_fired_at, alert.id))
+    query = db.query(alert, rank.label("rank")).filter(alert.resolved_at.is_(None))
+    if store_ids is not None:
+        query = query.filter(alert.store_id.in_(store_ids))
+    ranked = query.subquery()
+    ranked_alert = aliased(models.SmartAlert, ranked)
+    limits = {rule.alert_type: rule.display_limit for rule in RULES if rule.display_limit is not None}
+    limit = case(limits, value=ranked.c.alert_type, else_=ranked.c.rank)
+
+    alerts = db.query(ranked_alert).filter(ranked.c.rank <= limit).all()
+    alerts.sort(key=lambda a: (SEVERITY_ORDER.get(a.severity, 3), a.first_fired_at, a.id))
+    return alerts
+
+
+_evaluated: Dict[int, tuple] = {}
+_lock = threading.Lock()
+_refresher: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _touched_stores(store_ids: Sequence[int], now: float) -> List[int]:
+    """Stores with writes, a new day or an old evaluation since they were last evaluated"""
+    today = date.today()
+    touched = []
+    for store_id in store_ids:
+        generations = response_cache.generations(TOPICS, [store_id])
+        previous = _evaluated.get(store_id)
+        if (
+            previous is None
+            or generations is None
+            or previous[0] != generations
+            or previous[1] != today
+            or now - previous[2] > settings.SMART_ALERTS_MAX_AGE_SECONDS
+        ):
+            touched.append(store_id)
+    return touched
+
+
+def refresh_smart_alerts(force: bool = False) -> dict:
+    """Evaluate the stores touched since their last evaluation, every store with ``force``"""
+    with _lock:
+        started = time.perf_counter()
+        now = time.time()
+        db = SessionLocal()
+        try:
+            store_ids = [store_id for store_id, in db.query(models.Store.id).all()]
+            touched = store_ids if force else _touched_stores(store_ids, now)
+            # Read before evaluating: a write landing meanwhile is seen next time
+            generations = {store_id: response_cache.generations(TOPICS, [store_id]) for store_id in touched}
+            try:
+                stats = evaluate_smart_alerts(db, touched)
+            except IntegrityError:
+                # Another worker inserted the same alert first; its rows are as good as ours
+                db.rollback()
+                logger.info("Smart alerts evaluated concurrently elsewhere, retrying next round")
+                return {"stores": len(touched), "skipped": True}
+        finally:
+            db.close()
+
+        today = date.today()
+        for store_id in touched:
+            _evaluated[store_id] = (generations[store_id], today, now)
+        for store_id in set(_evaluated) - set(store_ids):
+            del _evaluated[store_id]
+
+    stats["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    if touched:
+        logger.info("Smart alerts: %s", stats)
+    return stats
+
+
+def _run_refresher() -> None:
+    wait = 0
+    while not _stop.wait(wait):
+        try:
+            refresh_smart_alerts()
+        except Exception:
+            logger.warning("Smart alerts evaluation failed", exc_info=True)
+        wait = settings.SMART_ALERTS_REFRESH_SECONDS
+
+
+def start_smart_alerts_refresher() -> None:
+    global _refresher
+    if _refresher is None:
+        _stop.clear()
+        _refresher = threading.Thread(target=_run_refresher, name="smart-alerts-refresher", daemon=True)
+        _refresher.start()
+
+
+def stop_smart_alerts_refresher() -> None:
+    global _refresher
+    _stop.set()
+    _refresher = None
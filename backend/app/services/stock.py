@@ -0,0 +1,86 @@
+"""
+Stock reservation.
+
+Stock is decremented with a conditional update covering the whole basket::
+
+    UPDATE products SET current_stock = current_stock - CASE id WHEN :id THEN :q ... END
+    WHERE id IN (...) AND current_stock >= CASE id WHEN :id THEN :q ... END
+    RETURNING id
+
+so two tills selling the last unit at the same time cannot both succeed,
+without holding row locks across the whole checkout. Any product missing from
+the RETURNING set is reported back and the caller rolls the transaction back.
+"""
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session
+from app.db import models
+
+
+# Products per UPDATE statement, keeps bulk ingestion under parameter limits
+RESERVE_CHUNK_SIZE = 500
+
+
+class InsufficientStockError(Exception):
+    """Raised when one or more lines could not be reserved"""
+
+    def __init__(self, failures: List[dict]):
+        self.failures = failures
+        super().__init__(self.message)
+
+    @property
+    def message(self) -> str:
+        lines = [
+            f"{failure['name']} (requested {failure['requested']}, available {failure['available']})"
+            for failure in self.failures
+        ]
+        return "Insufficient stock for product " + "; ".join(lines)
+
+
+def aggregate_quantities(lines: Iterable[Tuple[int, int]]) -> Dict[int, int]:
+    """Sum (product_id, quantity) pairs so repeated SKUs are checked together"""
+    quantities: Dict[int, int] = {}
+    for product_id, quantity in lines:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def reserve_stock(db: Session, quantities: Dict[int, int]) -> None:
+    """Atomically decrement stock for every product in ``quantities``.
+
+    Runs in the caller's transaction. Raises InsufficientStockError listing
+    every product that could not be reserved; decrements that did succeed are
+    left for the caller's rollback to undo.
+    """
+    table = models.Product.__table__
+    product_ids = sorted(quantities)
+    reserved = set()
+
+    for start in range(0, len(product_ids), RESERVE_CHUNK_SIZE):
+        chunk = product_ids[start:start + RESERVE_CHUNK_SIZE]
+        requested = case({product_id: quantities[product_id] for product_id in chunk}, value=table.c.id)
+        result = db.execute(
+            update(table)
+            .where(table.c.id.in_(chunk), table.c.current_stock >= requested)
+            .values(current_stock=table.c.current_stock - requested)
+            .returning(table.c.id)
+        )
+        reserved.update(result.scalars())
+
+    failed = [product_id for product_id in product_ids if product_id not in reserved]
+
+    if failed:
+        rows = db.query(
+            models.Product.id, models.Product.name, models.Product.current_stock
+        ).filter(models.Product.id.in_(failed)).all()
+        found = {row.id: row for row in rows}
+
+        raise InsufficientStockError([
+            {
+                "product_id": product_id,
+                "name": found[product_id].name if product_id in found else f"#{product_id}",
+                "requested": quantities[product_id],
+                "available": found[product_id].current_stock if product_id in found else 0
+            }
+            for product_id in failed
+        ])
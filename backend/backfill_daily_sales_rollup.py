@@ -0,0 +1,35 @@
+"""
+Rebuild the daily_sales_rollup table from the sales table.
+
+Run after importing or editing sales outside the API (seed scripts, manual
+fixes). Without arguments the whole rollup is rebuilt.
+
+Usage: python backfill_daily_sales_rollup.py [--store-id 1] [--start 2026-01-01] [--end 2026-02-01]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+from datetime import date
+from app.db.database import SessionLocal, engine
+from app.db import models
+from app.services.rollups import rebuild_daily_sales_rollup
+
+
+def backfill(store_id=None, start_date=None, end_date=None):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rows = rebuild_daily_sales_rollup(db, store_id=store_id, start_date=start_date, end_date=end_date)
+        print(f"Rebuilt daily sales rollup: {rows} rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--store-id", type=int, default=None)
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="first day, inclusive")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="last day, exclusive")
+    args = parser.parse_args()
+    backfill(args.store_id, args.start, args.end)
@@ -0,0 +1,31 @@
+"""
+Rebuild the product co-occurrence index from the sale_items table.
+
+Run after importing or editing sales outside the API (seed scripts, manual
+fixes); the sale endpoints keep the index current on their own.
+
+Usage: python backfill_product_cooccurrence.py
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+from app.db.database import SessionLocal, engine
+from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+
+
+def backfill():
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        pairs = rebuild_product_cooccurrence(db)
+        print(f"Rebuilt product co-occurrence index: {pairs} pair rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.parse_args()
+    backfill()
@@ -0,0 +1,83 @@
+"""
+Compare bulk ingestion with replaying bills one at a time.
+
+Replays the same offline batch through create_sale_record (what a terminal
+does today via POST /sales/) and through ingest_sales (POST /sales/bulk) and
+prints bills per second and round-trips for both.
+
+Usage: python benchmark_bulk_sales.py [--bills 2000] [--lines 5]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Audit rows commit with each change instead of from a background thread
+os.environ.setdefault("AUDIT_LOG_MODE", "transactional")
+
+import argparse
+import time
+from app.db import models
+from app.db.query_counter import count_queries
+from app.schemas.sale import BulkSaleEntry, SaleCreate
+from app.services.bulk_sales import ingest_sales
+from app.services.sale_pipeline import create_sale_record
+from benchmark_create_sale import setup_database
+
+PRODUCTS = 200
+
+
+def make_bills(store_id: int, customer_id: int, bills: int, lines: int, prefix: str):
+    return [
+        {
+            "idempotency_key": f"{prefix}-{n}",
+            "store_id": store_id,
+            "customer_id": customer_id if n % 2 else None,
+            "payment_mode": models.PaymentMode.CASH,
+            "items": [
+                {"product_id": (n * lines + line) % PRODUCTS + 1, "quantity": 1, "unit_price": 100.0}
+                for line in range(lines)
+            ]
+        }
+        for n in range(bills)
+    ]
+
+
+def run(bills: int, lines: int):
+    engine, Session, (store_id, user_id, customer_id) = setup_database(PRODUCTS)
+
+    # One sale per call, as the terminals replay today
+    payloads = [SaleCreate(**bill) for bill in make_bills(store_id, customer_id, bills, lines, "single")]
+    with count_queries(engine) as single_queries:
+        started = time.perf_counter()
+        for payload in payloads:
+            db = Session()
+            try:
+                create_sale_record(db, payload, db.get(models.User, user_id))
+            finally:
+                db.close()
+        single_elapsed = time.perf_counter() - started
+
+    # The same number of bills in a single batch
+    entries = [BulkSaleEntry(**bill) for bill in make_bills(store_id, customer_id, bills, lines, "bulk")]
+    with count_queries(engine) as bulk_queries:
+        started = time.perf_counter()
+        db = Session()
+        try:
+            result = ingest_sales(db, entries, db.get(models.User, user_id))
+        finally:
+            db.close()
+        bulk_elapsed = time.perf_counter() - started
+
+    assert result["created"] == bills, result["results"][:3]
+
+    print(f"bills: {bills}, lines per bill: {lines}")
+    print(f"{'mode':>8} {'bills/s':>10} {'queries':>9}")
+    print(f"{'single':>8} {bills / single_elapsed:>10.1f} {single_queries.count:>9}")
+    print(f"{'bulk':>8} {bills / bulk_elapsed:>10.1f} {bulk_queries.count:>9}")
+    print(f"speedup: {single_elapsed / bulk_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bills", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=5)
+    args = parser.parse_args()
+    run(args.bills, args.lines)
@@ -0,0 +1,100 @@
+"""
+Benchmark the sale creation pipeline.
+
+Runs create_sale_record against a throwaway in-memory SQLite database and
+prints the number of SQL round-trips and the wall time per basket size.
+
+Usage: python benchmark_create_sale.py [--baskets 1,5,15,50] [--runs 20]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Audit rows commit with each change instead of from a background thread
+os.environ.setdefault("AUDIT_LOG_MODE", "transactional")
+
+import argparse
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db import models
+from app.db.query_counter import count_queries
+from app.schemas.sale import SaleCreate
+from app.services.sale_pipeline import create_sale_record
+
+
+def setup_database(product_count: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = Session()
+    store = models.Store(name="Benchmark Store")
+    db.add(store)
+    db.flush()
+    user = models.User(
+        email="bench@example.com",
+        username="bench",
+        hashed_password="x",
+        role=models.UserRole.SALES_STAFF,
+        store_id=store.id
+    )
+    customer = models.Customer(name="Bench Customer", phone="9999999999", store_id=store.id)
+    db.add_all([user, customer])
+    for i in range(product_count):
+        db.add(models.Product(
+            sku=f"BENCH-{i:05d}",
+            name=f"Benchmark Product {i}",
+            unit_price=100.0 + i,
+            cost_price=60.0,
+            current_stock=1_000_000,
+            warranty_months=12 if i % 3 == 0 else 0,
+            store_id=store.id
+        ))
+    db.commit()
+    ids = (store.id, user.id, customer.id)
+    db.close()
+    return engine, Session, ids
+
+
+def run(baskets, runs):
+    max_basket = max(baskets)
+    engine, Session, (store_id, user_id, customer_id) = setup_database(max_basket)
+
+    print(f"{'items':>6} {'queries/sale':>13} {'ms/sale':>9}")
+    for size in baskets:
+        payload = SaleCreate(
+            store_id=store_id,
+            customer_id=customer_id,
+            payment_mode=models.PaymentMode.CASH,
+            items=[
+                {"product_id": product_id, "quantity": 1, "unit_price": 100.0}
+                for product_id in range(1, size + 1)
+            ]
+        )
+
+        total_queries = 0
+        started = time.perf_counter()
+        for _ in range(runs):
+            db = Session()
+            try:
+                user = db.get(models.User, user_id)
+                with count_queries(engine) as counter:
+                    create_sale_record(db, payload, user)
+                total_queries += counter.count
+            finally:
+                db.close()
+        elapsed = time.perf_counter() - started
+
+        print(f"{size:>6} {total_queries / runs:>13.1f} {elapsed / runs * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baskets", default="1,5,15,50")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    run([int(size) for size in args.baskets.split(",")], args.runs)
@@ -0,0 +1,125 @@
+"""
+Peak memory of the sales export, old pandas path vs the streaming engine.
+
+Loads N sales into a throwaway SQLite database, then exports them the way
+/reports/sales/excel used to (list of dicts -> DataFrame -> BytesIO) and
+through app.services.exports, measuring the Python heap peak with tracemalloc.
+The streaming peak should stay flat as the row count grows.
+
+Usage: python benchmark_exports.py [--rows 5000,20000]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Audit rows commit with each change instead of from a background thread
+os.environ.setdefault("AUDIT_LOG_MODE", "transactional")
+
+import argparse
+import io
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import insert
+from app.db import models
+from app.services.exports import ExportSheet, stream_query, write_export
+from benchmark_create_sale import setup_database
+
+HEADERS = ["Invoice Number", "Date", "Customer", "Subtotal", "GST Amount", "Discount", "Total Amount", "Payment Mode"]
+
+
+def load_sales(Session, store_id: int, user_id: int, customer_id: int, rows: int):
+    now = datetime.now()
+    db = Session()
+    db.execute(insert(models.Sale.__table__), [
+        {
+            "invoice_number": f"EXP{n:08d}",
+            "customer_id": customer_id if n % 2 else None,
+            "store_id": store_id,
+            "created_by": user_id,
+            "subtotal": 100.0,
+            "gst_amount": 18.0,
+            "discount": 0.0,
+            "total_amount": 118.0,
+            "payment_mode": models.PaymentMode.CASH,
+            "sale_date": now - timedelta(minutes=n)
+        }
+        for n in range(rows)
+    ])
+    db.commit()
+    db.close()
+
+
+def pandas_export(db) -> int:
+    data = []
+    for sale in db.query(models.Sale).all():
+        data.append({
+            "Invoice Number": sale.invoice_number,
+            "Date": sale.sale_date.strftime("%Y-%m-%d %H:%M:%S"),
+            "Customer": sale.customer.name if sale.customer else "Walk-in",
+            "Subtotal": sale.subtotal,
+            "GST Amount": sale.gst_amount,
+            "Discount": sale.discount,
+            "Total Amount": sale.total_amount,
+            "Payment Mode": sale.payment_mode.value
+        })
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(data).to_excel(writer, index=False, sheet_name='Sales Report')
+    return len(output.getvalue())
+
+
+def streaming_export(db, export_format: str) -> int:
+    query = db.query(
+        models.Sale.invoice_number,
+        models.Sale.sale_date,
+        models.Customer.name,
+        models.Sale.subtotal,
+        models.Sale.gst_amount,
+        models.Sale.discount,
+        models.Sale.total_amount,
+        models.Sale.payment_mode
+    ).outerjoin(models.Customer, models.Sale.customer_id == models.Customer.id)
+    rows = (
+        (row[0], row[1].strftime("%Y-%m-%d %H:%M:%S"), row[2] or "Walk-in", *row[3:])
+        for row in stream_query(query)
+    )
+    with tempfile.TemporaryFile() as output:
+        write_export([ExportSheet('Sales Report', HEADERS, rows)], output, export_format)
+        return output.tell()
+
+
+def measure(Session, export):
+    db = Session()
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = export(db)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+    return peak / 1024 / 1024, elapsed, size / 1024 / 1024
+
+
+def run(row_counts):
+    print(f"{'rows':>8} {'export':>10} {'peak MB':>9} {'seconds':>9} {'file MB':>9}")
+    for rows in row_counts:
+        engine, Session, (store_id, user_id, customer_id) = setup_database(1)
+        load_sales(Session, store_id, user_id, customer_id, rows)
+        for name, export in [
+            ("pandas", pandas_export),
+            ("xlsx", lambda db: streaming_export(db, "xlsx")),
+            ("csv", lambda db: streaming_export(db, "csv"))
+        ]:
+            peak, elapsed, size = measure(Session, export)
+            print(f"{rows:>8} {name:>10} {peak:>9.1f} {elapsed:>9.2f} {size:>9.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default="5000,20000")
+    args = parser.parse_args()
+    run([int(value) for value in args.rows.split(",")])
@@ -0,0 +1,79 @@
+"""
+Backtest the forecasting models over a whole synthetic catalog.
+
+Generates daily unit sales for N products (level, trend, weekday pattern,
+noise, some slow movers), fits on all but the last --horizon days and reports
+the error on those days plus the fit time for the whole catalog. The old
+endpoint's method (7-day mean plus a polyfit trend) is the baseline.
+
+Usage: python benchmark_forecasting.py [--products 1000,10000] [--days 180] [--horizon 14]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from datetime import date, timedelta
+import numpy as np
+from app.services.forecasting import fit_holt_winters, fit_seasonal_trend, fit_series
+
+
+def synthetic_catalog(products: int, days: int, start: date, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)[:, None]
+    weekdays = ((start.weekday() + np.arange(days)) % 7)[:, None]
+    level = rng.gamma(2.0, 10.0, products)[None, :]
+    trend = rng.normal(0, 0.002, products)[None, :] * level
+    pattern = rng.normal(0, 0.25, (7, products))
+    pattern[5:] += 0.4  # busier weekends
+    expected = np.maximum(level * (1 + pattern[weekdays, np.arange(products)]) + trend * t, 0)
+    # A quarter of the catalog sells rarely
+    slow = rng.random(products) < 0.25
+    expected[:, slow] *= 0.05
+    return rng.poisson(expected).astype(np.float64)
+
+
+def baseline(train: np.ndarray, horizon: int) -> np.ndarray:
+    """What /forecast/sales used to do: last 7-day mean plus a linear trend"""
+    x = np.arange(len(train))
+    slope = np.polyfit(x, train, 1)[0]
+    steps = np.arange(1, horizon + 1)[:, None]
+    return train[-7:].mean(axis=0)[None, :] + slope[None, :] * steps
+
+
+def errors(predicted: np.ndarray, actual: np.ndarray):
+    mae = np.abs(predicted - actual).mean()
+    wape = np.abs(predicted - actual).sum() / max(actual.sum(), 1e-9) * 100
+    return mae, wape
+
+
+def run(product_counts, days: int, horizon: int):
+    start = date.today() - timedelta(days=days)
+    print(f"{'products':>9} {'method':>15} {'fit s':>8} {'MAE':>8} {'WAPE %':>8}")
+    for products in product_counts:
+        Y = synthetic_catalog(products, days, start)
+        train, actual = Y[:-horizon], Y[-horizon:]
+        horizon_dates = [start + timedelta(days=days - horizon + i) for i in range(horizon)]
+
+        methods = [
+            ("baseline", lambda: None),
+            ("seasonal_trend", lambda: fit_seasonal_trend(train, start)),
+            ("holt_winters", lambda: fit_holt_winters(train, start)),
+            ("auto", lambda: fit_series(train, start)),
+        ]
+        for name, fit_method in methods:
+            started = time.perf_counter()
+            fit = fit_method()
+            predicted = baseline(train, horizon) if fit is None else fit.predict(horizon_dates)
+            elapsed = time.perf_counter() - started
+            mae, wape = errors(predicted, actual)
+            print(f"{products:>9} {name:>15} {elapsed:>8.2f} {mae:>8.2f} {wape:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", default="1000,10000")
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--horizon", type=int, default=14)
+    args = parser.parse_args()
+    run([int(value) for value in args.products.split(",")], args.days, args.horizon)
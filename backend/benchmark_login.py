@@ -0,0 +1,128 @@
+"""
+Benchmark login throughput and its effect on other endpoints.
+
+Fires a burst of concurrent logins through the ASGI app while polling
+/health, once with bcrypt verified inline on the request threads (how login
+used to work) and once with the async login that awaits the password hashing
+pool. Prints logins per second, login latency and /health latency during
+the burst.
+
+Usage: python benchmark_login.py [--logins 200] [--concurrency 50] [--rounds 12]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Audit rows commit with each change instead of from a background thread
+os.environ.setdefault("AUDIT_LOG_MODE", "transactional")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import argparse
+import asyncio
+import time
+import httpx
+import numpy as np
+from fastapi import HTTPException
+from app.core.config import settings
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 1) if values else 0.0
+
+
+async def burst(client: httpx.AsyncClient, path: str, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    login_latencies, health_latencies = [], []
+    done = asyncio.Event()
+
+    async def one_login(n: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(path, json={"username": f"user{n % 20}", "password": "secret"})
+            response.raise_for_status()
+            login_latencies.append(time.perf_counter() - started)
+
+    async def poll_health():
+        while not done.is_set():
+            started = time.perf_counter()
+            (await client.get("/health")).raise_for_status()
+            health_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    poller = asyncio.create_task(poll_health())
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login(n) for n in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await poller
+    return elapsed, login_latencies, health_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS)
+    args = parser.parse_args()
+
+    settings.BCRYPT_ROUNDS = args.rounds
+    from app.core import security
+    security.pwd_context.update(bcrypt__rounds=args.rounds)
+
+    from app.main import app
+    from app.api.v1.auth import _find_login_user
+    from app.db import models
+    from app.db.database import get_db
+    from benchmark_create_sale import setup_database
+
+    engine, Session, (store_id, _, _) = setup_database(1)
+    db = Session()
+    hashed = security.get_password_hash("secret")
+    for n in range(20):
+        db.add(models.User(
+            email=f"user{n}@example.com",
+            username=f"user{n}",
+            hashed_password=hashed,
+            role=models.UserRole.SALES_STAFF,
+            store_id=store_id
+        ))
+    db.commit()
+    db.close()
+
+    def get_benchmark_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_benchmark_db
+
+    # The previous login: a sync endpoint verifying on the request thread
+    @app.post("/benchmark/login-inline")
+    def login_inline(credentials: dict):
+        db = Session()
+        try:
+            user = _find_login_user(db, credentials["username"])
+            if not user or not security.verify_password(credentials["password"], user.hashed_password):
+                raise HTTPException(status_code=401)
+            return {"id": user.id}
+        finally:
+            db.close()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            print(f"{args.logins} logins, {args.concurrency} concurrent, bcrypt cost {args.rounds}, "
+                  f"{settings.PASSWORD_HASH_WORKERS} hashing workers")
+            print(f"{'mode':<10} {'logins/s':>9} {'login p50':>10} {'login p95':>10} {'health p50':>11} {'health p95':>11}")
+            for mode, path in (("inline", "/benchmark/login-inline"), ("pool", "/api/v1/auth/login")):
+                elapsed, logins, health = await burst(client, path, args.logins, args.concurrency)
+                print(
+                    f"{mode:<10} {args.logins / elapsed:>9.1f} {percentile(logins, 50):>8}ms {percentile(logins, 95):>8}ms "
+                    f"{percentile(health, 50):>9}ms {percentile(health, 95):>9}ms"
+                )
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark RFM customer segmentation at large customer counts.
+
+Loads N customers with one to five sales each into a throwaway SQLite
+database and times the grouped aggregate query, the NumPy scoring and
+segment assignment, and building the segment summary and first page.
+
+Usage: python benchmark_rfm.py [--customers 100000,1000000]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Audit rows commit with each change instead of from a background thread
+os.environ.setdefault("AUDIT_LOG_MODE", "transactional")
+
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import insert
+from app.db import models
+from app.services.rfm import (
+    RFMThresholds, customer_page, load_rfm_metrics, score_customers, segment_summary
+)
+from benchmark_create_sale import setup_database
+
+BATCH = 100_000
+
+
+def load_customers(Session, store_id: int, user_id: int, customers: int):
+    rng = np.random.default_rng(42)
+    now = datetime.now()
+    db = Session()
+    for start in range(0, customers, BATCH):
+        stop = min(start + BATCH, customers)
+        db.execute(insert(models.Customer.__table__), [
+            {"name": f"Customer {n}", "phone": f"{n:010d}", "store_id": store_id}
+            for n in range(start, stop)
+        ])
+    # setup_database already created customer 1
+    first_id = 2
+    invoice = 0
+    for start in range(0, customers, BATCH):
+        stop = min(start + BATCH, customers)
+        orders = rng.integers(1, 6, stop - start)
+        rows = []
+        for offset, count in enumerate(orders):
+            customer_id = first_id + start + offset
+            for days in rng.integers(0, 720, count):
+                invoice += 1
+                rows.append({
+                    "invoice_number": f"RFM{invoice:09d}",
+                    "customer_id": customer_id,
+                    "store_id": store_id,
+                    "created_by": user_id,
+                    "subtotal": 100.0,
+                    "gst_amount": 18.0,
+                    "total_amount": float(100 + (customer_id * 37 + invoice) % 5000),
+                    "payment_mode": models.PaymentMode.CASH,
+                    "sale_date": now - timedelta(days=int(days))
+                })
+        db.execute(insert(models.Sale.__table__), rows)
+    db.commit()
+    db.close()
+    return invoice
+
+
+def run(customer_counts):
+    print(f"{'customers':>10} {'sales':>10} {'query s':>9} {'score s':>9} {'output s':>9} {'total s':>9}")
+    for customers in customer_counts:
+        engine, Session, (store_id, user_id, _) = setup_database(0)
+        sales = load_customers(Session, store_id, user_id, customers)
+
+        db = Session()
+        try:
+            started = time.perf_counter()
+            metrics = load_rfm_metrics(db)
+            queried = time.perf_counter()
+            result = score_customers(*metrics, RFMThresholds())
+            scored = time.perf_counter()
+            segment_summary(result)
+            customer_page(db, result)
+            finished = time.perf_counter()
+        finally:
+            db.close()
+            engine.dispose()
+
+        print(f"{customers:>10} {sales:>10} {queried - started:>9.2f} {scored - queried:>9.2f} "
+              f"{finished - scored:>9.2f} {finished - started:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--customers", default="100000,1000000")
+    args = parser.parse_args()
+    run([int(value) for value in args.customers.split(",")])
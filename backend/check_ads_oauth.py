@@ -0,0 +1,186 @@
+"""
+Check the ad platform OAuth flows against a local mock OAuth server.
+
+Starts a mock Graph API / Google token endpoint on localhost (each call
+takes --delay seconds), points ads.py at it and fires concurrent Meta and
+Google callbacks and token refreshes through the ASGI app. While they run, a
+probe task measures how late the event loop wakes up from 5ms sleeps. The
+same burst is replayed through a copy of the callback that uses blocking
+``requests`` inline, as ads.py used to.
+
+Usage: python check_ads_oauth.py [--callbacks 50] [--delay 0.2]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Audit rows commit with each change instead of from a background thread
+os.environ.setdefault("AUDIT_LOG_MODE", "transactional")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import argparse
+import asyncio
+import socket
+import threading
+import time
+import httpx
+import numpy as np
+import requests
+import uvicorn
+from fastapi import FastAPI, Form, Request
+
+PROBE_INTERVAL = 0.005
+
+
+def mock_oauth_server(delay: float):
+    mock = FastAPI()
+    mock.state.connections = set()
+
+    def seen(request: Request):
+        mock.state.connections.add((request.client.host, request.client.port))
+
+    @mock.get("/oauth/access_token")
+    async def graph_token(request: Request, fb_exchange_token: str = None, code: str = None):
+        seen(request)
+        await asyncio.sleep(delay)
+        if fb_exchange_token:
+            return {"access_token": f"long-{fb_exchange_token}", "expires_in": 5184000}
+        return {"access_token": f"short-{code}", "token_type": "bearer"}
+
+    @mock.get("/me/adaccounts")
+    async def ad_accounts(request: Request, access_token: str):
+        seen(request)
+        await asyncio.sleep(delay)
+        return {"data": [{"id": "act_1", "name": "Mock Store"}]}
+
+    @mock.post("/token")
+    async def google_token(request: Request, grant_type: str = Form(...)):
+        seen(request)
+        await asyncio.sleep(delay)
+        return {"access_token": f"google-{grant_type}", "refresh_token": "refresh", "expires_in": 3600}
+
+    return mock
+
+
+def start_server(app) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def probe_loop(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+
+async def burst(client: httpx.AsyncClient, calls):
+    lags, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_loop(lags, stop))
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.post(path, json=body) for path, body in calls))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    failed = [response.text for response in responses if response.status_code != 200]
+    assert not failed, failed[:3]
+    return elapsed, lags
+
+
+def lag_ms(lags, q):
+    return round(float(np.percentile(lags, q)) * 1000, 1) if lags else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--callbacks", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    mock = mock_oauth_server(args.delay)
+    base_url = start_server(mock)
+    os.environ["META_GRAPH_URL"] = base_url
+    os.environ["GOOGLE_TOKEN_URL"] = f"{base_url}/token"
+
+    from app.main import app
+    from app.api.dependencies import get_current_user
+    from app.core.principals import Principal
+    from app.db import models
+    from app.db.database import get_db
+    from benchmark_create_sale import setup_database
+
+    engine, Session, (store_id, user_id, _) = setup_database(1)
+    db = Session()
+    connection_ids = {}
+    for platform in ("google", "meta"):
+        connection = models.AdAccountConnection(
+            store_id=store_id, platform=platform, access_token="token", refresh_token="refresh", created_by=user_id
+        )
+        db.add(connection)
+        db.flush()
+        connection_ids[platform] = connection.id
+    db.commit()
+    principal = Principal.from_user(db.get(models.User, user_id))
+    db.close()
+
+    def get_check_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_check_db
+    app.dependency_overrides[get_current_user] = lambda: principal
+
+    # meta_oauth_callback as it was: blocking requests calls inside async def
+    @app.post("/check/meta/callback-blocking")
+    async def meta_callback_blocking(body: dict):
+        token = requests.get(f"{base_url}/oauth/access_token", params={"code": body["code"]}).json()
+        long_token = requests.get(
+            f"{base_url}/oauth/access_token", params={"fb_exchange_token": token["access_token"]}
+        ).json()
+        accounts = requests.get(f"{base_url}/me/adaccounts", params={"access_token": long_token["access_token"]}).json()
+        return {"access_token": long_token["access_token"], "ad_accounts": accounts["data"]}
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check", timeout=120) as client:
+            # Correctness of each flow
+            meta = (await client.post("/api/v1/ads/meta/callback", json={"code": "abc", "state": "1"})).json()
+            assert meta["access_token"] == "long-short-abc" and meta["ad_accounts"][0]["id"] == "act_1", meta
+            google = (await client.post("/api/v1/ads/google/callback", json={"code": "abc", "state": "1"})).json()
+            assert google["access_token"] == "google-authorization_code", google
+            for platform, connection_id in connection_ids.items():
+                response = await client.post(f"/api/v1/ads/connections/{connection_id}/refresh-token")
+                assert response.status_code == 200, response.text
+            print("Meta callback, Google callback and token refresh OK against", base_url)
+
+            n = args.callbacks
+            print(f"\n{n} concurrent callbacks, mock platform latency {args.delay * 1000:.0f}ms per call")
+            print(f"{'mode':<10} {'seconds':>8} {'loop lag p50':>13} {'p99':>8} {'max':>8} {'connections':>12}")
+            modes = (
+                ("blocking", [("/check/meta/callback-blocking", {"code": str(i)}) for i in range(n)]),
+                ("async", [
+                    ("/api/v1/ads/meta/callback", {"code": str(i), "state": "1"}) if i % 2 else
+                    ("/api/v1/ads/google/callback", {"code": str(i), "state": "1"})
+                    for i in range(n)
+                ])
+            )
+            for mode, calls in modes:
+                mock.state.connections.clear()
+                elapsed, lags = await burst(client, calls)
+                print(
+                    f"{mode:<10} {elapsed:>8.2f} {lag_ms(lags, 50):>11}ms {lag_ms(lags, 99):>6}ms "
+                    f"{max(lags) * 1000 if lags else 0:>6.0f}ms {len(mock.state.connections):>12}"
+                )
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Check the streaming chatbot endpoint against a local fake Ollama server.
+
+Starts a fake Ollama (/api/chat, /api/tags) on localhost that waits
+--first-token seconds before the first chunk and --token-delay between
+--tokens chunks, points the chatbot at it and serves the app with uvicorn.
+Checks that /chatbot/chat/stream relays the same answer /chatbot/chat
+returns, the fallback when Ollama fails up front and the error event when it
+fails mid-answer, and that a repeated question is answered from the answer
+cache while questions differing in a number, a question word or word order
+are not, then compares time to first token for concurrent blocking and
+streaming chats (each asking a different question, so nothing is cached).
+
+Usage: python check_chatbot_stream.py [--chats 20] [--tokens 40] [--first-token 0.3] [--token-delay 0.02]
+"""
+import sys, os, tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/check_chatbot.db")
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ["Sales", "are", "up", "this", "week", "and", "stock", "looks", "healthy", "overall."]
+
+
+def fake_ollama(tokens: int, first_token: float, token_delay: float):
+    mock = FastAPI()
+    mock.state.fail = None
+    mock.state.connections = set()
+
+    def answer():
+        return [WORDS[n % len(WORDS)] + " " for n in range(tokens)]
+
+    def chunk(content: str, done: bool = False) -> str:
+        return json.dumps({"model": "phi4", "message": {"role": "assistant", "content": content}, "done": done}) + "\n"
+
+    @mock.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "phi4:latest"}]}
+
+    @mock.post("/api/chat")
+    async def chat(request: Request):
+        mock.state.connections.add((request.client.host, request.client.port))
+        body = await request.json()
+        if mock.state.fail == "upfront":
+            return JSONResponse({"error": "model not loaded"}, status_code=500)
+        if not body["stream"]:
+            await asyncio.sleep(first_token + token_delay * (tokens - 1))
+            return {"model": "phi4", "message": {"role": "assistant", "content": "".join(answer())}, "done": True}
+
+        async def generate():
+            await asyncio.sleep(first_token)
+            for n, content in enumerate(answer()):
+                if n and mock.state.fail == "midway" and n == tokens // 2:
+                    yield json.dumps({"error": "out of memory"}) + "\n"
+                    return
+                yield chunk(content)
+                await asyncio.sleep(token_delay)
+            yield chunk("", done=True)
+
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    return mock
+
+
+def start_server(app) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def parse_events(text: str):
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def blocking_chat(client: httpx.AsyncClient, message: str):
+    started = time.perf_counter()
+    response = await client.post("/api/v1/chatbot/chat", json={"message": message})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+async def streaming_chat(client: httpx.AsyncClient, message: str):
+    started, first_token, body = time.perf_counter(), None, ""
+    async with client.stream("POST", "/api/v1/chatbot/chat/stream", json={"message": message}) as response:
+        response.raise_for_status()
+        async for text in response.aiter_text():
+            if first_token is None and "event: token" in text:
+                first_token = time.perf_counter() - started
+            body += text
+    assert parse_events(body)[-1][0] == "done", body[-200:]
+    return first_token, time.perf_counter() - started
+
+
+def ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    mock = fake_ollama(args.tokens, args.first_token, args.token_delay)
+    os.environ["OLLAMA_BASE_URL"] = start_server(mock)
+
+    from app.main import app
+    from app.api.dependencies import get_current_user
+    from app.core.principals import Principal
+    from app.core.security import get_password_hash
+    from app.db import models
+    from app.db.database import SessionLocal
+    from app.services import ollama
+    from app.services.chat_answers import question_key
+
+    db = SessionLocal()
+    user = models.User(
+        email="chat@example.com", username="chat", hashed_password=get_password_hash("secret"),
+        role=models.UserRole.SUPER_ADMIN
+    )
+    db.add(user)
+    db.commit()
+    principal = Principal.from_user(user)
+    db.close()
+    app.dependency_overrides[get_current_user] = lambda: principal
+    base_url = start_server(app)
+
+    async def run():
+        async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+            blocking = (await client.post("/api/v1/chatbot/chat", json={"message": "hi"})).json()
+            async with client.stream("POST", "/api/v1/chatbot/chat/stream", json={"message": "hello"}) as response:
+                assert response.headers["content-type"].startswith("text/event-stream")
+                events = parse_events((await response.aread()).decode())
+            streamed = "".join(data["content"] for event, data in events if event == "token")
+            assert [event for event, _ in events][0] == "context" and events[-1][0] == "done", events
+            assert streamed == blocking["response"] and len(events) == args.tokens + 2, (streamed, blocking)
+            print(f"Streamed answer matches /chat ({args.tokens} tokens) against", os.environ["OLLAMA_BASE_URL"])
+
+            mock.state.fail = "upfront"
+            events = parse_events((await client.post("/api/v1/chatbot/chat/stream", json={"message": "sales"})).text)
+            assert events[-1] == ("done", {"context_used": events[-1][1]["context_used"]}), events
+            assert events[-1][1]["context_used"]["mode"] == "fallback", events
+            mock.state.fail = "midway"
+            events = parse_events((await client.post("/api/v1/chatbot/chat/stream", json={"message": "sales"})).text)
+            assert events[-1][0] == "error" and len(events) == args.tokens // 2 + 2, events
+            mock.state.fail = None
+            print("Fallback when Ollama fails up front and error event when it fails midway OK")
+
+            started = time.perf_counter()
+            again = (await client.post("/api/v1/chatbot/chat", json={"message": "Hello!"})).json()
+            cached_ms = (time.perf_counter() - started) * 1000
+            events = parse_events((await client.post("/api/v1/chatbot/chat/stream", json={"message": "HI"})).text)
+            assert again["response"] == streamed and events[1][1]["content"] == streamed and len(events) == 3, events
+            pairs = [
+                ("top 5 customers", "top 3 customers"),
+                ("Why did sales drop?", "When did sales drop?"),
+                ("Which store sells more than mine?", "Does mine sell more than which store?"),
+                ("How does it work?", "work"),
+            ]
+            hits = (await client.get("/api/v1/chatbot/metrics")).json()["answer_cache"]["hits"]
+            for first, second in pairs:
+                assert question_key(first) != question_key(second), (first, second)
+                for message in (first, second):
+                    await client.post("/api/v1/chatbot/chat", json={"message": message})
+            assert (await client.get("/api/v1/chatbot/metrics")).json()["answer_cache"]["hits"] == hits
+            print(f"Repeated questions answered from the answer cache ({cached_ms:.1f}ms), "
+                  f"{len(pairs)} look-alike pairs kept apart")
+
+            n = args.chats
+            print(f"\n{n} concurrent chats, first token after {args.first_token * 1000:.0f}ms, "
+                  f"{args.tokens} tokens {args.token_delay * 1000:.0f}ms apart")
+            print(f"{'mode':<10} {'first token p50':>16} {'p95':>8} {'complete p50':>13} {'connections':>12}")
+            for mode, chat in (("blocking", blocking_chat), ("stream", streaming_chat)):
+                mock.state.connections.clear()
+                results = await asyncio.gather(*(chat(client, f"How are sales at {mode} {i}?") for i in range(n)))
+                first_tokens, totals = zip(*results)
+                print(f"{mode:<10} {ms(first_tokens, 50):>14}ms {ms(first_tokens, 95):>6}ms "
+                      f"{ms(totals, 50):>11}ms {len(mock.state.connections):>12}")
+
+            metrics = (await client.get("/api/v1/chatbot/metrics")).json()
+            print("\n/chatbot/metrics:", json.dumps({"modes": metrics["modes"], "answer_cache": metrics["answer_cache"]}, indent=2))
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
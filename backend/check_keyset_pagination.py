@@ -0,0 +1,109 @@
+"""
+Check that following X-Next-Cursor walks every row exactly once.
+
+Loads sales and expenses into a scratch SQLite database where most rows share
+one server-default timestamp (stored to the second), some carry microseconds
+and some expenses have no date at all, then follows the cursor through
+/sales/ and /financial/expenses in both small and large pages. Exits non-zero
+if an id repeats, an id is missed or the walk doesn't end.
+
+Usage: python check_keyset_pagination.py [--rows 50]
+"""
+import sys, os, tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/check_pagination.db")
+
+import argparse
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from app.main import app
+from app.api.dependencies import get_current_user
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.core.principals import Principal
+from app.db import models
+from app.db.database import SessionLocal
+
+
+def seed(db, rows: int):
+    store = models.Store(name="Pagination Store")
+    db.add(store)
+    db.flush()
+    user = models.User(
+        email="pages@example.com", username="pages", hashed_password="x",
+        role=models.UserRole.SUPER_ADMIN, store_id=store.id
+    )
+    db.add(user)
+    db.flush()
+
+    sale = {
+        "store_id": store.id, "created_by": user.id, "subtotal": 100.0, "gst_amount": 18.0,
+        "total_amount": 118.0, "payment_mode": models.PaymentMode.CASH
+    }
+    # One statement, so every server default is the same second
+    db.execute(insert(models.Sale.__table__), [
+        dict(sale, invoice_number=f"PAGE{i:05d}") for i in range(rows)
+    ])
+    now = datetime.now()
+    db.execute(insert(models.Sale.__table__), [
+        dict(sale, invoice_number=f"PAGEUS{i:05d}", sale_date=now - timedelta(microseconds=i))
+        for i in range(rows // 5)
+    ])
+
+    expense = {
+        "store_id": store.id, "created_by": user.id, "category": "Rent", "description": "Rent",
+        "amount": 10.0, "payment_mode": models.PaymentMode.CASH
+    }
+    db.execute(insert(models.Expense.__table__), [dict(expense) for _ in range(rows)])
+    db.execute(insert(models.Expense.__table__), [
+        dict(expense, expense_date=now - timedelta(microseconds=i)) for i in range(rows // 5)
+    ])
+    # Rows written before expense_date always got a value
+    db.execute(insert(models.Expense.__table__), [dict(expense, expense_date=None) for _ in range(rows // 5)])
+    db.commit()
+    return Principal.from_user(user)
+
+
+def walk(client: TestClient, path: str, limit: int, expected: set) -> int:
+    seen, pages, cursor = [], 0, None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(path, params=params)
+        assert response.status_code == 200, (path, response.status_code, response.text)
+        seen.extend(row["id"] for row in response.json())
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+        assert pages <= len(expected) + 1, f"{path}: still paging after {pages} pages"
+    repeated = len(seen) - len(set(seen))
+    assert not repeated, f"{path} limit={limit}: {repeated} ids repeated"
+    assert set(seen) == expected, f"{path} limit={limit}: missed {sorted(expected - set(seen))[:10]}"
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    principal = seed(db, args.rows)
+    expected = {
+        "/api/v1/sales/": {id for id, in db.query(models.Sale.id)},
+        "/api/v1/financial/expenses": {id for id, in db.query(models.Expense.id)},
+    }
+    db.close()
+    app.dependency_overrides[get_current_user] = lambda: principal
+    client = TestClient(app)
+
+    for path, ids in expected.items():
+        for limit in (1, 3, 7, len(ids), len(ids) + 5):
+            pages = walk(client, path, limit, ids)
+            print(f"{path:<28} limit={limit:<4} {len(ids)} rows in {pages} pages OK")
+
+
+if __name__ == "__main__":
+    main()
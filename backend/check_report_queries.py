@@ -0,0 +1,107 @@
+"""
+Query count regression check for the inventory reports.
+
+Runs each report against a small and a large catalogue on a scratch SQLite
+database and fails if the number of SQL statements grows with the number of
+products, i.e. if a per-product query (N+1) creeps back in.
+
+Usage: python check_report_queries.py [--small 20] [--large 400]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Audit rows commit with each change instead of from a background thread
+os.environ.setdefault("AUDIT_LOG_MODE", "transactional")
+
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api.v1 import reports
+from app.db import models
+from app.db.query_counter import count_queries
+
+# Statements each report may issue, whatever the catalogue size
+MAX_QUERIES = 2
+
+REPORTS = [
+    ("live stock", reports.get_live_stock_report, "stock_report"),
+    ("movement analysis", reports.get_stock_movement_analysis, "stock_analysis"),
+    ("high value stock", reports.get_high_value_stock_report, "high_value_stock"),
+    ("reorder level", reports.get_reorder_level_report, "reorder_report"),
+]
+
+
+def setup(products: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    now = datetime.now()
+    db.execute(insert(models.Store.__table__), [{"name": "Main Store"}])
+    db.execute(insert(models.User.__table__), [
+        {"email": "admin@example.com", "username": "admin", "hashed_password": "x",
+         "role": models.UserRole.SUPER_ADMIN, "store_id": 1}
+    ])
+    db.execute(insert(models.Product.__table__), [
+        {"sku": f"SKU-{i}", "name": f"Product {i}", "unit_price": 1000.0, "cost_price": 800.0,
+         "current_stock": 5 + i % 30, "minimum_stock": 10, "store_id": 1}
+        for i in range(products)
+    ])
+    db.execute(insert(models.Sale.__table__), [
+        {"invoice_number": f"CHK{i:06d}", "store_id": 1, "created_by": 1, "subtotal": 1000.0,
+         "gst_amount": 180.0, "total_amount": 1180.0, "payment_mode": models.PaymentMode.CASH,
+         "sale_date": now - timedelta(days=i % 90)}
+        for i in range(products)
+    ])
+    db.execute(insert(models.SaleItem.__table__), [
+        {"sale_id": i + 1, "product_id": i % products + 1, "quantity": 1, "unit_price": 1000.0,
+         "gst_rate": 18.0, "gst_amount": 180.0, "total_price": 1180.0}
+        for i in range(products)
+        if i % 3
+    ])
+    db.commit()
+    return engine, db
+
+
+def measure(products: int) -> dict:
+    engine, db = setup(products)
+    user = db.get(models.User, 1)
+    counts = {}
+    try:
+        for name, report, key in REPORTS:
+            with count_queries(engine) as counter:
+                result = report(db, user)
+            counts[name] = (counter.count, len(result[key]))
+    finally:
+        db.close()
+        engine.dispose()
+    return counts
+
+
+def run(small: int, large: int) -> int:
+    small_counts = measure(small)
+    large_counts = measure(large)
+
+    failures = 0
+    for name, _, _ in REPORTS:
+        small_queries, small_rows = small_counts[name]
+        large_queries, large_rows = large_counts[name]
+        ok = small_queries == large_queries and large_queries <= MAX_QUERIES
+        failures += 0 if ok else 1
+        print(f"[{'ok' if ok else 'FAIL'}] {name}: {small_queries} queries for {small_rows} rows, "
+              f"{large_queries} queries for {large_rows} rows")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--small", type=int, default=20)
+    parser.add_argument("--large", type=int, default=400)
+    args = parser.parse_args()
+    sys.exit(run(args.small, args.large))
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import random
 from app.db.database import SessionLocal
 from app.db import models
+from app.services.rollups import rebuild_daily_sales_rollup
 
 def distribute_data():
     db = SessionLocal()
@@ -63,6 +64,9 @@ def distribute_data():
         
         print("\n🎉 DONE! Refresh your browser!")
         
+        # Seeded sales bypass the API, rebuild the dashboard rollup
+        rebuild_daily_sales_rollup(db)
+        
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
@@ -0,0 +1,38 @@
+"""
+Refit the forecast models of every store and product.
+
+Fits daily store sales and daily product units over the last --history-days
+complete days with app.services.forecasting and replaces the forecast_models
+table, which the /analytics/forecast endpoints serve from. Meant to run
+nightly, e.g. from cron: 15 2 * * * cd /path/to/backend && python fit_forecast_models.py
+
+Usage: python fit_forecast_models.py [--history-days 180] [--holdout-days 14]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from app.db.database import SessionLocal, engine
+from app.db import models
+from app.services.forecasting import HISTORY_DAYS, HOLDOUT_DAYS, fit_forecast_models
+
+
+def refit(history_days: int, holdout_days: int):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        counts = fit_forecast_models(db, history_days=history_days, holdout_days=holdout_days)
+        print(f"Fitted {counts['stores']} store and {counts['products']} product models "
+              f"in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--history-days", type=int, default=HISTORY_DAYS)
+    parser.add_argument("--holdout-days", type=int, default=HOLDOUT_DAYS)
+    args = parser.parse_args()
+    refit(args.history_days, args.holdout_days)
@@ -5,6 +5,8 @@ import os
 import sys
 from app.db.database import SessionLocal, engine
 from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+from app.services.rollups import rebuild_daily_sales_rollup
 from app.core.security import get_password_hash
 from datetime import datetime, timedelta
 import random
@@ -320,6 +322,10 @@ try:
     print(f"  Sales: sales@example.com / sales123")
     print("\n" + "=" * 70 + "\n")
     
+    # Seeded sales bypass the API, rebuild the dashboard rollup and the co-occurrence index
+    rebuild_daily_sales_rollup(db)
+    rebuild_product_cooccurrence(db)
+    
 except Exception as e:
     print(f"\nERROR: {e}")
     import traceback
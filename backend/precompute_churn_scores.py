@@ -0,0 +1,35 @@
+"""
+Recompute the customer_churn_scores table.
+
+Scores every customer with app.services.churn and replaces the stored scores,
+so /analytics/predict/churn is a plain indexed read. Meant to run nightly,
+e.g. from cron: 30 2 * * * cd /path/to/backend && python precompute_churn_scores.py
+
+Usage: python precompute_churn_scores.py [--batch-size 10000]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+from app.db.database import SessionLocal, engine
+from app.db import models
+from app.services.churn import precompute_churn_scores
+
+
+def precompute(batch_size: int):
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        customers = precompute_churn_scores(db, batch_size=batch_size)
+        print(f"Scored {customers} customers in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    precompute(args.batch_size)
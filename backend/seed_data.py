@@ -4,6 +4,8 @@ This script populates the database with realistic sample data for testing
 """
 from app.db.database import SessionLocal
 from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+from app.services.rollups import rebuild_daily_sales_rollup
 from app.core.security import get_password_hash
 from datetime import datetime, timedelta
 import random
@@ -399,6 +401,10 @@ def seed_database():
         print("Refresh your browser to see all the data!")
         print("=" * 70 + "\n")
         
+        # Seeded sales bypass the API, rebuild the dashboard rollup and the co-occurrence index
+        rebuild_daily_sales_rollup(db)
+        rebuild_product_cooccurrence(db)
+        
     except Exception as e:
         print(f"\nERROR: Failed to seed database: {e}")
         db.rollback()
@@ -11,6 +11,8 @@ import string
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal
 from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+from app.services.rollups import rebuild_daily_sales_rollup
 
 # Staff/Sellers
 STAFF = [
@@ -515,6 +517,10 @@ def seed_data():
         print("\n👉 REFRESH YOUR BROWSER to see all the data!")
         print("👉 Restart backend if needed: python -m uvicorn app.main:app --reload --port 8000")
         
+        # Seeded sales bypass the API, rebuild the dashboard rollup and the co-occurrence index
+        rebuild_daily_sales_rollup(db)
+        rebuild_product_cooccurrence(db)
+        
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
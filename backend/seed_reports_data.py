@@ -13,6 +13,8 @@ import random
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal, engine
 from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+from app.services.rollups import rebuild_daily_sales_rollup
 
 # Sample data
 CATEGORIES = ["Mobiles", "Laptops", "TVs", "ACs", "Refrigerators", "Washing Machines", "Accessories", "Audio"]
@@ -404,6 +406,10 @@ def seed_reports_data():
         print(f"  - Staff: {len(staff_users)}")
         print("\nYou can now use all Advanced Reports!")
         
+        # Seeded sales bypass the API, rebuild the dashboard rollup and the co-occurrence index
+        rebuild_daily_sales_rollup(db)
+        rebuild_product_cooccurrence(db)
+        
     except Exception as e:
         db.rollback()
         print(f"\n❌ Error: {e}")
@@ -4,6 +4,8 @@ This script creates a fully populated database with realistic business data
 """
 from app.db.database import engine, SessionLocal
 from app.db import models
+from app.services.cooccurrence import rebuild_product_cooccurrence
+from app.services.rollups import rebuild_daily_sales_rollup
 from app.core.security import get_password_hash
 from datetime import datetime, timedelta
 import random
@@ -861,6 +863,10 @@ def setup_complete_database(force_reset=False):
         print("   4. Login with any of the credentials above")
         print("\n" + "="*80 + "\n")
         
+        # Seeded sales bypass the API, rebuild the dashboard rollup and the co-occurrence index
+        rebuild_daily_sales_rollup(db)
+        rebuild_product_cooccurrence(db)
+        
     except Exception as e:
         print(f"\nERROR: {e}")
         import traceback